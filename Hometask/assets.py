@@ -0,0 +1,154 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pygame
+
+# Asset files live next to the code, whatever the working directory is
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class DummySound:
+    # Stands in for a sound that could not be loaded (no audio device,
+    # missing file), so callers never have to check
+    def play(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_length(self):
+        return 0.0
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class AssetManager:
+    # Shared fonts, sounds and surfaces for the whole game. Everything is
+    # loaded once, on first request, and the same object is handed out
+    # afterwards.
+    #
+    # Sounds can be decoded on a background thread (preload_sounds) while
+    # the title screen is already up; sound() only waits if that file is
+    # still being decoded.
+    #
+    # Surfaces are cached by key in a group. Group None is kept for the
+    # whole run; surfaces of other groups (e.g. 'level') count against a
+    # memory budget and the least recently used are evicted past it, or
+    # all at once with release(group).
+    def __init__(self, base_dir=ASSET_DIR, budget=32 * 1024 * 1024):
+        self.base_dir = base_dir
+        self.budget = budget
+        self.fonts = {}
+        self.sounds = {}
+        self.sound_ready = {}
+        self.sound_lock = threading.Lock()
+        self.loader = None
+        # key -> (surface or object, bytes, group), least recently used first
+        self.surfaces = OrderedDict()
+        self.used = 0
+        self.evictions = 0
+
+    def path(self, name):
+        return os.path.join(self.base_dir, name)
+
+    # --- Fonts ---
+    def font(self, size, name=None):
+        # pygame's default font, or a font file next to the code
+        key = (name, size, False)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(self.path(name) if name else None, size)
+            self.fonts[key] = font
+        return font
+
+    def sys_font(self, name, size):
+        # SysFont scans the installed fonts the first time, so only call
+        # this when the font is about to be used
+        key = (name, size, True)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size)
+            self.fonts[key] = font
+        return font
+
+    # --- Sounds ---
+    def preload_sounds(self, names):
+        # Start decoding sound files on a background thread
+        with self.sound_lock:
+            names = [name for name in names if name not in self.sound_ready]
+            for name in names:
+                self.sound_ready[name] = threading.Event()
+        if not names:
+            return
+        self.loader = threading.Thread(target=self._load_sounds, args=(names,), daemon=True)
+        self.loader.start()
+
+    def _load_sounds(self, names):
+        for name in names:
+            self.sounds[name] = self._decode(name)
+            self.sound_ready[name].set()
+
+    def _decode(self, name):
+        try:
+            return pygame.mixer.Sound(self.path(name))
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Warning: Sound file not found. {e}")
+            return DummySound()
+
+    def sound(self, name):
+        with self.sound_lock:
+            ready = self.sound_ready.get(name)
+            if ready is None:
+                ready = self.sound_ready[name] = threading.Event()
+                loading = False
+            else:
+                loading = True
+        if not loading:
+            self.sounds[name] = self._decode(name)
+            ready.set()
+        ready.wait()
+        return self.sounds[name]
+
+    # --- Surfaces ---
+    def surface(self, key, factory, group=None, size=surface_bytes):
+        # Cached factory() result. size(value) is its cost in bytes against
+        # the budget (surface_bytes for plain Surfaces)
+        entry = self.surfaces.get(key)
+        if entry is not None:
+            self.surfaces.move_to_end(key)
+            return entry[0]
+        value = factory()
+        nbytes = size(value) if group is not None else 0
+        self.surfaces[key] = (value, nbytes, group)
+        self.used += nbytes
+        if self.used > self.budget:
+            self._evict(keep=key)
+        return value
+
+    def image(self, name, group=None):
+        # An image file next to the code, converted for fast blitting
+        def load():
+            surface = pygame.image.load(self.path(name))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            return surface
+        return self.surface(('image', name), load, group)
+
+    def _evict(self, keep):
+        for key in list(self.surfaces):
+            if self.used <= self.budget:
+                break
+            value, nbytes, group = self.surfaces[key]
+            if group is None or key == keep:
+                continue
+            del self.surfaces[key]
+            self.used -= nbytes
+            self.evictions += 1
+
+    def release(self, group):
+        # Drop every surface of a group, e.g. when a level is left
+        for key in [key for key, entry in self.surfaces.items() if entry[2] == group]:
+            self.used -= self.surfaces.pop(key)[1]
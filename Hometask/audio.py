@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+
+import pygame
+
+
+class AudioScheduler:
+    # Plays game sounds without letting collisions flood the mixer.
+    #
+    # * Every sound gets a fixed pool of mixer channels (voices). A new play
+    #   cuts the voice of its own pool that started first if they are all
+    #   busy; other sounds' voices are never touched.
+    # * Plays of the same sound within `window` seconds are coalesced into
+    #   one, so a frame full of bounces is a single bounce.
+    # * play() only puts the name on a queue; a worker thread starts the
+    #   channels, so the game loop never waits on the mixer.
+    #
+    # Sounds without a voice pool (a DummySound, or no mixer) are just
+    # played directly.
+    def __init__(self, window=0.03, threaded=True):
+        self.window = window
+        self.sounds = {}
+        self.voices = {}
+        self.next_voice = {}
+        self.last_play = {}
+        self.requested = 0
+        self.coalesced = 0
+        self.played = 0
+        self.cut = 0
+        self.queue = queue.SimpleQueue()
+        self.worker = None
+        if threaded:
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def add(self, name, sound, voices=2):
+        # Register a sound with its own pool of `voices` mixer channels
+        self.sounds[name] = sound
+        self.last_play[name] = float('-inf')
+        if not isinstance(sound, pygame.mixer.Sound) or not pygame.mixer.get_init():
+            return
+        first = sum(len(pool) for pool in self.voices.values())
+        total = first + voices
+        if pygame.mixer.get_num_channels() < total:
+            pygame.mixer.set_num_channels(total)
+        # Reserved channels are never picked by a plain Sound.play()
+        pygame.mixer.set_reserved(total)
+        self.voices[name] = [pygame.mixer.Channel(i) for i in range(first, total)]
+        self.next_voice[name] = 0
+
+    def play(self, name):
+        # Called from the game loop: constant time, whatever the mixer does
+        self.requested += 1
+        now = time.perf_counter()
+        if now - self.last_play[name] < self.window:
+            self.coalesced += 1
+            return
+        self.last_play[name] = now
+        if self.worker is None:
+            self._start(name)
+        else:
+            self.queue.put(name)
+
+    def _run(self):
+        while True:
+            name = self.queue.get()
+            if name is None:
+                return
+            self._start(name)
+
+    def _start(self, name):
+        sound = self.sounds[name]
+        pool = self.voices.get(name)
+        if not pool:
+            sound.play()
+            self.played += 1
+            return
+        # Voices are used in turn, so the next one is the one that started
+        # first; it is cut if it is still playing
+        index = self.next_voice[name]
+        channel = pool[index]
+        self.next_voice[name] = (index + 1) % len(pool)
+        if channel.get_busy():
+            self.cut += 1
+        channel.play(sound)
+        self.played += 1
+
+    def close(self):
+        if self.worker is not None:
+            self.queue.put(None)
+            self.worker.join()
+            self.worker = None
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import Telemetry
+
+# Time a background coroutine leaves free before the frame deadline, in
+# seconds: a step of background work is expected to take less than this
+SLICE = 0.002
+
+
+def write_file(path, data):
+    # Written next to the file first, so a crash mid-write never leaves a
+    # half-written save or replay behind
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class BackgroundIO:
+    # Work the asyncio game loop hands off so frames never wait on it:
+    #   write(fn, *args)  file work, on one thread so writes keep their order
+    #   run(fn, *args)    anything else slow (decoding a level or a save
+    #                     file), on a small thread pool
+    #   report(name, ...) a telemetry event, batched and sent by a
+    #                     background task (see telemetry.py)
+    # Both return asyncio futures; the game checks them at the start of a
+    # frame, so results are always used between two frames.
+    #
+    # Frames themselves never await: coroutines only run while the loop
+    # waits for the next frame (FramePacer.tick), after the frame has been
+    # flipped. FramePacer opens that window with the deadline of the next
+    # frame, and background coroutines call pause() between steps of their
+    # work, so a step never starts after the deadline and the next
+    # display.flip is not delayed by it.
+    def __init__(self, workers=2):
+        self.files = ThreadPoolExecutor(max_workers=1, thread_name_prefix='files')
+        self.workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='workers')
+        self.pending = set()
+        self.deadline = 0.0
+        self.window = None
+        self.telemetry = None
+
+    def _submit(self, executor, fn, args):
+        future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        return future
+
+    def write(self, fn, *args):
+        # Writes are mostly fired and forgotten, so their errors are printed
+        future = self._submit(self.files, fn, args)
+        future.add_done_callback(self._report_error)
+        return future
+
+    def run(self, fn, *args):
+        return self._submit(self.workers, fn, args)
+
+    def _report_error(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"background write failed: {future.exception()!r}", file=sys.stderr)
+
+    async def start_telemetry(self, address):
+        self.telemetry = Telemetry(self, address)
+        await self.telemetry.start()
+
+    def report(self, name, **fields):
+        if self.telemetry is not None:
+            self.telemetry.add(name, fields)
+
+    def busy(self):
+        # Whether there is background work the loop has to keep running for
+        return bool(self.pending) or (self.telemetry is not None and bool(self.telemetry.queue))
+
+    # --- Frame deadline ---
+
+    def open_window(self, deadline):
+        # The frame is on the screen: background coroutines may run until
+        # `deadline` (time.perf_counter), when the next frame starts
+        self.deadline = deadline
+        if self.window is not None:
+            if not self.window.done():
+                self.window.set_result(None)
+            self.window = None
+
+    def time_left(self):
+        return self.deadline - time.perf_counter()
+
+    async def pause(self):
+        # Called by background coroutines between steps of their work:
+        # returns right away while the current window has time left,
+        # otherwise once the next frame has been flipped
+        if self.time_left() > SLICE:
+            await asyncio.sleep(0)
+            return
+        if self.window is None:
+            self.window = asyncio.get_running_loop().create_future()
+        await self.window
+
+    async def close(self):
+        # Finish the work handed off so far (saves, the last telemetry)
+        # and stop the threads
+        self.open_window(float('inf'))
+        if self.telemetry is not None:
+            await self.telemetry.close()
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        self.files.shutdown()
+        self.workers.shutdown()
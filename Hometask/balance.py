@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import sys
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pygame
+
+from simulation import GameSimulation, FrameInput, LEVELS, DIFFICULTIES, POWERUP_TYPES
+from level_pack import LevelPack, DEFAULT_PACK
+from physics import sweep_circle_rect
+
+# Monte-Carlo balance runner: plays many headless games of each
+# (difficulty, level) cell with a scripted paddle and reports how often the
+# level gets cleared, how long it takes and which power-ups get picked up.
+#
+#   python balance.py --games 1000 --workers 8
+
+MAX_TICKS = 60 * 60 * 10  # give up on a game after ten minutes of play
+
+# Ticks the scripted paddle follows a ball ahead, at most
+MAX_TRACE = 600
+# sim -> the scripted paddle's predictions for its balls (see paddle_ai)
+_predictions = weakref.WeakKeyDictionary()
+
+# Level packs opened by this process, by path
+_packs = {}
+
+
+def open_pack(path):
+    # None (the built-in levels) for no path
+    if path is None:
+        return None
+    if path not in _packs:
+        _packs[path] = LevelPack(path)
+    return _packs[path]
+
+
+def landing_x(x, y, speed_x, speed_y, paddle_y, radius, width):
+    # Where a ball at (x, y) coming down gets to paddle_y, bouncing off the
+    # side walls on the way, and in how many ticks
+    ticks = max(paddle_y - y, 0) / speed_y
+    # Unfold the reflections: the ball moves freely on a line twice the
+    # width between the walls, folded back at each wall
+    span = width - 2 * radius
+    position = (x - radius + speed_x * ticks) % (2 * span)
+    if position > span:
+        position = 2 * span - position
+    return radius + position, ticks
+
+
+def trace_ball(bricks, x, y, speed_x, speed_y, paddle_y, radius, width, max_ticks=MAX_TRACE):
+    # Follow a ball tick by tick the way BallSystem moves it, bouncing off
+    # the walls, the ceiling and the bricks (which are not broken), until it
+    # is below the bricks and coming down; then landing_x takes it to
+    # paddle_y. Returns (x, ticks) where it gets there.
+    bottom = bricks.bounds.bottom if bricks.bounds is not None else 0
+    for tick in range(max_ticks):
+        if speed_y > 0 and y - radius > bottom:
+            landing, ticks = landing_x(x, y, speed_x, speed_y, paddle_y, radius, width)
+            return landing, tick + ticks
+        area = pygame.Rect(min(x, x + speed_x) - radius - 1, min(y, y + speed_y) - radius - 1,
+                           abs(speed_x) + 2 * radius + 2, abs(speed_y) + 2 * radius + 2)
+        first = None
+        for brick in bricks.candidates(area):
+            hit = sweep_circle_rect(x, y, speed_x, speed_y, radius, brick.rect)
+            if hit is not None and (first is None or hit[0] < first[0]):
+                first = hit
+        if first is not None:
+            t, nx, ny = first
+            x += speed_x * t
+            y += speed_y * t
+            dot = speed_x * nx + speed_y * ny
+            speed_x -= 2 * dot * nx
+            speed_y -= 2 * dot * ny
+        else:
+            x += speed_x
+            y += speed_y
+        if x < radius or x > width - radius:
+            speed_x = -speed_x
+            x = 2 * radius - x if x < radius else 2 * (width - radius) - x
+        if y < radius:
+            speed_y = -speed_y
+            y = 2 * radius - y
+    return x, max_ticks
+
+
+def paddle_ai(sim, dead_zone=8):
+    # Move to where the next ball will come down, fire lasers whenever
+    # possible and launch glued balls right away
+    paddle = sim.paddle
+    balls = sim.balls
+    n = len(balls)
+    left = right = False
+    if n:
+        paddle_y = paddle.rect.top - balls.radius
+        radius = balls.radius
+        bottom = sim.bricks.bounds.bottom if sim.bricks.bounds is not None else 0
+        moving = [ball for ball in zip(balls.x[:n].tolist(), balls.y[:n].tolist(), balls.speed_x[:n].tolist(),
+                                       balls.speed_y[:n].tolist(), balls.is_glued[:n].tolist())
+                  if not ball[4] and ball[3]]
+        target = None
+        soonest = None
+        # Balls already coming down below the bricks land where landing_x
+        # says; the others are only traced when there are none of those
+        for x, y, speed_x, speed_y, glued in moving:
+            if speed_y > 0 and y - radius > bottom:
+                landing, ticks = landing_x(x, y, speed_x, speed_y, paddle_y, radius, sim.screen_width)
+                if soonest is None or ticks < soonest:
+                    target, soonest = landing, ticks
+        if target is None and moving:
+            # The path of a ball only changes when it bounces or a brick
+            # breaks, so a prediction is kept for as long as the ball stays
+            # on the same line (x * speed_y - y * speed_x is constant on it)
+            cache = _predictions.setdefault(sim, {})
+            if len(cache) > 256:
+                cache.clear()
+            for x, y, speed_x, speed_y, glued in moving:
+                key = (speed_x, speed_y, round(x * speed_y - y * speed_x), len(sim.bricks))
+                landing = cache.get(key)
+                if landing is None:
+                    landing, ticks = trace_ball(sim.bricks, x, y, speed_x, speed_y, paddle_y, radius,
+                                                sim.screen_width)
+                    landing = cache[key] = (landing, sim.frame + ticks)
+                if soonest is None or landing[1] < soonest:
+                    target, soonest = landing
+        if target is not None:
+            if target < paddle.rect.centerx - dead_zone:
+                left = True
+            elif target > paddle.rect.centerx + dead_zone:
+                right = True
+    return FrameInput(left, right, paddle.has_laser, True)
+
+
+def play_level(difficulty, level, seed, max_ticks=MAX_TICKS, level_pack=None):
+    # One game on one level. Returns (cleared, ticks, points, pickups)
+    sim = GameSimulation(difficulty, level=level, seed=seed, level_pack=level_pack)
+    pickups = dict.fromkeys(POWERUP_TYPES, 0)
+    while sim.status == 'playing' and sim.frame < max_ticks:
+        for name, data in sim.step(paddle_ai(sim)):
+            if name == 'power_up':
+                pickups[data] += 1
+    cleared = sim.status in ('level_cleared', 'won')
+    return cleared, sim.frame, sim.points, pickups
+
+
+def new_totals():
+    return {
+        'games': 0, 'cleared': 0, 'clear_ticks': 0, 'ticks': 0, 'points': 0,
+        'timeouts': 0, 'pickups': dict.fromkeys(POWERUP_TYPES, 0),
+    }
+
+
+def run_chunk(difficulty, level, first_seed, games, max_ticks, pack_path=None):
+    # Worker entry point: plays a batch of games and returns partial sums,
+    # so only a few numbers travel back to the parent process
+    totals = new_totals()
+    pack = open_pack(pack_path)
+    for seed in range(first_seed, first_seed + games):
+        cleared, ticks, points, pickups = play_level(difficulty, level, seed, max_ticks, pack)
+        totals['games'] += 1
+        totals['ticks'] += ticks
+        totals['points'] += points
+        if cleared:
+            totals['cleared'] += 1
+            totals['clear_ticks'] += ticks
+        elif ticks >= max_ticks:
+            totals['timeouts'] += 1
+        for type, count in pickups.items():
+            totals['pickups'][type] += count
+    return difficulty, level, totals
+
+
+def merge(into, part):
+    for key, value in part.items():
+        if key == 'pickups':
+            for type, count in value.items():
+                into['pickups'][type] += count
+        else:
+            into[key] += value
+
+
+def summarize(totals):
+    games = totals['games']
+    cleared = totals['cleared']
+    return {
+        'games': games,
+        'clear_rate': cleared / games if games else 0.0,
+        'mean_ticks_to_clear': totals['clear_ticks'] / cleared if cleared else None,
+        'mean_ticks': totals['ticks'] / games if games else 0.0,
+        'mean_points': totals['points'] / games if games else 0.0,
+        'timeouts': totals['timeouts'],
+        'pickups_per_game': {type: count / games for type, count in totals['pickups'].items()} if games else {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many Arkanoid games per difficulty and level")
+    parser.add_argument('--games', type=int, default=200, help="games per (difficulty, level) cell")
+    parser.add_argument('--difficulties', nargs='+', default=list(DIFFICULTIES), choices=list(DIFFICULTIES))
+    parser.add_argument('--pack', metavar='FILE',
+                        help="level pack to play (default: the game's levels.arkl, or the built-in levels)")
+    parser.add_argument('--builtin', action='store_true', help="play the built-in levels, not a pack")
+    parser.add_argument('--levels', nargs='+', type=int, help="level numbers, starting at 0 (default: all)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--chunk', type=int, default=50, help="games per task sent to a worker")
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS, help="tick limit per game")
+    parser.add_argument('--seed', type=int, default=0, help="first seed; game i uses seed + i")
+    parser.add_argument('--json', metavar='FILE', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    # The same levels main.py plays unless told otherwise
+    pack_path = args.pack
+    if pack_path is None and not args.builtin and os.path.exists(DEFAULT_PACK):
+        pack_path = DEFAULT_PACK
+    level_count = len(open_pack(pack_path)) if pack_path else len(LEVELS)
+    if args.levels is None:
+        args.levels = list(range(level_count))
+    for level in args.levels:
+        if not 0 <= level < level_count:
+            parser.error(f"level {level} does not exist (0-{level_count - 1})")
+
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = []
+        for difficulty in args.difficulties:
+            for level in args.levels:
+                results[(difficulty, level)] = new_totals()
+                for first in range(0, args.games, args.chunk):
+                    games = min(args.chunk, args.games - first)
+                    futures.append(pool.submit(run_chunk, difficulty, level, args.seed + first, games,
+                                               args.max_ticks, pack_path))
+        for future in as_completed(futures):
+            difficulty, level, totals = future.result()
+            merge(results[(difficulty, level)], totals)
+    elapsed = time.perf_counter() - start
+
+    summary = {f"{difficulty}/{level}": summarize(totals) for (difficulty, level), totals in results.items()}
+    total_games = sum(totals['games'] for totals in results.values())
+    print(f"{total_games} games in {elapsed:.1f}s on {args.workers} workers, "
+          f"levels from {pack_path or 'the built-in LEVELS'}")
+    print(f"{'cell':<12} {'clear':>6} {'ticks to clear':>15} {'points':>8}  pickups per game")
+    for cell, stats in summary.items():
+        to_clear = stats['mean_ticks_to_clear']
+        to_clear = f"{to_clear:.0f}" if to_clear is not None else "-"
+        pickups = ' '.join(f"{type}={count:.2f}" for type, count in stats['pickups_per_game'].items())
+        print(f"{cell:<12} {stats['clear_rate']:>6.1%} {to_clear:>15} {stats['mean_points']:>8.1f}  {pickups}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'games_per_cell': args.games, 'seconds': elapsed, 'cells': summary}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,338 @@
+import random
+
+import numpy as np
+import pygame
+
+from game_objects import Ball
+from physics import sweep_circle_rect_many
+
+# Per-ball results of BallSystem.update()
+EVENT_NONE = 0
+EVENT_WALL = 1
+EVENT_PADDLE = 2
+EVENT_LOST = 3
+
+_COLLISION_EVENTS = {None: EVENT_NONE, 'wall': EVENT_WALL, 'paddle': EVENT_PADDLE}
+
+
+class BallSystem:
+    # All balls of a game in NumPy arrays (center, speed, slow timer, glued
+    # flag), stepped together. It follows exactly the rules of Ball.update:
+    #
+    # * balls in open space (most of a big multiball swarm) are moved with
+    #   array operations: glue, slow timers, swept wall and paddle contacts
+    #   and the lost check are done with masks;
+    # * the few balls whose move this tick could reach the brick area are
+    #   stepped one by one through a scratch Ball, because brick contacts
+    #   need the brick grid and break bricks as they go.
+    RADIUS = 10
+    COLOR = (200, 200, 200)
+    MAX_CONTACTS = Ball.MAX_CONTACTS
+    # Below this many balls array operations cost more than they save, so
+    # every ball takes the one-by-one path
+    VECTOR_MIN = 32
+
+    def __init__(self, screen_width, screen_height, rng=random, capacity=16):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.rng = rng
+        self.radius = self.RADIUS
+        self.base_speed = 6
+        self.count = 0
+        self.capacity = 0
+        self.x = self.y = self.speed_x = self.speed_y = None
+        self.slow_timer = self.is_slowed = self.is_glued = None
+        self._resize(capacity)
+        # Used for balls near the bricks; created with the module rng so it
+        # does not draw from the game's random stream
+        self.scratch = Ball(screen_width, screen_height)
+        self.scratch.rng = rng
+        self.sprite = None
+
+    def _resize(self, capacity):
+        def grow(array, dtype):
+            new = np.zeros(capacity, dtype=dtype)
+            if array is not None:
+                new[:self.count] = array[:self.count]
+            return new
+        self.x = grow(self.x, np.float64)
+        self.y = grow(self.y, np.float64)
+        self.speed_x = grow(self.speed_x, np.float64)
+        self.speed_y = grow(self.speed_y, np.float64)
+        self.slow_timer = grow(self.slow_timer, np.int64)
+        self.is_slowed = grow(self.is_slowed, bool)
+        self.is_glued = grow(self.is_glued, bool)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, speed_x, speed_y):
+        if self.count == self.capacity:
+            self._resize(self.capacity * 2)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.speed_x[i] = speed_x
+        self.speed_y[i] = speed_y
+        self.slow_timer[i] = 0
+        self.is_slowed[i] = False
+        self.is_glued[i] = False
+        self.count += 1
+        return i
+
+    def spawn_new(self):
+        # A ball in the middle of the screen, like Ball.reset()
+        return self.spawn(self.screen_width // 2, self.screen_height // 2,
+                          self.base_speed * self.rng.choice((1, -1)), -self.base_speed)
+
+    def reset_all(self):
+        for i in range(self.count):
+            self.x[i] = self.screen_width // 2
+            self.y[i] = self.screen_height // 2
+            self.speed_x[i] = self.base_speed * self.rng.choice((1, -1))
+            self.speed_y[i] = -self.base_speed
+        n = self.count
+        self.slow_timer[:n] = 0
+        self.is_slowed[:n] = False
+        self.is_glued[:n] = False
+
+    def slow(self):
+        # The 'slow' power-up, for every ball that is not slowed yet
+        n = self.count
+        fresh = ~self.is_slowed[:n]
+        self.speed_x[:n][fresh] /= 2
+        self.speed_y[:n][fresh] /= 2
+        self.is_slowed[:n][fresh] = True
+        self.slow_timer[:n][fresh] = 600
+
+    def remove(self, mask):
+        # Drop the balls where mask is True, keeping the others in order
+        n = self.count
+        keep = ~mask[:n]
+        live = int(np.count_nonzero(keep))
+        for array in self.arrays():
+            array[:live] = array[:n][keep]
+        self.count = live
+
+    def arrays(self):
+        # Every per-ball array, always in this order
+        return (self.x, self.y, self.speed_x, self.speed_y, self.slow_timer, self.is_slowed, self.is_glued)
+
+    def set_count(self, count):
+        # Make room for `count` balls and make them live; the caller fills
+        # in their values (see snapshot.py)
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._resize(capacity)
+        self.count = count
+
+    def update(self, paddle, launch_ball=False, bricks=None, break_brick=None):
+        # Advance every ball by one tick. break_brick(brick) is called for
+        # each brick hit, right away, so later balls cannot hit it again if
+        # it broke.
+        # Returns an EVENT_* code per ball, or None if no ball bounced or
+        # was lost; lost balls are not removed.
+        n = self.count
+        if n < self.VECTOR_MIN:
+            codes = [self._update_one(i, paddle, launch_ball, bricks, break_brick) for i in range(n)]
+            return np.array(codes, dtype=np.int8) if any(codes) else None
+        events = np.zeros(n, dtype=np.int8)
+        radius = self.radius
+
+        glued = self.is_glued[:n].copy()
+        if glued.any():
+            index = np.flatnonzero(glued)
+            self.x[index] = paddle.rect.centerx
+            self.y[index] = paddle.rect.top - radius
+            if launch_ball:
+                for i in index.tolist():
+                    self.is_glued[i] = False
+                    self.speed_x[i] = self.base_speed * self.rng.choice((1, -1))
+                    self.speed_y[i] = -self.base_speed
+        active = ~glued
+
+        near = np.zeros(n, dtype=bool)
+        if bricks is not None and bricks and bricks.bounds is not None:
+            # How far a ball can get this tick (speed may double when a
+            # slow wears off), plus its radius
+            x, y = self.x[:n], self.y[:n]
+            reach = 2 * (np.abs(self.speed_x[:n]) + np.abs(self.speed_y[:n])) + radius + 1
+            area = bricks.bounds
+            near = active & (x + reach > area.left) & (x - reach < area.right) & \
+                (y + reach > area.top) & (y - reach < area.bottom)
+            for i in np.flatnonzero(near).tolist():
+                events[i] = self._update_one(i, paddle, launch_ball, bricks, break_brick)
+
+        moving = active & ~near
+        if moving.any():
+            self._update_many(np.flatnonzero(moving), paddle, events)
+        return events if events.any() else None
+
+    def _update_one(self, i, paddle, launch_ball, bricks, break_brick):
+        ball = self.scratch
+        ball.move_to(self.x.item(i), self.y.item(i))
+        ball.speed_x = self.speed_x.item(i)
+        ball.speed_y = self.speed_y.item(i)
+        ball.slow_timer = self.slow_timer.item(i)
+        ball.is_slowed = self.is_slowed.item(i)
+        ball.is_glued = self.is_glued.item(i)
+        ball.base_speed = self.base_speed
+        status, collision_object, hit_bricks = ball.update(paddle, launch_ball, bricks)
+        self.x[i] = ball.x
+        self.y[i] = ball.y
+        self.speed_x[i] = ball.speed_x
+        self.speed_y[i] = ball.speed_y
+        self.slow_timer[i] = ball.slow_timer
+        self.is_slowed[i] = ball.is_slowed
+        self.is_glued[i] = ball.is_glued
+        if break_brick is not None:
+            for brick in hit_bricks:
+                break_brick(brick)
+        if status == 'lost':
+            return EVENT_LOST
+        return _COLLISION_EVENTS[collision_object]
+
+    def _update_many(self, index, paddle, events):
+        radius = self.radius
+        prect = paddle.rect
+
+        slowed = self.is_slowed[index]
+        if slowed.any():
+            timer = self.slow_timer[index] - slowed
+            expired = slowed & (timer <= 0)
+            self.slow_timer[index] = timer
+            self.speed_x[index] = np.where(expired, self.speed_x[index] * 2, self.speed_x[index])
+            self.speed_y[index] = np.where(expired, self.speed_y[index] * 2, self.speed_y[index])
+            self.is_slowed[index] = slowed & ~expired
+
+        x = self.x[index]
+        y = self.y[index]
+        vx = self.speed_x[index]
+        vy = self.speed_y[index]
+        remaining = np.ones(len(index))
+        last = np.zeros(len(index), dtype=np.int8)
+        live = np.ones(len(index), dtype=bool)
+        # With glue on the paddle, the first ball (in ball order) to touch
+        # it sticks where it touched; the state of every ball at its first
+        # paddle contact is kept until the loop tells which one that is
+        glue = paddle.has_glue
+        glue_hit = np.zeros(len(index), dtype=bool)
+        glue_x = glue_y = glue_vx = glue_vy = None
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for _ in range(self.MAX_CONTACTS):
+                if not live.any():
+                    break
+                dx = vx * remaining
+                dy = vy * remaining
+
+                # Walls are planes at x = 0, x = screen_width and y = 0
+                best = np.full(len(index), np.inf)
+                nx = np.zeros(len(index))
+                ny = np.zeros(len(index))
+                t = (radius - x) / dx
+                hit = (dx < 0) & (t <= 1)
+                best = np.where(hit, np.maximum(t, 0), best)
+                nx = np.where(hit, 1.0, nx)
+                t = (self.screen_width - radius - x) / dx
+                hit = (dx > 0) & (t <= 1)
+                best = np.where(hit, np.maximum(t, 0), best)
+                nx = np.where(hit, -1.0, nx)
+                t = np.maximum((radius - y) / dy, 0)
+                hit = (dy < 0) & ((radius - y) / dy <= 1) & (t < best)
+                best = np.where(hit, t, best)
+                nx = np.where(hit, 0.0, nx)
+                ny = np.where(hit, 1.0, ny)
+                paddle_hit = np.zeros(len(index), dtype=bool)
+
+                down = vy > 0
+                if down.any():
+                    t, pnx, pny = sweep_circle_rect_many(x, y, dx, dy, radius, prect)
+                    hit = down & (t < best)
+                    best = np.where(hit, t, best)
+                    nx = np.where(hit, pnx, nx)
+                    ny = np.where(hit, pny, ny)
+                    paddle_hit |= hit
+                    # The paddle moved into the ball
+                    cx = np.round(x)
+                    cy = np.round(y)
+                    overlap = down & (cx - radius < prect.right) & (cx + radius > prect.left) & \
+                        (cy - radius < prect.bottom) & (cy + radius > prect.top)
+                    best = np.where(overlap, 0.0, best)
+                    paddle_hit |= overlap
+
+                contact = live & (best <= 1)
+                free = live & ~contact
+                x = np.where(free, x + dx, x)
+                y = np.where(free, y + dy, y)
+                live = contact
+                if not contact.any():
+                    break
+
+                x = np.where(contact, x + dx * best, x)
+                y = np.where(contact, y + dy * best, y)
+                remaining = np.where(contact, remaining * (1 - best), remaining)
+
+                on_paddle = contact & paddle_hit
+                if on_paddle.any():
+                    # The paddle always sends the ball back up
+                    vy = np.where(on_paddle, -np.abs(vy), vy)
+                    last = np.where(on_paddle, EVENT_PADDLE, last)
+                    if glue:
+                        first = on_paddle & ~glue_hit
+                        if glue_x is None:
+                            glue_x, glue_y, glue_vx, glue_vy = x.copy(), y.copy(), vx.copy(), vy.copy()
+                        else:
+                            glue_x = np.where(first, x, glue_x)
+                            glue_y = np.where(first, y, glue_y)
+                            glue_vx = np.where(first, vx, glue_vx)
+                            glue_vy = np.where(first, vy, glue_vy)
+                        glue_hit |= first
+
+                # Bounce on the dominant axis of the contact normal
+                on_wall = contact & ~paddle_hit
+                flip_x = on_wall & (np.abs(nx) > np.abs(ny))
+                flip_y = on_wall & ~(np.abs(nx) > np.abs(ny))
+                vx = np.where(flip_x, np.where(nx > 0, np.abs(vx), -np.abs(vx)), vx)
+                vy = np.where(flip_y, np.where(ny > 0, np.abs(vy), -np.abs(vy)), vy)
+                last = np.where(on_wall, EVENT_WALL, last)
+
+        if glue_hit.any():
+            first = np.flatnonzero(glue_hit)[0]
+            x[first] = glue_x[first]
+            y[first] = glue_y[first]
+            vx[first] = glue_vx[first]
+            vy[first] = glue_vy[first]
+            last[first] = EVENT_PADDLE
+            self.is_glued[index[first]] = True
+            paddle.has_glue = False
+
+        self.x[index] = x
+        self.y[index] = y
+        self.speed_x[index] = vx
+        self.speed_y[index] = vy
+        lost = np.round(y) - radius > self.screen_height
+        events[index] = np.where(lost, EVENT_LOST, last)
+
+    def draw(self, screen):
+        # Draws every ball with one Surface.blits call and returns the rects
+        if self.sprite is None:
+            size = self.radius * 2
+            self.sprite = pygame.Surface((size, size))
+            self.sprite.fill((0, 0, 0))
+            self.sprite.set_colorkey((0, 0, 0))
+            pygame.draw.ellipse(self.sprite, self.COLOR, self.sprite.get_rect())
+        n = self.count
+        left = (np.round(self.x[:n]) - self.radius).astype(int).tolist()
+        top = (np.round(self.y[:n]) - self.radius).astype(int).tolist()
+        sprite = self.sprite
+        return screen.blits([(sprite, (px, py)) for px, py in zip(left, top)])
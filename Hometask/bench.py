@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Headless: no window and no sound card needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from assets import AssetManager
+from balance import paddle_ai
+from effects import EffectsBudget, LOW, NORMAL
+from game_objects import PowerUp, Firework
+from level_pack import LevelPack, pattern_cells, write_pack
+from particles import ParticlePool
+from profiler import FrameProfiler
+from renderer import Renderer
+from screens import StateScreens
+from simulation import GameSimulation
+from text_cache import TextCache
+
+# Frame-time benchmark: runs the per-frame work of main.py (simulation,
+# effects, drawing, display update) over fixed, seeded stress scenarios
+# with SDL's dummy video driver, and reports frames per second, frame
+# time percentiles and peak Python memory (tracemalloc, measured in a
+# second run so it does not slow the timed one).
+#
+#   python bench.py --save bench.json
+#   python bench.py --baseline bench.json     # exit code 1 on a regression
+
+BG_COLOR = (30, 30, 30)
+# Levels of the scenarios, written to a temporary level pack
+FULL_LEVEL = ["X" * 10] * 5
+DENSE_LEVEL = ["X" * 40] * 30
+
+
+class World:
+    # What main.py keeps between frames, for one scenario
+    def __init__(self, size, level, pack, difficulty='Normal', seed=0):
+        self.screen = pygame.display.set_mode(size)
+        self.width, self.height = size
+        self.assets = AssetManager()
+        self.renderer = Renderer(self.screen, BG_COLOR, assets=self.assets)
+        self.game_font = self.assets.font(40)
+        self.text_cache = TextCache()
+        PowerUp.prerender(self.assets.font(20))
+        self.level = level
+        self.sim = GameSimulation(difficulty, level=level, seed=seed, screen_width=self.width,
+                                  screen_height=self.height, level_pack=pack)
+        # The game never ends: the scenario decides how long it runs
+        self.sim.Attempts = 10 ** 6
+        self.particles = ParticlePool(capacity=8192, seed=seed)
+        self.effects = EffectsBudget(self.particles, max_particles=8192)
+        self.fireworks = []
+        # For the scenarios' own randomness
+        self.rng = random.Random(seed)
+        self.profiler = None
+
+    def playing_frame(self, inputs):
+        # One frame of the 'playing' state of main.py, one tick per frame
+        sim = self.sim
+        profiler = self.profiler
+        screen = self.screen
+        renderer = self.renderer
+        effects = self.effects
+        profiler.begin_frame()
+        profiler.lap('events')
+        events = sim.step(inputs)
+        if sim.status != 'playing':
+            sim.start_level(self.level)
+        for name, data in events:
+            if name == 'bounce':
+                effects.emit(data[0], data[1], (255, 255, 0), 5, 1, 3, 1, 3, 0, LOW)
+            elif name == 'brick_hit':
+                effects.emit(data.rect.centerx, data.rect.centery, data.color, 15, 1, 4, 1, 4, 0.05, NORMAL)
+            elif name == 'laser_hit':
+                effects.emit(data.rect.centerx, data.rect.centery, data.color, 10, 1, 3, 1, 3, 0.05, NORMAL)
+            elif name == 'brick_damaged':
+                effects.emit(data.rect.centerx, data.rect.centery, data.color, 5, 1, 3, 1, 3, 0.05, LOW)
+            elif name == 'explosion':
+                effects.emit(data.rect.centerx, data.rect.centery, (255, 140, 40), 40, 2, 5, 2, 6, 0.05, NORMAL)
+        profiler.lap('effects')
+
+        renderer.draw_background(sim.bricks)
+        renderer.add(sim.paddle.draw(screen))
+        for rect in sim.balls.draw(screen):
+            renderer.add(rect)
+        for power_up in sim.power_ups:
+            renderer.add(power_up.draw(screen))
+        for laser in sim.lasers:
+            renderer.add(laser.draw(screen))
+        points_text = self.text_cache.render(self.game_font, f"points: {sim.points}", (255, 255, 255))
+        renderer.add(screen.blit(points_text, (10, 10)))
+        self._finish_frame()
+
+    def win_frame(self, screens):
+        # One frame of the 'you_win' state of main.py
+        profiler = self.profiler
+        profiler.begin_frame()
+        profiler.lap('events')
+        self.renderer.invalidate()
+        self.screen.blit(screens.get(('you_win',)), (0, 0))
+        for firework in self.fireworks[:]:
+            firework.update()
+            if firework.is_dead():
+                self.fireworks.remove(firework)
+        for firework in self.fireworks:
+            firework.draw(self.screen)
+        self._finish_frame()
+
+    def _finish_frame(self):
+        profiler = self.profiler
+        profiler.lap('draw')
+        self.particles.update()
+        profiler.lap('particles')
+        self.renderer.add(self.particles.draw(self.screen))
+        profiler.lap('draw')
+        self.renderer.present()
+        profiler.lap('flip')
+        profiler.count('particles', len(self.particles))
+        profiler.end_frame()
+
+
+# --- Scenarios ---
+# Each one sets up a World and returns the function that plays one frame
+
+def full_level(world):
+    return lambda: world.playing_frame(paddle_ai(world.sim))
+
+
+def multiball(world, balls=50):
+    sim = world.sim
+
+    def frame():
+        # Lost balls are replaced, so there are always `balls` of them
+        while len(sim.balls) < balls:
+            sim.balls.spawn(world.rng.uniform(50, world.width - 50), world.height / 2,
+                            world.rng.choice((-1, 1)) * world.rng.uniform(2, 8), -world.rng.uniform(2, 8))
+        world.playing_frame(paddle_ai(sim))
+    return frame
+
+
+def particles(world, count=5000):
+    def frame():
+        # Keep about `count` sparks alive all over the screen
+        while len(world.particles) < count:
+            world.effects.emit(world.rng.uniform(0, world.width), world.rng.uniform(0, world.height),
+                               (255, 200, 50), 50, 1, 4, 1, 4, 0.05, NORMAL)
+        world.playing_frame(paddle_ai(world.sim))
+    return frame
+
+
+def lasers(world):
+    paddle = world.sim.paddle
+
+    def frame():
+        if paddle.power_up_timers['laser'] < 10:
+            paddle.activate_power_up('laser')
+        world.playing_frame(paddle_ai(world.sim))
+    return frame
+
+
+def fireworks(world):
+    screens = StateScreens((world.width, world.height), BG_COLOR, world.assets.font(70),
+                           world.game_font, world.assets)
+    world.effects.max_fireworks = 40
+
+    def frame():
+        # A new rocket every frame, instead of every 20 to 50
+        if world.effects.allow_firework(len(world.fireworks)):
+            world.fireworks.append(Firework(world.width, world.height, world.effects))
+        world.win_frame(screens)
+    return frame
+
+
+# name: (setup, screen size, level in the pack, description)
+SCENARIOS = {
+    'level': (full_level, (800, 600), 0, "full 10x5 level, one ball"),
+    'multiball': (multiball, (800, 600), 0, "full 10x5 level, 50 balls"),
+    'dense': (full_level, (800, 1600), 1, "40x30 grid of small bricks, one ball"),
+    'particles': (particles, (800, 600), 0, "5000 live particles"),
+    'lasers': (lasers, (800, 600), 0, "laser fire all the time"),
+    'fireworks': (fireworks, (800, 600), 0, "you_win screen with a rocket every frame"),
+}
+
+
+def run_scenario(name, pack, frames, warmup, seed, memory=False):
+    setup, size, level, description = SCENARIOS[name]
+    random.seed(seed)
+    world = World(size, level, pack, seed=seed)
+    frame = setup(world)
+    world.profiler = FrameProfiler(window=frames, enabled=True)
+    world.sim.profiler = world.profiler
+    for _ in range(warmup):
+        frame()
+    if memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        for _ in range(frames):
+            frame()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+    world.profiler = FrameProfiler(window=frames, enabled=True)
+    world.sim.profiler = world.profiler
+    start = time.perf_counter()
+    for _ in range(frames):
+        frame()
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = (t / 1e6 for t in FrameProfiler.percentiles(world.profiler.totals))
+    return {
+        'description': description,
+        'fps': frames / elapsed,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'max_ms': max(world.profiler.totals) / 1e6,
+        # p95 of each phase, to see where a regression comes from
+        'phases_p95_ms': {phase: times[1] for phase, times in world.profiler.report().items() if phase != 'frame'},
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Regressions of results against a baseline, as messages
+    found = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if now['fps'] < before['fps'] * (1 - tolerance):
+            found.append(f"{name}: {now['fps']:.0f} fps, was {before['fps']:.0f}")
+        if now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f"{name}: p95 {now['p95_ms']:.2f} ms, was {before['p95_ms']:.2f}")
+        if 'peak_kb' in now and 'peak_kb' in before and now['peak_kb'] > before['peak_kb'] * (1 + tolerance):
+            found.append(f"{name}: peak memory {now['peak_kb']:.0f} KB, was {before['peak_kb']:.0f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Arkanoid frame loop on stress scenarios")
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"scenarios to run, all by default: {', '.join(SCENARIOS)}")
+    parser.add_argument('--frames', type=int, default=600, help="timed frames per scenario")
+    parser.add_argument('--warmup', type=int, default=60, help="frames played before timing")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory run")
+    parser.add_argument('--save', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="relative slowdown or growth counted as a regression")
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r} ({', '.join(SCENARIOS)})")
+
+    pygame.init()
+    names = args.scenarios or list(SCENARIOS)
+    with tempfile.TemporaryDirectory() as tmp:
+        pack_path = os.path.join(tmp, 'bench.arkl')
+        write_pack(pack_path, [pattern_cells(FULL_LEVEL), pattern_cells(DENSE_LEVEL)])
+        pack = LevelPack(pack_path)
+        results = {}
+        print(f"{'scenario':<11} {'fps':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'peak KB':>8}")
+        for name in names:
+            stats = run_scenario(name, pack, args.frames, args.warmup, args.seed)
+            if not args.no_memory:
+                stats['peak_kb'] = run_scenario(name, pack, args.frames, args.warmup, args.seed, memory=True) / 1024
+            results[name] = stats
+            peak = f"{stats['peak_kb']:.0f}" if 'peak_kb' in stats else "-"
+            print(f"{name:<11} {stats['fps']:>8.0f} {stats['p50_ms']:>7.2f} {stats['p95_ms']:>7.2f} "
+                  f"{stats['p99_ms']:>7.2f} {stats['max_ms']:>7.2f} {peak:>8}")
+        pack.close()
+    pygame.quit()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'pygame': pygame.version.ver,
+                'machine': platform.machine(),
+                'frames': args.frames,
+                'scenarios': results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['scenarios']
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
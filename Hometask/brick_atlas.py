@@ -0,0 +1,42 @@
+import pygame
+
+
+class BrickAtlas:
+    # Every brick color of one brick size baked side by side on a single
+    # surface. A brick is drawn by blitting its tile's area of the atlas,
+    # so a whole wall of bricks is one Surface.blits call.
+    def __init__(self, width, height, colors=()):
+        self.width = width
+        self.height = height
+        self.colors = []
+        self.areas = {}
+        self.surface = None
+        for color in colors:
+            self.colors.append(tuple(color))
+        self._bake()
+
+    def _bake(self):
+        surface = pygame.Surface((max(1, len(self.colors)) * self.width, self.height))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.areas = {}
+        for i, color in enumerate(self.colors):
+            area = pygame.Rect(i * self.width, 0, self.width, self.height)
+            surface.fill(color, area)
+            self.areas[color] = area
+        self.surface = surface
+
+    def area(self, color):
+        # Tile of a color, adding it to the atlas the first time it is seen
+        color = tuple(color)
+        area = self.areas.get(color)
+        if area is None:
+            self.colors.append(color)
+            self._bake()
+            area = self.areas[color]
+        return area
+
+    def blit_item(self, brick):
+        # A (source, dest, area) entry for Surface.blits
+        area = self.area(brick.color)
+        return (self.surface, brick.rect, area)
@@ -0,0 +1,172 @@
+import numpy as np
+
+
+class BrickGrid:
+    # Uniform grid over the brick area. Every cell remembers the bricks that
+    # overlap it, so a ball or a laser only has to look at the few cells its
+    # rect touches instead of scanning the whole level.
+    #
+    # A level grid (shape=(rows, columns), as load_level builds it) has one
+    # cell per brick slot and each brick fits in a single cell. Cells are
+    # then a (row, column) table instead of a dict, and the grid also keeps
+    #   occupancy   (rows, columns) uint8 array, 1 where a brick stands
+    #   row_counts  breakable bricks left on each row (their total is
+    #               `breakable`, kept for every grid)
+    # up to date, so adding, removing, cell lookups (brick_at, cell_of) and
+    # the level cleared check (breakable == 0) are all O(1).
+    def __init__(self, cell_width, cell_height, origin=(0, 0), shape=None):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.origin_x, self.origin_y = origin
+        self.cells = {}
+        # brick -> list of cells it was inserted into (used for O(1) removal),
+        # or its (row, column) in a level grid
+        self.brick_cells = {}
+        self.shape = shape
+        self.slots = self.occupancy = self.row_counts = None
+        if shape is not None:
+            rows, columns = shape
+            self.slots = [[None] * columns for _ in range(rows)]
+            self.occupancy = np.zeros(shape, dtype=np.uint8)
+            self.row_counts = np.zeros(rows, dtype=np.int32)
+        # brick -> insertion index, so hits come back in the same order
+        # as the old `for brick in bricks` scan
+        self.order = {}
+        self.next_index = 0
+        # Bricks that have to break to clear the level (not indestructible)
+        self.breakable = 0
+        # Bricks whose look changed (a hit took hit points off them) since
+        # the renderer last picked them up
+        self.changed = {}
+        # Bricks removed since the renderer last picked them up
+        self.removed = {}
+        # Rect around every brick ever added (it does not shrink as bricks
+        # break, so it is a safe over-estimate of where bricks can be)
+        self.bounds = None
+
+    def __len__(self):
+        return len(self.order)
+
+    def __bool__(self):
+        return bool(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __contains__(self, brick):
+        return brick in self.order
+
+    def _cell_range(self, rect):
+        col_start = (rect.left - self.origin_x) // self.cell_width
+        col_end = (rect.right - 1 - self.origin_x) // self.cell_width
+        row_start = (rect.top - self.origin_y) // self.cell_height
+        row_end = (rect.bottom - 1 - self.origin_y) // self.cell_height
+        for row in range(row_start, row_end + 1):
+            for col in range(col_start, col_end + 1):
+                yield (row, col)
+
+    def cell(self, x, y):
+        # (row, column) of the cell containing the point (x, y)
+        return (y - self.origin_y) // self.cell_height, (x - self.origin_x) // self.cell_width
+
+    def cell_of(self, brick):
+        # (row, column) of a brick of a level grid
+        return self.brick_cells[brick]
+
+    def brick_at(self, row, col):
+        # The brick standing in a cell of a level grid, or None
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return self.slots[row][col]
+        return None
+
+    def add(self, brick):
+        if self.slots is not None:
+            self._add_to_slot(brick)
+        else:
+            keys = list(self._cell_range(brick.rect))
+            for key in keys:
+                self.cells.setdefault(key, {})[brick] = None
+            self.brick_cells[brick] = keys
+        self.order[brick] = self.next_index
+        self.next_index += 1
+        if not brick.properties['indestructible']:
+            self.breakable += 1
+        self.bounds = brick.rect.copy() if self.bounds is None else self.bounds.union(brick.rect)
+
+    def _add_to_slot(self, brick):
+        rect = brick.rect
+        row, col = self.cell(rect.left, rect.top)
+        if self.cell(rect.right - 1, rect.bottom - 1) != (row, col):
+            raise ValueError(f"brick at {rect.topleft} does not fit in one cell")
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            raise ValueError(f"brick at {rect.topleft} is outside the {self.shape} grid")
+        if self.slots[row][col] is not None:
+            raise ValueError(f"cell {(row, col)} already has a brick")
+        self.slots[row][col] = brick
+        self.occupancy[row, col] = 1
+        if not brick.properties['indestructible']:
+            self.row_counts[row] += 1
+        self.brick_cells[brick] = (row, col)
+
+    def remove(self, brick):
+        cells = self.brick_cells.pop(brick)
+        if self.slots is not None:
+            row, col = cells
+            self.slots[row][col] = None
+            self.occupancy[row, col] = 0
+            if not brick.properties['indestructible']:
+                self.row_counts[row] -= 1
+        else:
+            for key in cells:
+                del self.cells[key][brick]
+        del self.order[brick]
+        self.changed.pop(brick, None)
+        self.removed[brick] = None
+        if not brick.properties['indestructible']:
+            self.breakable -= 1
+
+    def candidates(self, rect):
+        # Bricks sharing a cell with rect (they may still not overlap it), in
+        # level order
+        found = {}
+        if rect.width <= 0 or rect.height <= 0:
+            return found
+        if self.slots is not None:
+            # Same row-major order as _cell_range, clipped to the grid
+            rows, columns = self.shape
+            row_start, col_start = self.cell(rect.left, rect.top)
+            row_end, col_end = self.cell(rect.right - 1, rect.bottom - 1)
+            col_start = max(col_start, 0)
+            col_end = min(col_end, columns - 1)
+            for row in range(max(row_start, 0), min(row_end, rows - 1) + 1):
+                line = self.slots[row]
+                for col in range(col_start, col_end + 1):
+                    brick = line[col]
+                    if brick is not None:
+                        found[brick] = None
+            return found
+        for key in self._cell_range(rect):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        if len(found) > 1:
+            # Bricks here may span several cells; put them in level order
+            found = dict.fromkeys(sorted(found, key=self.order.__getitem__))
+        return found
+
+    def first_hit(self, rect):
+        # The first brick (in level order) overlapping rect, or None
+        best = None
+        for brick in self.candidates(rect):
+            if rect.colliderect(brick.rect):
+                if best is None or self.order[brick] < self.order[best]:
+                    best = brick
+        return best
+
+    def live_mask(self):
+        # Bitset over every brick ever added (in level order): bit i is set
+        # while brick i is still standing
+        mask = bytearray((self.next_index + 7) // 8)
+        for index in self.order.values():
+            mask[index >> 3] |= 1 << (index & 7)
+        return bytes(mask)
@@ -0,0 +1,75 @@
+# Particle priorities: when the budget is full, lower ones make room for
+# higher ones
+LOW = 0      # ball bounce sparks
+NORMAL = 1   # brick and laser hits
+HIGH = 2     # firework explosions
+
+
+class EffectsBudget:
+    # Front end of a ParticlePool that keeps the effects inside a budget:
+    #
+    # * every emit is scaled by `scale` (0..1), which the main loop sets
+    #   from the measured frame time (FramePacer.effects);
+    # * the pool never holds more than max_particles * scale particles; an
+    #   emit that does not fit culls lower-priority particles to make room,
+    #   and what still does not fit is dropped;
+    # * at most max_fireworks * scale fireworks fly at once.
+    #
+    # Everything given up along the way is counted, see report().
+    def __init__(self, particles, max_particles=4096, max_fireworks=6):
+        self.particles = particles
+        self.max_particles = min(max_particles, particles.capacity)
+        self.max_fireworks = max_fireworks
+        self.scale = 1.0
+        self.requested = 0
+        self.emitted = 0
+        self.scaled_down = 0
+        self.over_cap = 0
+        self.culled = 0
+        self.fireworks_skipped = 0
+
+    def set_scale(self, scale):
+        self.scale = min(1.0, max(0.0, scale))
+
+    def cap(self):
+        return max(1, int(self.max_particles * self.scale))
+
+    def emit(self, x, y, color, amount, min_size, max_size, min_speed, max_speed, gravity, priority=NORMAL):
+        # Same arguments as ParticlePool.emit; returns how many were emitted
+        self.requested += amount
+        wanted = max(1, int(amount * self.scale + 0.5))
+        self.scaled_down += amount - wanted
+        particles = self.particles
+        room = self.cap() - len(particles)
+        if room < wanted:
+            culled = particles.cull(wanted - max(room, 0), below=priority)
+            self.culled += culled
+            room += culled
+        emitted = particles.emit(x, y, color, min(wanted, max(room, 0)), min_size, max_size,
+                                 min_speed, max_speed, gravity, priority)
+        self.over_cap += wanted - emitted
+        self.emitted += emitted
+        return emitted
+
+    def allow_firework(self, flying):
+        # Whether one more firework may start while `flying` are in the air
+        if flying < max(1, int(self.max_fireworks * self.scale)):
+            return True
+        self.fireworks_skipped += 1
+        return False
+
+    @property
+    def dropped(self):
+        # Particles asked for but never shown, or removed early
+        return self.scaled_down + self.over_cap + self.culled
+
+    def report(self):
+        return {
+            'requested': self.requested,
+            'emitted': self.emitted,
+            'scaled_down': self.scaled_down,
+            'over_cap': self.over_cap,
+            'culled': self.culled,
+            'dropped': self.dropped,
+            'fireworks_skipped': self.fireworks_skipped,
+        }
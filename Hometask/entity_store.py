@@ -0,0 +1,49 @@
+class EntityList:
+    # Compact container for short-lived game objects (lasers, power-ups).
+    # Removal swaps the last entity into the freed slot, so it is O(1) and
+    # never copies the list; the order of the remaining entities is not
+    # preserved. Removed entities go on a free list, and spawn() brings
+    # them back with their reset() method, which takes the arguments of
+    # the constructor and reuses the entity's rect, instead of allocating
+    # new objects.
+    __slots__ = ('cls', 'items', 'free')
+
+    def __init__(self, cls, items=()):
+        self.cls = cls
+        self.items = list(items)
+        self.free = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def spawn(self, *args):
+        # Add an entity built from args, recycling a removed one if possible
+        if self.free:
+            entity = self.free.pop()
+            entity.reset(*args)
+        else:
+            entity = self.cls(*args)
+        self.items.append(entity)
+        return entity
+
+    def swap_remove(self, index):
+        items = self.items
+        entity = items[index]
+        last = items.pop()
+        if index < len(items):
+            items[index] = last
+        self.free.append(entity)
+        return entity
+
+    def clear(self):
+        self.free.extend(self.items)
+        self.items.clear()
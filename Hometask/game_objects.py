@@ -2,11 +2,10 @@ import pygame
 import random
 import math
 
+from physics import sweep_circle_rect
+from effects import HIGH
 
 
-# Initialize the font module for the power-up letters
-pygame.font.init()
-POWERUP_FONT = pygame.font.Font(None, 20)
 
 class Paddle:
     # ... (This class is unchanged from the previous version)
@@ -46,11 +45,10 @@ class Paddle:
             self.power_up_timers[power_up] = 0
         self.speed = self.original_speed
 
-    def update(self):
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
+    def update(self, inputs):
+        if inputs.left:
             self.rect.x -= self.speed
-        if keys[pygame.K_RIGHT]:
+        if inputs.right:
             self.rect.x += self.speed
 
         if self.rect.left < 0:
@@ -61,7 +59,7 @@ class Paddle:
         self._update_power_ups()
 
     def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
+        return pygame.draw.rect(screen, self.color, self.rect)
         
     def activate_power_up(self, type):
         duration = 600
@@ -109,13 +107,25 @@ class Paddle:
 
 class Ball:
     # ... (This class is unchanged from the previous version)
-    def __init__(self, screen_width, screen_height):
+    # Balls, bricks, power-ups and lasers can number in the hundreds, so they
+    # use __slots__ instead of a per-instance __dict__
+    __slots__ = ('screen_width', 'screen_height', 'rng', 'radius', 'color', 'rect', 'x', 'y',
+                 'is_glued', 'is_slowed', 'slow_timer', 'base_speed', 'speed_x', 'speed_y')
+    MAX_CONTACTS = 4  # bounces resolved within a single tick
+
+    def __init__(self, screen_width, screen_height, rng=random):
         self.screen_width = screen_width
         self.screen_height = screen_height
+        # Source of randomness for the launch direction; a seeded
+        # random.Random makes a simulation reproducible
+        self.rng = rng
         self.radius = 10
         self.color = (200, 200, 200)
         self.rect = pygame.Rect(0, 0, self.radius * 2, self.radius * 2)
         
+        self.x = 0
+        self.y = 0
+
         self.is_glued = False
         self.is_slowed = False
         self.slow_timer = 0
@@ -124,24 +134,33 @@ class Ball:
         self.reset()
 
     def reset(self):
-        self.rect.center = (self.screen_width // 2, self.screen_height // 2)
-        self.speed_x = self.base_speed * random.choice((1, -1))
+        self.move_to(self.screen_width // 2, self.screen_height // 2)
+        self.speed_x = self.base_speed * self.rng.choice((1, -1))
         self.speed_y = -self.base_speed
         self.is_glued = False
         self.is_slowed = False
         self.slow_timer = 0
 
-    def update(self, paddle, launch_ball=False):
+    def move_to(self, x, y):
+        # The ball moves on a float center (x, y); rect follows it for
+        # drawing and overlap tests
+        self.x = x
+        self.y = y
+        self.rect.center = (round(x), round(y))
+
+    def update(self, paddle, launch_ball=False, bricks=None):
+        # Advance one physics tick. Returns (status, collision_object,
+        # hit_bricks); the caller is responsible for breaking hit_bricks.
         collision_object = None
+        hit_bricks = []
 
         if self.is_glued:
-            self.rect.centerx = paddle.rect.centerx
-            self.rect.bottom = paddle.rect.top
+            self.move_to(paddle.rect.centerx, paddle.rect.top - self.radius)
             if launch_ball:
                 self.is_glued = False
-                self.speed_x = self.base_speed * random.choice((1, -1))
+                self.speed_x = self.base_speed * self.rng.choice((1, -1))
                 self.speed_y = -self.base_speed
-            return 'playing', None
+            return 'playing', None, hit_bricks
 
         if self.is_slowed:
             self.slow_timer -= 1
@@ -150,30 +169,89 @@ class Ball:
                 self.speed_y = self.speed_y * 2
                 self.is_slowed = False
 
-        self.rect.x += self.speed_x
-        self.rect.y += self.speed_y
+        # Swept movement: find the first thing the ball touches on its way,
+        # move up to it, bounce, and spend the rest of the tick from there.
+        # Nothing can be tunnelled through, however fast the ball goes.
+        remaining = 1.0
+        for _ in range(self.MAX_CONTACTS):
+            dx = self.speed_x * remaining
+            dy = self.speed_y * remaining
+            contact = self._first_contact(dx, dy, paddle, bricks, hit_bricks)
+            if contact is None:
+                self.move_to(self.x + dx, self.y + dy)
+                break
+            t, nx, ny, obj = contact
+            self.move_to(self.x + dx * t, self.y + dy * t)
+            remaining *= 1 - t
+            if obj == 'paddle':
+                # The paddle always sends the ball back up
+                self.speed_y = -abs(self.speed_y)
+                collision_object = 'paddle'
+                if paddle.has_glue:
+                    self.is_glued = True
+                    paddle.has_glue = False
+                    break
+                continue
+            # Bounce on the dominant axis of the contact normal, so corner
+            # hits keep the usual diagonal angles
+            if abs(nx) > abs(ny):
+                self.speed_x = abs(self.speed_x) if nx > 0 else -abs(self.speed_x)
+            else:
+                self.speed_y = abs(self.speed_y) if ny > 0 else -abs(self.speed_y)
+            if obj == 'wall':
+                collision_object = 'wall'
+            else:
+                hit_bricks.append(obj)
 
-        if self.rect.top <= 0:
-            self.speed_y *= -1
-            collision_object = 'wall'
-        if self.rect.left <= 0 or self.rect.right >= self.screen_width:
-            self.speed_x *= -1
-            collision_object = 'wall'
-
-        if self.rect.colliderect(paddle.rect) and self.speed_y > 0:
-            if paddle.has_glue:
-                self.is_glued = True
-                paddle.has_glue = False
-            self.speed_y *= -1
-            collision_object = 'paddle'
-        
         if self.rect.top > self.screen_height:
-            return 'lost', None
-        
-        return 'playing', collision_object
+            return 'lost', None, hit_bricks
+
+        return 'playing', collision_object, hit_bricks
+
+    def _first_contact(self, dx, dy, paddle, bricks, hit_bricks):
+        # Earliest (t, nx, ny, object) along the move (dx, dy), or None
+        radius = self.radius
+        best = None
+
+        # Walls are planes at x = 0, x = screen_width and y = 0
+        if dx < 0:
+            t = (radius - self.x) / dx
+            if t <= 1:
+                best = (max(t, 0), 1, 0, 'wall')
+        elif dx > 0:
+            t = (self.screen_width - radius - self.x) / dx
+            if t <= 1:
+                best = (max(t, 0), -1, 0, 'wall')
+        if dy < 0:
+            t = (radius - self.y) / dy
+            if t <= 1 and (best is None or max(t, 0) < best[0]):
+                best = (max(t, 0), 0, 1, 'wall')
+
+        if self.speed_y > 0:
+            if self.rect.colliderect(paddle.rect):
+                # The paddle moved into the ball
+                return (0, 0, -1, 'paddle')
+            hit = sweep_circle_rect(self.x, self.y, dx, dy, radius, paddle.rect)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit + ('paddle',)
+
+        if bricks is not None:
+            area = pygame.Rect(
+                math.floor(min(self.x, self.x + dx) - radius),
+                math.floor(min(self.y, self.y + dy) - radius),
+                math.ceil(abs(dx)) + 2 * radius + 2,
+                math.ceil(abs(dy)) + 2 * radius + 2,
+            )
+            for brick in bricks.candidates(area):
+                if brick in hit_bricks:
+                    continue
+                hit = sweep_circle_rect(self.x, self.y, dx, dy, radius, brick.rect)
+                if hit is not None and (best is None or hit[0] < best[0]):
+                    best = hit + (brick,)
+        return best
 
     def draw(self, screen):
-        pygame.draw.ellipse(screen, self.color, self.rect)
+        return pygame.draw.ellipse(screen, self.color, self.rect)
         
     def activate_power_up(self, type):
         if type == 'slow' and not self.is_slowed:
@@ -185,12 +263,53 @@ class Ball:
 
 class Brick:
     # ... (This class is unchanged from the previous version)
-    def __init__(self, x, y, width, height, color):
+    # Brick types by the code stored in a level cell (see level_pack.py):
+    #   char            letter of the type in the LEVELS patterns
+    #   hp              hits it takes (a level pack cell may set its own)
+    #   indestructible  never breaks, and is not needed to clear the level
+    #   explosion       radius in cells of the blast when it breaks, which
+    #                   hits every brick around it (0 = none)
+    #   drop            power-up it always drops: a type, 'any' for a
+    #                   random one, or None for the usual chance roll
+    #   color           own color, or None for the color of its row
+    TYPES = {
+        1: {'name': 'normal', 'char': 'X', 'hp': 1, 'points': 10, 'indestructible': False,
+            'explosion': 0, 'drop': None, 'color': None},
+        2: {'name': 'hard', 'char': 'H', 'hp': 3, 'points': 30, 'indestructible': False,
+            'explosion': 0, 'drop': None, 'color': (170, 170, 190)},
+        3: {'name': 'steel', 'char': 'S', 'hp': 1, 'points': 0, 'indestructible': True,
+            'explosion': 0, 'drop': None, 'color': (110, 110, 120)},
+        4: {'name': 'bomb', 'char': 'B', 'hp': 1, 'points': 20, 'indestructible': False,
+            'explosion': 1, 'drop': None, 'color': (230, 60, 200)},
+        5: {'name': 'bonus', 'char': 'P', 'hp': 1, 'points': 10, 'indestructible': False,
+            'explosion': 0, 'drop': 'any', 'color': (240, 240, 240)},
+    }
+    __slots__ = ('rect', 'color', 'base_color', 'type', 'hp')
+
+    def __init__(self, x, y, width, height, color, type=1, hp=None):
         self.rect = pygame.Rect(x, y, width, height)
+        self.type = type
+        self.hp = hp if hp else self.TYPES[type]['hp']
+        # Multi-hit bricks get darker as they take hits (see set_hp)
+        self.base_color = color
         self.color = color
 
+    @property
+    def properties(self):
+        return self.TYPES[self.type]
+
+    @staticmethod
+    def shade(color, hp):
+        # Color of a brick with hp hits left: full color from 3 hits up
+        factor = min(1.0, 0.4 + 0.2 * hp)
+        return tuple(int(c * factor) for c in color)
+
+    def set_hp(self, hp):
+        self.hp = hp
+        self.color = self.shade(self.base_color, hp)
+
     def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
+        return pygame.draw.rect(screen, self.color, self.rect)
 
 
 class PowerUp:
@@ -204,10 +323,24 @@ class PowerUp:
         'multiball': {'color': (255, 255, 100), 'char': 'M', 'message': 'MULTI BALL'},
     }
     
+    __slots__ = ('width', 'height', 'rect', 'speed_y', 'type', 'color', 'char')
+    WIDTH = 30
+    HEIGHT = 15
+    # Pre-rendered capsule (box plus letter) for each type, see sprite()
+    SPRITES = {}
+    # Font of the letters, given to prerender() or made on first use
+    FONT = None
+
     def __init__(self, x, y, type):
-        self.width = 30
-        self.height = 15
+        self.width = self.WIDTH
+        self.height = self.HEIGHT
         self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.reset(x, y, type)
+
+    def reset(self, x, y, type):
+        # Also reuses a pooled power-up (see EntityList.spawn), keeping its rect
+        self.rect.x = x
+        self.rect.y = y
         self.speed_y = 3
         self.type = type
         self.color = self.PROPERTIES[type]['color']
@@ -216,15 +349,36 @@ class PowerUp:
     def update(self):
         self.rect.y += self.speed_y
 
+    @classmethod
+    def sprite(cls, type):
+        surface = cls.SPRITES.get(type)
+        if surface is None:
+            properties = cls.PROPERTIES[type]
+            surface = pygame.Surface((cls.WIDTH, cls.HEIGHT))
+            surface.fill(properties['color'])
+            if cls.FONT is None:
+                cls.FONT = pygame.font.Font(None, 20)
+            text_surf = cls.FONT.render(properties['char'], True, (255, 255, 255))
+            text_rect = text_surf.get_rect(center=surface.get_rect().center)
+            surface.blit(text_surf, text_rect)
+            cls.SPRITES[type] = surface
+        return surface
+
+    @classmethod
+    def prerender(cls, font=None):
+        if font is not None:
+            cls.FONT = font
+        for type in cls.PROPERTIES:
+            cls.sprite(type)
+
     def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
-        text_surf = POWERUP_FONT.render(self.char, True, (255, 255, 255))
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+        return screen.blit(self.sprite(self.type), self.rect)
 
 
 class Laser:
     # ... (This class is unchanged from the previous version)
+    __slots__ = ('width', 'height', 'rect', 'color', 'speed_y')
+
     def __init__(self, x, y):
         self.width = 5
         self.height = 15
@@ -232,37 +386,21 @@ class Laser:
         self.color = (255, 255, 0)
         self.speed_y = -8
 
+    def reset(self, x, y):
+        self.rect.x = x
+        self.rect.y = y
+
     def update(self):
         self.rect.y += self.speed_y
 
     def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
+        return pygame.draw.rect(screen, self.color, self.rect)
 
 # !!! PHASE: VISUAL EFFECTS !!!
-class Particle:
-    def __init__(self, x, y, color, min_size, max_size, min_speed, max_speed, gravity):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.size = random.randint(min_size, max_size)
-        self.gravity = gravity
-        angle = random.uniform(0, 360)
-        speed = random.uniform(min_speed, max_speed)
-        self.vx = speed * math.cos(math.radians(angle))
-        self.vy = speed * math.sin(math.radians(angle))
-
-    def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.vy += self.gravity
-        self.size -= 0.1 # Particles shrink over time
-
-    def draw(self, screen):
-        if self.size > 0:
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), int(self.size))
-
 class Firework:
-    def __init__(self, screen_width, screen_height):
+    # The explosion is emitted into a shared ParticlePool (see particles.py),
+    # or an EffectsBudget in front of one
+    def __init__(self, screen_width, screen_height, particles):
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.x = random.randint(0, screen_width)
@@ -270,7 +408,7 @@ class Firework:
         self.vy = -random.uniform(8, 12) # Speed of the rocket
         self.color = (255, 255, 255) # White rocket
         self.exploded = False
-        self.particles = []
+        self.particles = particles
         self.explosion_y = random.uniform(screen_height * 0.2, screen_height * 0.5)
 
     def update(self):
@@ -279,21 +417,14 @@ class Firework:
             if self.y <= self.explosion_y:
                 self.exploded = True
                 explosion_color = (random.randint(50, 255), random.randint(50, 255), random.randint(50, 255))
-                for _ in range(50): # Create 50 particles on explosion
-                    self.particles.append(Particle(self.x, self.y, explosion_color, 2, 4, 1, 4, 0.1))
-        else:
-            for particle in self.particles[:]:
-                particle.update()
-                if particle.size <= 0:
-                    self.particles.remove(particle)
+                # Create 50 particles on explosion
+                self.particles.emit(self.x, self.y, explosion_color, 50, 2, 4, 1, 4, 0.1, HIGH)
 
     def draw(self, screen):
         if not self.exploded:
             pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), 3)
-        else:
-            for particle in self.particles:
-                particle.draw(screen)
 
     def is_dead(self):
-        return self.exploded and not self.particles
+        # Once exploded, the sparks are owned by the particle pool
+        return self.exploded
 # !!! END PHASE: VISUAL EFFECTS !!!
\ No newline at end of file
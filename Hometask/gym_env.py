@@ -0,0 +1,252 @@
+import random
+
+import numpy as np
+import pygame
+
+from simulation import GameSimulation, FrameInput, LEVELS, SCREEN_WIDTH, SCREEN_HEIGHT
+from renderer import Renderer
+from game_objects import PowerUp
+
+# Gymnasium is optional: without it the environments work the same, they
+# just have no action_space / observation_space objects
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:
+    gymnasium = None
+
+# Discrete actions: the paddle moves left, right or not at all, and FIRE
+# holds UP and SPACE (lasers, launching a glued ball)
+ACTIONS = [
+    FrameInput(),
+    FrameInput(left=True),
+    FrameInput(right=True),
+    FrameInput(up=True, space=True),
+    FrameInput(left=True, up=True, space=True),
+    FrameInput(right=True, up=True, space=True),
+]
+ACTION_NAMES = ['NOOP', 'LEFT', 'RIGHT', 'FIRE', 'LEFT_FIRE', 'RIGHT_FIRE']
+
+# Columns of the 'balls' observation, one row per ball slot; empty slots
+# are all zeros
+BALL_FEATURES = ['present', 'x', 'y', 'speed_x', 'speed_y', 'glued', 'slowed']
+PADDLE_FEATURES = ['x', 'width', 'speed', 'has_laser', 'has_glue', 'attempts', 'balls']
+TIMERS = ['laser', 'glue', 'expand', 'speed']
+
+
+def level_grid(level_pack=None):
+    # (rows, columns) big enough for every level
+    if level_pack is None:
+        return max(len(pattern) for pattern in LEVELS), max(len(line) for pattern in LEVELS for line in pattern)
+    shapes = [level_pack.level(idx).shape for idx in range(len(level_pack))]
+    return max(rows for rows, columns in shapes), max(columns for rows, columns in shapes)
+
+
+class ArkanoidEnv(gymnasium.Env if gymnasium is not None else object):
+    # Gym-style environment around GameSimulation. One episode is one game:
+    # cleared levels are followed by the next one right away, and it ends
+    # when the game is over or won (terminated) or after max_steps ticks
+    # (truncated).
+    #
+    # step(action) takes an index into ACTIONS, plays it for `frame_skip`
+    # ticks and returns (observation, reward, terminated, truncated, info).
+    # The reward is one per brick broken minus `lost_penalty` per ball
+    # lost. Observations are a dict of NumPy arrays:
+    #   'bricks'     (rows, columns) uint8, 1 where a brick stands
+    #   'balls'      (max_balls, len(BALL_FEATURES)) float32, in pixels
+    #   'paddle'     (len(PADDLE_FEATURES),) float32
+    #   'power_ups'  (len(TIMERS),) float32, ticks left of each paddle power-up
+    #
+    # With render_mode='rgb_array', render() draws the game off-screen and
+    # returns it as an (height, width, 3) uint8 array.
+    metadata = {'render_modes': ['rgb_array'], 'render_fps': 60}
+
+    def __init__(self, difficulty='Normal', level=0, seed=None, max_balls=8, frame_skip=1,
+                 lost_penalty=1.0, max_steps=60 * 60 * 10, render_mode=None, level_pack=None,
+                 screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
+        self.level = level
+        self.max_balls = max_balls
+        self.frame_skip = frame_skip
+        self.lost_penalty = lost_penalty
+        self.max_steps = max_steps
+        self.render_mode = render_mode
+        # Every reset() without a seed starts a game with the next seed
+        # drawn from here, so a seeded environment is reproducible
+        self.seeds = random.Random(seed)
+        self.sim = GameSimulation(difficulty, level=level, seed=self.seeds.randrange(2 ** 32),
+                                  screen_width=screen_width, screen_height=screen_height,
+                                  level_pack=level_pack)
+        self.grid = level_grid(level_pack)
+        self.surface = None
+        self.renderer = None
+        if render_mode is not None:
+            # Power-up capsules are drawn with a font
+            pygame.font.init()
+            PowerUp.prerender()
+        if gymnasium is not None:
+            self.action_space = spaces.Discrete(len(ACTIONS))
+            self.observation_space = spaces.Dict({
+                'bricks': spaces.Box(0, 1, self.grid, dtype=np.uint8),
+                'balls': spaces.Box(-np.inf, np.inf, (max_balls, len(BALL_FEATURES)), dtype=np.float32),
+                'paddle': spaces.Box(0, np.inf, (len(PADDLE_FEATURES),), dtype=np.float32),
+                'power_ups': spaces.Box(0, np.inf, (len(TIMERS),), dtype=np.float32),
+            })
+
+    def empty_observation(self):
+        return {
+            'bricks': np.zeros(self.grid, dtype=np.uint8),
+            'balls': np.zeros((self.max_balls, len(BALL_FEATURES)), dtype=np.float32),
+            'paddle': np.zeros(len(PADDLE_FEATURES), dtype=np.float32),
+            'power_ups': np.zeros(len(TIMERS), dtype=np.float32),
+        }
+
+    def reset(self, seed=None, options=None):
+        if gymnasium is not None:
+            # Seeds np_random, as gymnasium.Env expects
+            super().reset(seed=seed)
+        if seed is not None:
+            self.seeds.seed(seed)
+        self.sim.reset(self.level, seed=self.seeds.randrange(2 ** 32))
+        return self.observe(), self.info()
+
+    def step(self, action):
+        reward, terminated, truncated = self.advance(action)
+        return self.observe(), reward, terminated, truncated, self.info()
+
+    def advance(self, action):
+        # step() without the observation: (reward, terminated, truncated)
+        sim = self.sim
+        inputs = ACTIONS[action]
+        reward = 0.0
+        for _ in range(self.frame_skip):
+            if sim.status == 'level_cleared':
+                sim.start_level(sim.current_level)
+            for name, data in sim.step(inputs):
+                if name == 'brick_hit' or name == 'laser_hit':
+                    reward += 1.0
+                elif name == 'ball_lost':
+                    reward -= self.lost_penalty
+            if sim.status in ('game_over', 'won'):
+                break
+        terminated = sim.status in ('game_over', 'won')
+        truncated = not terminated and sim.frame >= self.max_steps
+        return reward, terminated, truncated
+
+    def info(self):
+        sim = self.sim
+        return {'points': sim.points, 'level': sim.current_level, 'attempts': sim.Attempts,
+                'frame': sim.frame, 'seed': sim.seed}
+
+    def observe(self, out=None):
+        # The observation, written into `out` (e.g. one row of a VecEnv's
+        # batch) or into new arrays
+        if out is None:
+            out = self.empty_observation()
+        sim = self.sim
+        # The level grid keeps its occupancy up to date as bricks break
+        occupancy = sim.bricks.occupancy
+        rows, columns = occupancy.shape
+        bitmap = out['bricks']
+        if bitmap.shape != occupancy.shape:
+            bitmap[:] = 0
+        bitmap[:rows, :columns] = occupancy
+
+        balls = sim.balls
+        n = min(len(balls), self.max_balls)
+        table = out['balls']
+        table[n:] = 0
+        table[:n, 0] = 1
+        for column, array in enumerate((balls.x, balls.y, balls.speed_x, balls.speed_y,
+                                        balls.is_glued, balls.is_slowed), 1):
+            table[:n, column] = array[:n]
+
+        paddle = sim.paddle
+        out['paddle'][:] = (paddle.rect.x, paddle.width, paddle.speed, paddle.has_laser, paddle.has_glue,
+                            sim.Attempts, len(balls))
+        timers = paddle.power_up_timers
+        out['power_ups'][:] = (timers['laser'], timers['glue'], timers['expand'], timers['speed'])
+        return out
+
+    def render(self):
+        if self.render_mode != 'rgb_array':
+            return None
+        sim = self.sim
+        if self.surface is None:
+            self.surface = pygame.Surface((sim.screen_width, sim.screen_height))
+            self.renderer = Renderer(self.surface, (30, 30, 30))
+        surface = self.surface
+        self.renderer.draw_background(sim.bricks)
+        sim.paddle.draw(surface)
+        sim.balls.draw(surface)
+        for power_up in sim.power_ups:
+            power_up.draw(surface)
+        for laser in sim.lasers:
+            laser.draw(surface)
+        # surfarray is (width, height, 3); images are (height, width, 3)
+        return pygame.surfarray.array3d(surface).swapaxes(0, 1)
+
+    def close(self):
+        self.surface = None
+        self.renderer = None
+
+
+class VecEnv:
+    # `num_envs` independent ArkanoidEnvs stepped with one call. Results
+    # come back batched: observations as a dict of (num_envs, ...) arrays,
+    # rewards, terminated and truncated as (num_envs,) arrays. An
+    # environment whose episode ended is reset right away: the batch then
+    # holds the first observation of the new game, and its info holds the
+    # last one of the old game ('final_observation') and that game's info
+    # ('final_info'), as gymnasium's vector environments do.
+    def __init__(self, num_envs, seed=None, **kwargs):
+        self.num_envs = num_envs
+        self.envs = [ArkanoidEnv(seed=None if seed is None else seed + i, **kwargs) for i in range(num_envs)]
+        first = self.envs[0]
+        self.observations = {key: np.zeros((num_envs,) + array.shape, dtype=array.dtype)
+                             for key, array in first.empty_observation().items()}
+        # One view per environment into the batch, so observe() writes in place
+        self.rows = [{key: batch[i] for key, batch in self.observations.items()} for i in range(num_envs)]
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+        if gymnasium is not None:
+            self.single_action_space = first.action_space
+            self.single_observation_space = first.observation_space
+
+    def reset(self, seed=None):
+        infos = []
+        for i, env in enumerate(self.envs):
+            env.reset(seed=None if seed is None else seed + i)
+            env.observe(self.rows[i])
+            infos.append(env.info())
+        return self._copy(), infos
+
+    def step(self, actions):
+        infos = []
+        for i, env in enumerate(self.envs):
+            reward, terminated, truncated = env.advance(int(actions[i]))
+            self.rewards[i] = reward
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            info = env.info()
+            if terminated or truncated:
+                info['final_observation'] = env.observe()
+                info['final_info'] = env.info()
+                env.reset()
+            infos.append(info)
+            env.observe(self.rows[i])
+        return self._copy(), self.rewards.copy(), self.terminated.copy(), self.truncated.copy(), infos
+
+    def _copy(self):
+        return {key: batch.copy() for key, batch in self.observations.items()}
+
+    def render(self):
+        # (num_envs, height, width, 3) frames, with render_mode='rgb_array'
+        frames = [env.render() for env in self.envs]
+        if frames[0] is None:
+            return None
+        return np.stack(frames)
+
+    def close(self):
+        for env in self.envs:
+            env.close()
@@ -0,0 +1,127 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from game_objects import Brick
+
+# Level pack file layout (little endian):
+#   header  magic "ARKL", version, level count
+#   index   one (offset, columns, rows) entry per level
+#   levels  rows * columns cell bytes each, row by row; a cell is
+#           (hit points << 4) | brick type, type 0 being an empty slot and
+#           the others keys of Brick.TYPES (hit points 0 = the type's own)
+# The index has a fixed entry size, so level N is found without reading
+# any other level, and the file is read through mmap, so only the pages of
+# the levels actually played are ever loaded.
+MAGIC = b'ARKL'
+VERSION = 1
+HEADER = struct.Struct('<4sBxxxI')
+ENTRY = struct.Struct('<IHH')
+
+TYPE_MASK = 0x0F
+HP_SHIFT = 4
+# Pattern characters of the in-code levels: ' ' is an empty slot, the
+# others are the brick types' chars ('X' a one-hit brick, ...)
+PATTERN_CELLS = {' ': 0}
+PATTERN_CELLS.update({properties['char']: (properties['hp'] << HP_SHIFT) | code
+                      for code, properties in Brick.TYPES.items()})
+
+
+# The pack the game plays, next to the code; it is built from LEVELS (see
+# main() below) and tests/test_level_pack.py checks the two agree
+DEFAULT_PACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels.arkl')
+
+
+class LevelPackError(Exception):
+    pass
+
+
+def pattern_cells(pattern):
+    # Cell bytes of a level written as a list of strings (see LEVELS)
+    columns = max(len(line) for line in pattern)
+    cells = bytearray(columns * len(pattern))
+    for row, line in enumerate(pattern):
+        for col, ch in enumerate(line):
+            if ch not in PATTERN_CELLS:
+                raise LevelPackError(f"unknown brick {ch!r} in row {row}")
+            cells[row * columns + col] = PATTERN_CELLS[ch]
+    return columns, len(pattern), bytes(cells)
+
+
+def write_pack(path, levels):
+    # levels: (columns, rows, cell bytes) per level
+    levels = list(levels)
+    offset = HEADER.size + ENTRY.size * len(levels)
+    index = bytearray()
+    for columns, rows, cells in levels:
+        if len(cells) != columns * rows:
+            raise LevelPackError(f"{len(cells)} cells for a {columns}x{rows} level")
+        index += ENTRY.pack(offset, columns, rows)
+        offset += len(cells)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(levels)))
+        f.write(index)
+        for columns, rows, cells in levels:
+            f.write(cells)
+
+
+class LevelPack:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size:
+            raise LevelPackError("not a level pack")
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise LevelPackError("not a level pack")
+        if version != VERSION:
+            raise LevelPackError(f"unsupported level pack version {version}")
+
+    def __len__(self):
+        return self.count
+
+    def level(self, idx):
+        # (rows, columns) uint8 array of cells, read straight from the map
+        if not 0 <= idx < self.count:
+            raise IndexError(f"level {idx} not in pack ({self.count} levels)")
+        offset, columns, rows = ENTRY.unpack_from(self.data, HEADER.size + idx * ENTRY.size)
+        cells = np.frombuffer(self.data, dtype=np.uint8, count=rows * columns, offset=offset)
+        return cells.reshape(rows, columns)
+
+    def close(self):
+        self.data.close()
+
+
+def default_pack():
+    # The game's level pack, or None to use the built-in levels
+    return LevelPack(DEFAULT_PACK) if os.path.exists(DEFAULT_PACK) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an Arkanoid level pack")
+    parser.add_argument('output', help="level pack to write, e.g. levels.arkl")
+    parser.add_argument('levels', nargs='*',
+                        help="text files with one level each (' ' empty, brick types as in Brick.TYPES: "
+                             "X normal, H hard, S steel, B bomb, P bonus); the built-in levels if none")
+    args = parser.parse_args()
+
+    if args.levels:
+        patterns = []
+        for path in args.levels:
+            with open(path, encoding='utf-8') as f:
+                patterns.append([line.rstrip('\n') for line in f if line.strip('\n')])
+    else:
+        from simulation import LEVELS
+        patterns = LEVELS
+    write_pack(args.output, (pattern_cells(pattern) for pattern in patterns))
+    print(f"{len(patterns)} levels written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
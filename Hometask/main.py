@@ -1,449 +1,433 @@
 import pygame
-import sys
+import os
+import argparse
+import asyncio
 import random
 import math
-from game_objects import Paddle, Ball, Brick, PowerUp, Laser, Particle, Firework
-
-# --- Level Setup ---
-LEVELS = [
-    [
-        "XXXXXXXXXX",
-        "X        X",
-        "X XXXXX  X",
-        "X        X",
-        "XXXXXXXXXX",
-    ],
-    [
-        "XXXXXXXXXX",
-        "X        X",
-        "X XXXX   X",
-        "X   XX   X",
-        "XXXXXXXXXX",
-    ],
-    [
-        "X  X  X  X",
-        " XX XX XX ",
-        "XXXXXXXXXX",
-        " XX XX XX ",
-        "X  X  X  X",
-    ],
-    [
-        "XXXXXXXXXX",
-        "X        X",
-        "X X  X X X",
-        "X  XX  XX ",
-        "XXXXXXXXXX",
-    ],
-]
-current_level = 0
-
-def load_level(idx):
-    bricks = []
-    pattern = LEVELS[idx]
-    brick_width = screen_width // len(pattern[0])
-    brick_height = 20
-    for row, line in enumerate(pattern):
-        for col, ch in enumerate(line):
-            if ch == "X":
-                x = col * brick_width
-                y = row * (brick_height + 5) + 50
-                color = BRICK_COLORS[row % len(BRICK_COLORS)]
-                bricks.append(Brick(x, y, brick_width - 5, brick_height, color))
-    return bricks
-
-# -- General Setup --
-pygame.init()
-pygame.mixer.init()
-clock = pygame.time.Clock()
-
-# -- Screen Setup --
-screen_width = 800
-screen_height = 600
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("PyGame Arkanoid")
-
-# -- Colors --
-BG_COLOR = pygame.Color('grey12')
-BRICK_COLORS = [(178, 34, 34), (255, 165, 0), (255, 215, 0), (50, 205, 50)]
-
-# -- Font Setup --
-# !!! PHASE: TITLE SCREEN !!!
-title_font = pygame.font.Font(None, 70)
-# !!! END PHASE: TITLE SCREEN !!!
-game_font = pygame.font.Font(None, 40)
-message_font = pygame.font.Font(None, 30)
-
-# -- Sound Setup --
-try:
-    bounce_sound = pygame.mixer.Sound('bounce.wav')
-    brick_break_sound = pygame.mixer.Sound('brick_break.wav')
-    game_over_sound = pygame.mixer.Sound('game_over.wav')
-    laser_sound = pygame.mixer.Sound('laser.wav')
-except pygame.error as e:
-    print(f"Warning: Sound file not found. {e}")
-    class DummySound:
-        def play(self): pass
-    bounce_sound, brick_break_sound, game_over_sound, laser_sound = DummySound(), DummySound(), DummySound(), DummySound()
-
-# -- Game Objects --
-paddle = Paddle(screen_width, screen_height)
-ball = Ball(screen_width, screen_height)
-balls = [ball]
-
-# Apply base speed from difficulty
-# --- Pause flag ---
-paused = False
-
-# --- Difficulty settings ---
-DIFFICULTIES = {
-    'Easy':   {'Attempts': 5, 'speed': 4, 'powerup_rate': 0.5},
-    'Normal': {'Attempts': 3, 'speed': 6, 'powerup_rate': 0.3},
-    'Hard':   {'Attempts': 1, 'speed': 12, 'powerup_rate': 0.1},
-}
-difficulty = 'Normal'
-powerup_rate = DIFFICULTIES[difficulty]['powerup_rate']
-
-for b in balls:
-    b.base_speed = DIFFICULTIES[difficulty]['speed']
-    b.reset()
-
-bricks = load_level(current_level)
-power_ups = []
-lasers = []
-laser_cooldown = 0
-particles = []
-fireworks = []
-
-# --- Game Variables ---
-# !!! PHASE: TITLE SCREEN !!!
-# The game now starts on the title screen
-game_state = 'title_screen' 
-# !!! END PHASE: TITLE SCREEN !!!
-points = 0
-Attempts = DIFFICULTIES[difficulty]['Attempts']
-display_message = ""
-message_timer = 0
-firework_timer = 0
-
-
-# -- Main Game Loop --
-while True:
-    # --- Event Handling ---
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        if event.type == pygame.KEYDOWN:
-            # !!! PHASE: TITLE SCREEN !!!
-            if event.key == pygame.K_SPACE:
-                # If on title screen, start the game
-                if game_state == 'title_screen':
-                    game_state = 'playing'
-                # If game is over, go back to title screen
-                elif game_state in ['game_over', 'you_win']:
-                    paddle.reset()
-                    for b in balls:
-                        b.reset()
-                    # Reset balls
-                    new_ball = Ball(screen_width, screen_height)
-                    balls = [new_ball]
-                    # Reset level
-                    bricks = load_level(current_level)
-                    points = 0
-                    Attempts = DIFFICULTIES[difficulty]['Attempts']
-                    powerup_rate = DIFFICULTIES[difficulty]['powerup_rate']
-                    for b in balls:
-                        b.base_speed = DIFFICULTIES[difficulty]['speed']
-                        b.reset()
-                    power_ups.clear()
-                    lasers.clear()
-                    particles.clear()
-                    fireworks.clear()
-                    game_state = 'title_screen'
-                # Launch glued ball
-                else:
-                    for b in balls:
-                        if b.is_glued:
-                            b.is_glued = False
-            elif event.key == pygame.K_ESCAPE and game_state == 'playing':
-                paused = not paused
-            elif event.key == pygame.K_UP and paddle.has_laser and laser_cooldown <= 0:
-                # Fire lasers on key press
-                left_x = paddle.rect.left + 10
-                right_x = paddle.rect.right - 10
-                lasers.append(Laser(left_x, paddle.rect.top))
-                lasers.append(Laser(right_x, paddle.rect.top))
-                laser_sound.play()
-                laser_cooldown = 10
-            # Start next level from transition screen
-            if game_state == 'level_transition' and event.key == pygame.K_SPACE:
-                # Load next level
-                bricks = load_level(current_level)
-                # Reset paddle and balls
-                paddle.reset()
-                new_ball = Ball(screen_width, screen_height)
-                new_ball.base_speed = DIFFICULTIES[difficulty]['speed']
-                balls = [new_ball]
-                # Back to playing
+from assets import AssetManager
+from audio import AudioScheduler
+from game_objects import PowerUp, Firework
+from particles import ParticlePool
+from effects import EffectsBudget, LOW, NORMAL
+from text_cache import TextCache
+from renderer import Renderer
+from screens import StateScreens
+from physics import FixedTimestep
+from pacing import FramePacer
+from replay import ReplayRecorder
+from background import BackgroundIO, write_file
+from telemetry import parse_address
+from profiler import FrameProfiler
+from simulation import GameSimulation, FrameInput
+from snapshot import SnapshotRing, SnapshotError, encode_state, restore_state, write_state, read_state
+from level_pack import LevelPack
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyGame Arkanoid")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="only redraw and update the parts of the screen that change")
+    parser.add_argument('--record', metavar='FILE',
+                        help="record the inputs of the last game played to FILE (check it with replay.py)")
+    parser.add_argument('--profile', action='store_true',
+                        help="start with the frame-time overlay on (F3 toggles it)")
+    parser.add_argument('--profile-csv', metavar='FILE',
+                        help="write per-frame phase timings to FILE while the overlay is on")
+    parser.add_argument('--save', metavar='FILE', default='quicksave.arks',
+                        help="quick save file: F5 saves the game being played, F9 loads it")
+    parser.add_argument('--telemetry', metavar='HOST:PORT',
+                        help="send game and frame events to a telemetry collector (see telemetry.py)")
+    args = parser.parse_args()
+    asyncio.run(play(args))
+
+
+async def play(args):
+    # Each pass of the main loop is one frame, run without awaiting
+    # anything; the loop only yields to asyncio while it waits for the next
+    # frame, and that is when saves, level decoding and telemetry go on
+    # (see BackgroundIO)
+
+    # -- General Setup --
+    pygame.init()
+    pygame.mixer.init()
+    clock = pygame.time.Clock()
+    # File writes, save file reads and level decoding run on threads,
+    # telemetry in a task between frames
+    background = BackgroundIO()
+    if args.telemetry:
+        await background.start_telemetry(parse_address(args.telemetry))
+
+    # -- Screen Setup --
+    screen_width = 800
+    screen_height = 600
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    pygame.display.set_caption("PyGame Arkanoid")
+
+    # -- Colors --
+    BG_COLOR = pygame.Color('grey12')
+    # Fonts, sounds and surfaces, found next to this file
+    assets = AssetManager()
+    renderer = Renderer(screen, BG_COLOR, dirty=args.dirty_rects, assets=assets)
+
+    # -- Sound Setup --
+    # Decoded in the background while the title screen is up; the game
+    # asks for them when it starts
+    # name: (file, voices)
+    SOUND_FILES = {
+        'bounce': ('bounce.wav', 4),
+        'brick_break': ('brick_break.wav', 4),
+        'game_over': ('game_over.wav', 1),
+        'laser': ('laser.wav', 2),
+    }
+    assets.preload_sounds(path for path, voices in SOUND_FILES.values())
+    # Plays go through a queue with a few voices per sound, so a burst of
+    # collisions costs the same as one
+    audio = AudioScheduler()
+
+    # -- Font Setup --
+    # !!! PHASE: TITLE SCREEN !!!
+    title_font = assets.font(70)
+    # !!! END PHASE: TITLE SCREEN !!!
+    game_font = assets.font(40)
+    message_font = assets.font(30)
+    # Text only gets rasterized when it changes
+    text_cache = TextCache()
+    PowerUp.prerender(assets.font(20))
+    screens = StateScreens((screen_width, screen_height), BG_COLOR, title_font, game_font, assets)
+    # Key of the static screen on the display, while nothing moves on it
+    shown_screen = None
+
+    # -- Game Objects --
+    # All game logic lives in the simulation; this loop only feeds it the
+    # keyboard, plays sounds and draws.
+    difficulty = 'Normal'
+    # Levels are read from the level pack next to the code (build it with
+    # level_pack.py); without one the built-in levels are used
+    pack_path = assets.path('levels.arkl')
+    level_pack = LevelPack(pack_path) if os.path.exists(pack_path) else None
+    sim = GameSimulation(difficulty, screen_width=screen_width, screen_height=screen_height,
+                         level_pack=level_pack)
+    # The next level is decoded on the background thread pool
+    sim.prefetcher = background.workers
+    profiler = FrameProfiler(enabled=args.profile, csv_path=args.profile_csv)
+    profiler.background = background
+    sim.profiler = profiler
+
+    # Physics runs at a fixed tick rate, independent of the frame rate
+    timestep = FixedTimestep()
+    frame_time = 0.0
+    # Sleeps on idle screens, sheds effects and frames when overloaded
+    pacer = FramePacer(clock, background=background)
+    # A snapshot every half second of play; BACKSPACE rewinds
+    snapshots = SnapshotRing()
+
+    # --- Pause flag ---
+    paused = False
+
+    particles = ParticlePool(capacity=8192)
+    # Particle and firework budget, scaled down when frames run long
+    effects = EffectsBudget(particles)
+    fireworks = []
+
+    # --- Game Variables ---
+    # !!! PHASE: TITLE SCREEN !!!
+    # The game now starts on the title screen
+    game_state = 'title_screen'
+    # !!! END PHASE: TITLE SCREEN !!!
+    display_message = ""
+    message_timer = 0
+    firework_timer = 0
+
+    recorder = None
+    # Quick save being written and save file being read, if any
+    saving = None
+    loading = None
+
+    def load_sounds():
+        if not audio.sounds:
+            for name, (path, voices) in SOUND_FILES.items():
+                audio.add(name, assets.sound(path), voices)
+
+    def start_game():
+        load_sounds()
+        # Every game gets a fresh seed, so a recording can reproduce it
+        seed = random.randrange(2 ** 32)
+        sim.reset(seed=seed)
+        snapshots.clear()
+        background.report('game_start', seed=seed, difficulty=difficulty)
+        return ReplayRecorder(seed, difficulty) if args.record else None
+
+    def save_recording():
+        # Encoded now, written in the background
+        if recorder is not None:
+            background.write(write_file, args.record, recorder.encode(sim))
+
+    def end_game():
+        save_recording()
+        sim.reset()
+        snapshots.clear()
+        particles.clear()
+        fireworks.clear()
+        assets.release('level')
+
+    # -- Main Game Loop --
+    while True:
+        profiler.begin_frame()
+        effects.set_scale(pacer.effects)
+        # --- Background work finished since the last frame ---
+        if saving is not None and saving.done():
+            display_message = "SAVE FAILED" if saving.exception() else "GAME SAVED"
+            message_timer = 120
+            shown_screen = None
+            saving = None
+        if loading is not None and loading.done():
+            try:
+                restore_state(sim, loading.result())
+            except (SnapshotError, OSError) as e:
+                display_message = str(e).upper()
+            else:
+                load_sounds()
+                # A loaded game does not start from its seed, so it
+                # cannot be recorded
+                recorder = None
+                difficulty = sim.difficulty
+                snapshots.clear()
+                particles.clear()
+                fireworks.clear()
+                paused = False
                 game_state = 'playing'
-            # Difficulty selection on title screen
+                display_message = "GAME LOADED"
+            message_timer = 120
+            shown_screen = None
+            loading = None
+
+        # --- Event Handling ---
+        # A static screen with nothing moving waits for the next event
+        for event in await pacer.events(idle=shown_screen is not None):
+            if event.type == pygame.QUIT:
+                if game_state != 'title_screen':
+                    save_recording()
+                profiler.close()
+                audio.close()
+                # Lets the saves handed off so far finish
+                await background.close()
+                pygame.quit()
+                return
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The window was uncovered: the screen has to be drawn again
+                shown_screen = None
+            if event.type == pygame.KEYDOWN:
+                # !!! PHASE: TITLE SCREEN !!!
+                if event.key == pygame.K_SPACE:
+                    # If on title screen, start the game
+                    if game_state == 'title_screen':
+                        recorder = start_game()
+                        game_state = 'playing'
+                    # If game is over, go back to title screen
+                    elif game_state in ['game_over', 'you_win']:
+                        end_game()
+                        game_state = 'title_screen'
+                    # Start next level from transition screen
+                    elif game_state == 'level_transition':
+                        sim.start_level(sim.current_level)
+                        game_state = 'playing'
+                elif event.key == pygame.K_ESCAPE and game_state == 'playing':
+                    paused = not paused
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                elif event.key == pygame.K_F5 and game_state == 'playing' and saving is None:
+                    # The state is taken now; compressing and writing it
+                    # happen in the background
+                    saving = background.write(write_state, args.save, encode_state(sim))
+                elif (event.key == pygame.K_F9 and game_state in ['title_screen', 'playing']
+                      and loading is None and os.path.exists(args.save)):
+                    if game_state == 'playing':
+                        save_recording()
+                    # Read and decompressed in the background, restored at
+                    # the start of the frame after it is ready
+                    loading = background.run(read_state, args.save)
+                elif event.key == pygame.K_BACKSPACE and game_state == 'playing' and not paused:
+                    # Back two seconds; the recording forgets what was undone
+                    if snapshots.rewind(sim, 2 * 60) is not None:
+                        if recorder is not None:
+                            recorder.truncate(sim.frame)
+                        particles.clear()
+                        display_message = "REWIND"
+                        message_timer = 60
+                # Difficulty selection on title screen
+                if game_state == 'title_screen':
+                    if event.key == pygame.K_1:
+                        difficulty = 'Easy'
+                    elif event.key == pygame.K_2:
+                        difficulty = 'Normal'
+                    elif event.key == pygame.K_3:
+                        difficulty = 'Hard'
+                    # Update Attempts, powerup_rate, and ball speed when changed
+                    sim.set_difficulty(difficulty)
+                # !!! END PHASE: TITLE SCREEN !!!
+
+        # --- Drawing and Updating based on Game State ---
+        # The title, level transition, pause and end screens are built once
+        # per content and blitted whole; the playing screen clears itself
+        # through the renderer
+        if game_state != 'playing' or paused:
+            # !!! PHASE: TITLE SCREEN !!!
             if game_state == 'title_screen':
-                if event.key == pygame.K_1:
-                    difficulty = 'Easy'
-                elif event.key == pygame.K_2:
-                    difficulty = 'Normal'
-                elif event.key == pygame.K_3:
-                    difficulty = 'Hard'
-                # Update Attempts, powerup_rate, and ball speed when changed
-                Attempts = DIFFICULTIES[difficulty]['Attempts']
-                powerup_rate = DIFFICULTIES[difficulty]['powerup_rate']
-                for b in balls:
-                    b.base_speed = DIFFICULTIES[difficulty]['speed']
+                screen_key = ('title', difficulty)
             # !!! END PHASE: TITLE SCREEN !!!
-
-    # --- Drawing and Updating based on Game State ---
-    screen.fill(BG_COLOR)
-
-    # !!! PHASE: TITLE SCREEN !!!
-    if game_state == 'title_screen':
-        # Draw the title
-        title_surface = title_font.render("ARKANOID", True, (255, 255, 255))
-        title_rect = title_surface.get_rect(center=(screen_width / 2, screen_height / 2 - 50))
-        screen.blit(title_surface, title_rect)
-        
-        # Draw the start message
-        start_surface = game_font.render("Press SPACE to Start", True, (255, 255, 255))
-        start_rect = start_surface.get_rect(center=(screen_width / 2, screen_height / 2 + 20))
-        screen.blit(start_surface, start_rect)
-
-        diff_surface = game_font.render(f"1-Easy  2-Normal  3-Hard (Current: {difficulty})", True, (255, 255, 255))
-        diff_rect = diff_surface.get_rect(center=(screen_width/2, screen_height/2 + 60))
-        screen.blit(diff_surface, diff_rect)
-
-    elif game_state == 'level_transition':
-        screen.fill(BG_COLOR)
-        level_surf = game_font.render(f"Уровень {current_level+1}", True, (255, 255, 255))
-        level_rect = level_surf.get_rect(center=(screen_width/2, screen_height/2 - 20))
-        screen.blit(level_surf, level_rect)
-
-        cont_surf = game_font.render("Нажмите SPACE для начала", True, (255, 255, 255))
-        cont_rect = cont_surf.get_rect(center=(screen_width/2, screen_height/2 + 20))
-        screen.blit(cont_surf, cont_rect)
-
-        pygame.display.flip()
-        clock.tick(60)
-        continue
-
-    elif game_state == 'playing':
-        # Pause handling: if paused, display pause screen
-        if paused:
-            screen.fill(BG_COLOR)
-            pause_surf = game_font.render("PAUSED - Press ESC to resume", True, (255, 255, 255))
-            pause_rect = pause_surf.get_rect(center=(screen_width/2, screen_height/2))
-            screen.blit(pause_surf, pause_rect)
-            pygame.display.flip()
-            clock.tick(60)
-            continue
-        # --- Update all game objects ---
-        paddle.update()
-        keys = pygame.key.get_pressed()
-
-        # Laser firing while Up Arrow is held
-        if paddle.has_laser and keys[pygame.K_UP] and laser_cooldown <= 0:
-            # Fire from paddle edges
-            left_x = paddle.rect.left + 10
-            right_x = paddle.rect.right - 10
-            lasers.append(Laser(left_x, paddle.rect.top))
-            lasers.append(Laser(right_x, paddle.rect.top))
-            laser_sound.play()
-            laser_cooldown = 10  # cooldown in frames
-
-        if laser_cooldown > 0:
-            laser_cooldown -= 1
-
-        for ball in balls[:]:
-            ball_status, collision_object = ball.update(paddle, keys[pygame.K_SPACE])
-
-            if ball_status == 'lost':
-                balls.remove(ball)
-                if not balls:
-                    Attempts -= 1
-                    if Attempts <= 0:
-                        # On game over, reset all and go to title screen
-                        game_over_sound.play()
-                        # Reset paddle and balls
-                        paddle.reset()
-                        # Reset balls
-                        new_ball = Ball(screen_width, screen_height)
-                        balls = [new_ball]
-                        # Reset level, bricks, points, Attempts
-                        current_level = 0
-                        bricks = load_level(current_level)
-                        points = 0
-                        Attempts = DIFFICULTIES[difficulty]['Attempts']
-                        powerup_rate = DIFFICULTIES[difficulty]['powerup_rate']
-                        # Clear effects
-                        power_ups.clear()
-                        lasers.clear()
-                        particles.clear()
-                        fireworks.clear()
-                        # Back to title screen
-                        game_state = 'title_screen'
-                        continue
-                    else:
-                        new_ball = Ball(screen_width, screen_height)
-                        # Apply difficulty speed
-                        new_ball.base_speed = DIFFICULTIES[difficulty]['speed']
-                        balls = [new_ball]
-                        new_ball.reset()
-                        paddle.reset()
-            elif collision_object in ['wall', 'paddle']:
-                bounce_sound.play()
-                for _ in range(5):
-                    particles.append(Particle(ball.rect.centerx, ball.rect.centery, (255, 255, 0), 1, 3, 1, 3, 0))
-
-        for brick in bricks[:]:
-            for ball in balls:
-                if ball.rect.colliderect(brick.rect):
-                    ball.speed_y *= -1
-                    for _ in range(15):
-                        particles.append(Particle(brick.rect.centerx, brick.rect.centery, brick.color, 1, 4, 1, 4, 0.05))
-                    bricks.remove(brick)
-                    points += 10
-                    brick_break_sound.play()
-                    if random.random() < powerup_rate:
-                        power_up_type = random.choice(['laser', 'glue', 'slow', 'expand', 'multiball', 'speed'])
-                        power_up = PowerUp(brick.rect.centerx, brick.rect.centery, power_up_type)
-                        power_ups.append(power_up)
-                    break
-        
-        for power_up in power_ups[:]:
-            power_up.update()
-            if power_up.rect.top > screen_height:
-                power_ups.remove(power_up)
-            elif paddle.rect.colliderect(power_up.rect):
-                display_message = power_up.PROPERTIES[power_up.type]['message']
-                message_timer = 120
-                if power_up.type in ['laser', 'glue', 'expand', 'speed']:
-                    paddle.activate_power_up(power_up.type)
-                elif power_up.type == 'slow':
-                    for ball in balls:
-                        ball.activate_power_up(power_up.type)
-                elif power_up.type == 'multiball':
-                    # Spawn an extra ball at current position
-                    new_ball = Ball(screen_width, screen_height)
-                    # Apply difficulty speed
-                    new_ball.base_speed = DIFFICULTIES[difficulty]['speed']
-                    # Position and give opposite horizontal speed
-                    new_ball.rect.center = balls[0].rect.center
-                    new_ball.speed_x = -balls[0].speed_x
-                    new_ball.speed_y = balls[0].speed_y
-                    balls.append(new_ball)
-                power_ups.remove(power_up)
-        
-        for laser in lasers[:]:
-            laser.update()
-            if laser.rect.bottom < 0:
-                lasers.remove(laser)
+            elif game_state == 'level_transition':
+                screen_key = ('level', sim.current_level)
+            elif game_state == 'playing':
+                screen_key = ('paused',)
             else:
-                for brick in bricks[:]:
-                    if laser.rect.colliderect(brick.rect):
-                        for _ in range(10):
-                            particles.append(Particle(brick.rect.centerx, brick.rect.centery, brick.color, 1, 3, 1, 3, 0.05))
-                        bricks.remove(brick)
-                        lasers.remove(laser)
-                        points += 10
-                        brick_break_sound.play()
-                        break
-        
-        if not bricks:
-            current_level += 1
-            if current_level < len(LEVELS):
+                screen_key = (game_state,)
+            # Messages, particles and fireworks keep running on the title
+            # and end screens; the transition and pause screens freeze them
+            frozen = game_state in ['level_transition', 'playing']
+            animated = not frozen and (message_timer > 0 or len(particles) > 0 or fireworks
+                                       or game_state == 'you_win' or profiler.enabled)
+            if screen_key == shown_screen and not animated:
+                # Nothing changed since the screen was last shown
+                frame_time = await pacer.tick()
+                continue
+            renderer.invalidate()
+            screen.blit(screens.get(screen_key), (0, 0))
+            shown_screen = None if animated else screen_key
+            if frozen:
+                pygame.display.flip()
+                frame_time = await pacer.tick()
+                continue
+        else:
+            shown_screen = None
+
+        if game_state == 'playing':
+            # --- Update all game objects ---
+            inputs = FrameInput.from_keys(pygame.key.get_pressed())
+            profiler.lap('events')
+            events = []
+            for _ in range(timestep.advance(frame_time)):
+                events += sim.step(inputs)
+                if recorder is not None:
+                    recorder.record(inputs)
+                snapshots.record(sim)
+                if sim.status != 'playing':
+                    break
+
+            # --- Sounds and effects for what happened this frame ---
+            for name, data in events:
+                if name == 'bounce':
+                    audio.play('bounce')
+                    effects.emit(data[0], data[1], (255, 255, 0), 5, 1, 3, 1, 3, 0, LOW)
+                elif name == 'brick_hit':
+                    audio.play('brick_break')
+                    effects.emit(data.rect.centerx, data.rect.centery, data.color, 15, 1, 4, 1, 4, 0.05, NORMAL)
+                elif name == 'laser_hit':
+                    audio.play('brick_break')
+                    effects.emit(data.rect.centerx, data.rect.centery, data.color, 10, 1, 3, 1, 3, 0.05, NORMAL)
+                elif name == 'brick_damaged':
+                    audio.play('bounce')
+                    effects.emit(data.rect.centerx, data.rect.centery, data.color, 5, 1, 3, 1, 3, 0.05, LOW)
+                elif name == 'explosion':
+                    audio.play('brick_break')
+                    effects.emit(data.rect.centerx, data.rect.centery, (255, 140, 40), 40, 2, 5, 2, 6, 0.05, NORMAL)
+                elif name == 'laser':
+                    audio.play('laser')
+                elif name == 'power_up':
+                    display_message = PowerUp.PROPERTIES[data]['message']
+                    message_timer = 120
+            profiler.lap('effects')
+
+            if sim.status == 'level_cleared':
                 # Transition to next level screen
                 game_state = 'level_transition'
-            else:
-                # All levels completed: reset to title screen
-                game_over_sound.play()
-                # Reset paddle
-                paddle.reset()
-                # Reset balls
-                new_ball = Ball(screen_width, screen_height)
-                balls = [new_ball]
-                # Reset level and bricks
-                current_level = 0
-                bricks = load_level(current_level)
-                # Reset points and Attempts
-                points = 0
-                Attempts = DIFFICULTIES[difficulty]['Attempts']
-                powerup_rate = DIFFICULTIES[difficulty]['powerup_rate']
-                # Clear active effects
-                power_ups.clear()
-                lasers.clear()
-                particles.clear()
-                fireworks.clear()
-                # Return to title screen
+                background.report('level_cleared', level=sim.current_level - 1, points=sim.points,
+                                  frame=sim.frame)
+                # Build the next level's bricks while the transition shows
+                sim.prefetch_level(sim.current_level)
+            elif sim.status in ['game_over', 'won']:
+                # On game over, or when all levels are completed,
+                # reset everything and go back to the title screen
+                audio.play('game_over')
+                background.report('game_end', status=sim.status, points=sim.points, level=sim.current_level,
+                                  frame=sim.frame)
+                end_game()
                 game_state = 'title_screen'
                 continue
+            pacer.logic_done()
+
+            if not pacer.render_frame():
+                # Too slow to draw every frame: this one only runs the
+                # logic, the screen keeps the last frame drawn
+                if message_timer > 0:
+                    message_timer -= 1
+                particles.update()
+                profiler.end_frame()
+                frame_time = await pacer.tick()
+                continue
 
-        # --- Draw all game objects ---
-        paddle.draw(screen)
-        for ball in balls:
-            ball.draw(screen)
-        for brick in bricks:
-            brick.draw(screen)
-        for power_up in power_ups:
-            power_up.draw(screen)
-        for laser in lasers:
-            laser.draw(screen)
-        
-        # --- Draw UI ---
-        points_text = game_font.render(f"points: {points}", True, (255, 255, 255))
-        screen.blit(points_text, (10, 10))
-        Attempts_text = game_font.render(f"Attempts: {Attempts}", True, (255, 255, 255))
-        screen.blit(Attempts_text, (screen_width - Attempts_text.get_width() - 10, 10))
-
-    elif game_state in ['game_over', 'you_win']:
-        if game_state == 'you_win':
+            # --- Draw all game objects ---
+            renderer.draw_background(sim.bricks)
+            renderer.add(sim.paddle.draw(screen))
+            for rect in sim.balls.draw(screen):
+                renderer.add(rect)
+            for power_up in sim.power_ups:
+                renderer.add(power_up.draw(screen))
+            for laser in sim.lasers:
+                renderer.add(laser.draw(screen))
+
+            # --- Draw UI ---
+            points_text = text_cache.render(game_font, f"points: {sim.points}", (255, 255, 255))
+            renderer.add(screen.blit(points_text, (10, 10)))
+            Attempts_text = text_cache.render(game_font, f"Attempts: {sim.Attempts}", (255, 255, 255))
+            renderer.add(screen.blit(Attempts_text, (screen_width - Attempts_text.get_width() - 10, 10)))
+
+        elif game_state == 'you_win':
             firework_timer -= 1
             if firework_timer <= 0:
-                fireworks.append(Firework(screen_width, screen_height))
+                if effects.allow_firework(len(fireworks)):
+                    fireworks.append(Firework(screen_width, screen_height, effects))
                 firework_timer = random.randint(20, 50)
-            
+
             for firework in fireworks[:]:
                 firework.update()
                 if firework.is_dead():
                     fireworks.remove(firework)
-            
+
             for firework in fireworks:
                 firework.draw(screen)
 
-        message = "GAME OVER" if game_state == 'game_over' else "YOU WIN!"
-        text_surface = game_font.render(message, True, (255, 255, 255))
-        text_rect = text_surface.get_rect(center=(screen_width / 2, screen_height / 2 - 20))
-        screen.blit(text_surface, text_rect)
-        
-        # !!! PHASE: TITLE SCREEN !!!
-        # The restart message is now consistent
-        restart_surface = game_font.render("Press SPACE to return to Title", True, (255, 255, 255))
+        # --- Update effects and messages (these run in all states) ---
+        if message_timer > 0:
+            message_timer -= 1
+            message_surface = text_cache.render(message_font, display_message, (255, 255, 255))
+            message_rect = message_surface.get_rect(center=(screen_width / 2, screen_height - 60))
+            renderer.add(screen.blit(message_surface, message_rect))
+
+        profiler.lap('draw')
+        particles.update()
+        profiler.lap('particles')
+        renderer.add(particles.draw(screen))
         # !!! END PHASE: TITLE SCREEN !!!
-        restart_rect = restart_surface.get_rect(center=(screen_width / 2, screen_height / 2 + 30))
-        screen.blit(restart_surface, restart_rect)
-
-    # --- Update effects and messages (these run in all states) ---
-    if message_timer > 0:
-        message_timer -= 1
-        message_surface = message_font.render(display_message, True, (255, 255, 255))
-        message_rect = message_surface.get_rect(center=(screen_width / 2, screen_height - 60))
-        screen.blit(message_surface, message_rect)
-        
-    for particle in particles[:]:
-        particle.update()
-        if particle.size <= 0:
-            particles.remove(particle)
-    for particle in particles:
-        particle.draw(screen)
-    # !!! END PHASE: TITLE SCREEN !!!
 
-    # --- Final Display Update ---
-    pygame.display.flip()
-    clock.tick(60)
\ No newline at end of file
+        profiler.count('particles', len(particles))
+        profiler.count('dropped', effects.dropped)
+        profiler.count('bricks', len(sim.bricks))
+        profiler.count('balls', len(sim.balls))
+        profiler.count('power_ups', len(sim.power_ups))
+        profiler.count('lasers', len(sim.lasers))
+        if profiler.enabled:
+            renderer.add(profiler.draw(screen, assets.sys_font('monospace', 14)))
+        profiler.lap('draw')
+
+        # --- Final Display Update ---
+        renderer.present()
+        profiler.lap('flip')
+        profiler.end_frame()
+        if pacer.frame % 60 == 0:
+            background.report('frames', fps=round(clock.get_fps(), 1), effects=round(pacer.effects, 2),
+                              render_interval=pacer.render_interval, particles=len(particles))
+        frame_time = await pacer.tick()
+
+
+if __name__ == '__main__':
+    main()
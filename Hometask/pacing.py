@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pygame
+
+
+class FramePacer:
+    # Decides how each pass of the main loop waits and how much it draws.
+    #
+    # Idle (a static screen with nothing moving): events() blocks in
+    # pygame.event.wait instead of spinning at the frame rate, so the
+    # process sleeps until a key is pressed.
+    #
+    # Playing: the loop tells the pacer when the logic of a frame is done
+    # (logic_done) and tick() measures the logic and drawing times. When a
+    # frame does not fit in its budget, the effects are scaled down first
+    # (`effects`, 1.0 = everything, handed to the EffectsBudget); if that
+    # is not enough, only every `render_interval`-th frame is drawn. Logic
+    # runs every frame either way, and the fixed timestep keeps its ticks
+    # steady.
+    #
+    # events() and tick() are coroutines: the wait for the next frame is an
+    # asyncio sleep, during which the background work of `background` (a
+    # BackgroundIO) runs, up to the deadline of the next frame.
+    MIN_EFFECTS = 0.2
+    MAX_RENDER_INTERVAL = 4
+    # Share of the frame budget a frame may use before shedding work, and
+    # below which work is added back
+    HIGH_LOAD = 0.9
+    LOW_LOAD = 0.7
+
+    def __init__(self, clock, fps=60, idle_timeout=1000, background=None):
+        self.clock = clock
+        self.background = background
+        self.fps = fps
+        self.budget = 1 / fps
+        self.idle_timeout = idle_timeout
+        self.effects = 1.0
+        self.render_interval = 1
+        self.frame = 0
+        self.logic_time = 0.0
+        self.render_time = 0.0
+        self.frame_start = time.perf_counter()
+        self.logic_end = None
+        self.idled = False
+        self.idle_waits = 0
+
+    async def events(self, idle=False):
+        # This frame's events; while idle, wait for the first one
+        if not idle:
+            return pygame.event.get()
+        self.idled = True
+        self.idle_waits += 1
+        background = self.background
+        waited = 0.0
+        # Background work still running is polled for once a frame time;
+        # with none, the process sleeps in pygame until an event comes
+        while background is not None and background.busy() and waited < self.idle_timeout / 1000:
+            events = pygame.event.get()
+            if events:
+                return events
+            await self._sleep(time.perf_counter() + self.budget)
+            waited += self.budget
+        event = pygame.event.wait(self.idle_timeout)
+        events = [] if event.type == pygame.NOEVENT else [event]
+        events.extend(pygame.event.get())
+        return events
+
+    async def _sleep(self, deadline):
+        # Let the event loop (and background work) run until deadline
+        if self.background is not None:
+            self.background.open_window(deadline)
+        await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+
+    def logic_done(self):
+        self.logic_end = time.perf_counter()
+
+    def render_frame(self):
+        # False on frames skipped to keep up (only the logic runs)
+        return self.frame % self.render_interval == 0
+
+    async def tick(self):
+        # End of a frame: wait for the next one and return the time the
+        # logic has to catch up on, in seconds
+        now = time.perf_counter()
+        if self.logic_end is not None:
+            self._measure(now)
+        self.frame += 1
+        # The next frame starts one budget after this one did (or now, if
+        # this one ran late); that is the deadline of background work
+        await self._sleep(max(now, self.frame_start + self.budget))
+        frame_time = self.clock.tick() / 1000
+        self.frame_start = time.perf_counter()
+        if self.idled:
+            # Time spent waiting on a static screen is not game time
+            self.idled = False
+            frame_time = self.budget
+        return frame_time
+
+    def _measure(self, now):
+        logic = self.logic_end - self.frame_start
+        self.logic_time += (logic - self.logic_time) * 0.1
+        if self.render_frame():
+            self.render_time += (now - self.logic_end - self.render_time) * 0.1
+        self.logic_end = None
+
+        # Load of drawing every frame with the effects as they are now
+        load = (self.logic_time + self.render_time) / self.budget
+        if load > self.HIGH_LOAD:
+            self.effects = max(self.MIN_EFFECTS, self.effects * 0.95)
+        elif load < self.LOW_LOAD:
+            self.effects = min(1.0, self.effects * 1.02 + 0.005)
+
+        # Draw less often only once the effects are as low as they go
+        interval = 1
+        if self.effects <= self.MIN_EFFECTS:
+            while (interval < self.MAX_RENDER_INTERVAL
+                   and (self.logic_time + self.render_time / interval) / self.budget > self.HIGH_LOAD):
+                interval += 1
+        self.render_interval = interval
@@ -0,0 +1,128 @@
+import numpy as np
+import pygame
+
+
+class ParticlePool:
+    # Structure-of-arrays particle system. Every particle lives in a slot of
+    # a few preallocated NumPy arrays; the live ones are always packed into
+    # the first `count` slots, so update and cleanup are one vectorized pass
+    # and drawing is a single Surface.blits call.
+    SHRINK = 0.1  # Particles shrink over time
+
+    def __init__(self, capacity=4096, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.gravity = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        # Higher priority particles are the last to be culled (see cull)
+        self.priority = np.zeros(capacity, dtype=np.uint8)
+        self.arrays = (self.x, self.y, self.vx, self.vy, self.size, self.gravity, self.color, self.priority)
+        # One pre-drawn circle per (color, radius), shared by all particles
+        self.sprites = {}
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, x, y, color, amount, min_size, max_size, min_speed, max_speed, gravity, priority=0):
+        # Same distribution as the old Particle class: integer size, random
+        # direction and speed. Returns how many particles actually fit.
+        amount = min(amount, self.capacity - self.count)
+        if amount <= 0:
+            return 0
+        start, end = self.count, self.count + amount
+        angle = self.rng.uniform(0, 2 * np.pi, amount)
+        speed = self.rng.uniform(min_speed, max_speed, amount)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = speed * np.cos(angle)
+        self.vy[start:end] = speed * np.sin(angle)
+        self.size[start:end] = self.rng.integers(min_size, max_size, amount, endpoint=True)
+        self.gravity[start:end] = gravity
+        self.color[start:end] = color
+        self.priority[start:end] = priority
+        self.count = end
+        return amount
+
+    def cull(self, amount, below):
+        # Remove up to `amount` particles of a priority lower than `below`:
+        # lowest priority first, and the smallest (closest to fading out)
+        # first within a priority. Returns how many were removed.
+        n = self.count
+        candidates = np.flatnonzero(self.priority[:n] < below)
+        if not len(candidates) or amount <= 0:
+            return 0
+        if len(candidates) > amount:
+            order = np.lexsort((self.size[candidates], self.priority[candidates]))
+            candidates = candidates[order[:amount]]
+        alive = np.ones(n, dtype=bool)
+        alive[candidates] = False
+        live = n - len(candidates)
+        for array in self.arrays:
+            array[:live] = array[:n][alive]
+        self.count = live
+        return len(candidates)
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.vy[:n] += self.gravity[:n]
+        self.size[:n] -= self.SHRINK
+        alive = self.size[:n] > 0
+        live = int(np.count_nonzero(alive))
+        if live < n:
+            # Pack the survivors to the front, keeping their order
+            for array in self.arrays:
+                array[:live] = array[:n][alive]
+            self.count = live
+
+    def _sprite(self, key):
+        radius = key & 0xFF
+        rgb = key >> 8
+        color = ((rgb >> 16) & 0xFF, (rgb >> 8) & 0xFF, rgb & 0xFF)
+        surface = pygame.Surface((radius * 2, radius * 2))
+        # Use a color key that can never clash with the particle color
+        background = (0, 0, 0) if color != (0, 0, 0) else (255, 0, 255)
+        surface.fill(background)
+        surface.set_colorkey(background, pygame.RLEACCEL)
+        pygame.draw.circle(surface, color, (radius, radius), radius)
+        self.sprites[key] = surface
+        return surface
+
+    def draw(self, screen):
+        # Returns the bounding rect of everything drawn, or None
+        n = self.count
+        if not n:
+            return None
+        radius = self.size[:n].astype(np.int32)
+        visible = radius > 0
+        if not visible.any():
+            return None
+        radius = radius[visible]
+        left = self.x[:n][visible].astype(np.int32) - radius
+        top = self.y[:n][visible].astype(np.int32) - radius
+        color = self.color[:n][visible].astype(np.int64)
+        keys = ((color[:, 0] << 16 | color[:, 1] << 8 | color[:, 2]) << 8) | radius
+        sprites = self.sprites
+        missing = set(keys.tolist()).difference(sprites)
+        for key in missing:
+            self._sprite(key)
+        screen.blits(
+            [(sprites[key], (px, py)) for key, px, py in zip(keys.tolist(), left.tolist(), top.tolist())],
+            doreturn=False,
+        )
+        right = left + 2 * radius
+        bottom = top + 2 * radius
+        x, y = int(left.min()), int(top.min())
+        return pygame.Rect(x, y, int(right.max()) - x, int(bottom.max()) - y).clip(screen.get_rect())
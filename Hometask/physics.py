@@ -0,0 +1,199 @@
+import math
+
+import numpy as np
+
+# Physics runs in fixed ticks of STEP_TIME seconds. All speeds in the game
+# are "pixels per tick", so at 60 ticks per second the game plays exactly
+# like the old one-update-per-frame loop did.
+TICKS_PER_SECOND = 60
+STEP_TIME = 1.0 / TICKS_PER_SECOND
+
+
+class FixedTimestep:
+    # Accumulates real frame time and tells the caller how many fixed
+    # physics ticks to run this frame. A slow frame is caught up with extra
+    # ticks (up to max_steps; anything beyond that is dropped so one long
+    # stall cannot snowball into ever longer frames).
+    def __init__(self, step_time=STEP_TIME, max_steps=5):
+        self.step_time = step_time
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.step_time)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step_time
+        return steps
+
+    @property
+    def alpha(self):
+        # How far we are into the next tick (0..1), for interpolation
+        return self.accumulator / self.step_time
+
+
+def _ray_circle(x, y, dx, dy, cx, cy, radius):
+    # Earliest t in [0, 1] where the point (x, y) + t * (dx, dy) is at
+    # distance radius from (cx, cy), or None
+    fx = x - cx
+    fy = y - cy
+    a = dx * dx + dy * dy
+    b = 2 * (fx * dx + fy * dy)
+    c = fx * fx + fy * fy - radius * radius
+    if a == 0:
+        return None
+    disc = b * b - 4 * a * c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / (2 * a)
+    if 0 <= t <= 1:
+        return t
+    return None
+
+
+def _overlap(x, y, dx, dy, left, right, top, bottom):
+    # Contact at t = 0 for a center inside the grown rect: the normal of the
+    # nearest side, if the move goes away from it (deeper in)
+    depth, nx, ny = min((x - left, -1, 0), (right - x, 1, 0), (y - top, 0, -1), (bottom - y, 0, 1))
+    return (0.0, nx, ny) if dx * nx + dy * ny < 0 else None
+
+
+def sweep_circle_rect(x, y, dx, dy, radius, rect):
+    # Continuous collision of a circle centered at (x, y) moving by (dx, dy)
+    # against an axis-aligned rect. Returns (t, nx, ny): the fraction of the
+    # move at first contact and the surface normal there, or None if the
+    # circle does not touch the rect during the move. A circle that already
+    # overlaps the rect (spawned inside a brick, say) touches it at t = 0 if
+    # it moves further in, with the normal of the side it is least deep
+    # past; moving out, it is let go.
+    #
+    # This is a ray cast against the rect grown by the radius (the Minkowski
+    # sum), with rounded corners handled by a ray-vs-circle test.
+    left = rect.left - radius
+    right = rect.right + radius
+    top = rect.top - radius
+    bottom = rect.bottom + radius
+
+    t_enter = -math.inf
+    t_exit = math.inf
+    nx = ny = 0
+    if dx != 0:
+        t1 = (left - x) / dx
+        t2 = (right - x) / dx
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_enter:
+            t_enter = t1
+            nx, ny = (-1 if dx > 0 else 1), 0
+        t_exit = min(t_exit, t2)
+    elif not left < x < right:
+        return None
+    if dy != 0:
+        t1 = (top - y) / dy
+        t2 = (bottom - y) / dy
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_enter:
+            t_enter = t1
+            nx, ny = 0, (-1 if dy > 0 else 1)
+        t_exit = min(t_exit, t2)
+    elif not top < y < bottom:
+        return None
+
+    if t_enter > t_exit or t_exit < 0 or t_enter > 1:
+        return None
+
+    # Where the center enters the grown rect decides face or corner. A
+    # center that starts inside the grown rect can still be clear of the
+    # rounded corner, so it is only rejected on a face.
+    if t_enter < 0:
+        px, py = x, y
+    else:
+        px = x + dx * t_enter
+        py = y + dy * t_enter
+    corner_x = rect.left if px < rect.left else rect.right if px > rect.right else None
+    corner_y = rect.top if py < rect.top else rect.bottom if py > rect.bottom else None
+    if corner_x is None or corner_y is None:
+        if t_enter < 0:
+            return _overlap(x, y, dx, dy, left, right, top, bottom)
+        return t_enter, nx, ny
+    if t_enter < 0 and 0 < (x - corner_x) ** 2 + (y - corner_y) ** 2 < radius * radius:
+        # Already over the rounded corner
+        distance = math.hypot(x - corner_x, y - corner_y)
+        nx = (x - corner_x) / distance
+        ny = (y - corner_y) / distance
+        return (0.0, nx, ny) if dx * nx + dy * ny < 0 else None
+    t = _ray_circle(x, y, dx, dy, corner_x, corner_y, radius)
+    if t is None:
+        return None
+    nx = (x + dx * t - corner_x) / radius
+    ny = (y + dy * t - corner_y) / radius
+    return t, nx, ny
+
+
+def sweep_circle_rect_many(x, y, dx, dy, radius, rect):
+    # sweep_circle_rect for arrays of circles against one rect. Returns
+    # (t, nx, ny) arrays; t is inf where there is no contact. Circles that
+    # already overlap the rect are not reported: its one caller, the paddle
+    # test of BallSystem, checks for those itself.
+    left = rect.left - radius
+    right = rect.right + radius
+    top = rect.top - radius
+    bottom = rect.bottom + radius
+    n = len(x)
+    t_enter = np.full(n, -np.inf)
+    t_exit = np.full(n, np.inf)
+    nx = np.zeros(n)
+    ny = np.zeros(n)
+    miss = np.zeros(n, dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for pos, d, low, high, axis in ((x, dx, left, right, 0), (y, dy, top, bottom, 1)):
+            moving = d != 0
+            t1 = (low - pos) / d
+            t2 = (high - pos) / d
+            near = np.where(moving, np.minimum(t1, t2), -np.inf)
+            far = np.where(moving, np.maximum(t1, t2), np.inf)
+            miss |= ~moving & ~((low < pos) & (pos < high))
+            later = near > t_enter
+            t_enter = np.where(later, near, t_enter)
+            normal = np.where(d > 0, -1.0, 1.0)
+            if axis == 0:
+                nx = np.where(later, normal, nx)
+                ny = np.where(later, 0.0, ny)
+            else:
+                nx = np.where(later, 0.0, nx)
+                ny = np.where(later, normal, ny)
+            t_exit = np.minimum(t_exit, far)
+
+        miss |= (t_enter > t_exit) | (t_exit < 0) | (t_enter > 1)
+        started_inside = t_enter < 0
+        px = np.where(started_inside, x, x + dx * t_enter)
+        py = np.where(started_inside, y, y + dy * t_enter)
+        corner_x = np.where(px < rect.left, rect.left, np.where(px > rect.right, rect.right, np.nan))
+        corner_y = np.where(py < rect.top, rect.top, np.where(py > rect.bottom, rect.bottom, np.nan))
+        face = np.isnan(corner_x) | np.isnan(corner_y)
+
+        t = np.where(~miss & face & ~started_inside, t_enter, np.inf)
+
+        # Rounded corners: ray against a circle around the corner
+        corner = ~miss & ~face
+        if corner.any():
+            fx = x - corner_x
+            fy = y - corner_y
+            a = dx * dx + dy * dy
+            b = 2 * (fx * dx + fy * dy)
+            c = fx * fx + fy * fy - radius * radius
+            disc = b * b - 4 * a * c
+            tc = (-b - np.sqrt(np.where(disc >= 0, disc, 0))) / (2 * a)
+            hit = corner & (a != 0) & (disc >= 0) & (tc >= 0) & (tc <= 1)
+            t = np.where(hit, tc, t)
+            nx = np.where(hit, (x + dx * tc - corner_x) / radius, nx)
+            ny = np.where(hit, (y + dy * tc - corner_y) / radius, ny)
+    return t, nx, ny
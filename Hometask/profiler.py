@@ -0,0 +1,178 @@
+import csv
+from collections import deque
+from time import perf_counter_ns
+
+import pygame
+
+# Phases of one frame, in the order they run. The simulation reports its
+# own phases (paddle, balls, power_ups, lasers) once per physics tick; they
+# are summed over the frame.
+PHASES = ['events', 'paddle', 'balls', 'power_ups', 'lasers', 'effects', 'particles', 'draw', 'flip']
+COUNTERS = ['particles', 'dropped', 'bricks', 'balls', 'power_ups', 'lasers']
+# CSV rows written at a time
+CSV_BATCH = 60
+
+
+def _noop(*args):
+    pass
+
+
+class FrameProfiler:
+    # Per-phase frame timing with perf_counter_ns. Code calls lap(phase) at
+    # the end of each phase; the time since the previous lap is charged to
+    # that phase. Rolling p50/p95/p99 are kept over the last `window` frames
+    # and can be drawn as an overlay or streamed to a CSV file.
+    #
+    # While disabled, begin_frame/lap/count/end_frame are replaced by a
+    # no-op function, so the instrumentation costs one empty call per site.
+    # Enabling it (F3) in the middle of a frame only arms it: lap, count and
+    # end_frame stay no-ops until the next begin_frame, so the first frame
+    # measured is a whole one.
+    #
+    # CSV rows are written CSV_BATCH at a time, on the file thread of
+    # `background` (a BackgroundIO) when there is one.
+    def __init__(self, window=240, enabled=False, csv_path=None):
+        self.window = window
+        self.samples = {phase: deque(maxlen=window) for phase in PHASES}
+        self.totals = deque(maxlen=window)
+        self.frame_times = dict.fromkeys(PHASES, 0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.last = 0
+        self.frame_start = 0
+        self.frames = 0
+        self.csv_path = csv_path
+        self.csv_file = None
+        self.csv_writer = None
+        self.csv_rows = []
+        self.background = None
+        self.overlay = None
+        self.overlay_age = 0
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.lap = self.count = self.end_frame = _noop
+        if enabled:
+            self.begin_frame = self._arm
+        else:
+            self.begin_frame = _noop
+            self.overlay = None
+
+    def _arm(self):
+        # First begin_frame after enabling: start measuring from here
+        self.begin_frame = self._begin_frame
+        self.lap = self._lap
+        self.count = self._count
+        self.end_frame = self._end_frame
+        self._begin_frame()
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+
+    def _begin_frame(self):
+        for phase in self.frame_times:
+            self.frame_times[phase] = 0
+        self.frame_start = self.last = perf_counter_ns()
+
+    def _lap(self, phase):
+        now = perf_counter_ns()
+        self.frame_times[phase] += now - self.last
+        self.last = now
+
+    def _count(self, name, value):
+        self.counters[name] = value
+
+    def _end_frame(self):
+        total = self.last - self.frame_start
+        self.totals.append(total)
+        for phase, elapsed in self.frame_times.items():
+            self.samples[phase].append(elapsed)
+        self.frames += 1
+        if self.csv_path:
+            self._write_csv(total)
+
+    def _write_csv(self, total):
+        self.csv_rows.append(
+            [self.frames, total // 1000]
+            + [self.frame_times[phase] // 1000 for phase in PHASES]
+            + [self.counters[name] for name in COUNTERS]
+        )
+        if len(self.csv_rows) >= CSV_BATCH:
+            self._flush_csv()
+
+    def _flush_csv(self):
+        rows, self.csv_rows = self.csv_rows, []
+        if self.background is not None:
+            self.background.write(self._write_rows, rows)
+        else:
+            self._write_rows(rows)
+
+    def _write_rows(self, rows):
+        if self.csv_writer is None:
+            self.csv_file = open(self.csv_path, 'w', newline='')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(['frame', 'total_us'] + [f"{phase}_us" for phase in PHASES] + COUNTERS)
+        self.csv_writer.writerows(rows)
+
+    def _close_csv(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+
+    def close(self):
+        if self.csv_rows:
+            self._flush_csv()
+        if self.background is not None:
+            self.background.write(self._close_csv)
+        else:
+            self._close_csv()
+
+    @staticmethod
+    def percentiles(samples):
+        # (p50, p95, p99) of a sample window, in nanoseconds
+        if not samples:
+            return (0, 0, 0)
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return tuple(ordered[min(last, int(last * q + 0.5))] for q in (0.50, 0.95, 0.99))
+
+    def report(self):
+        # {phase: (p50, p95, p99)} in milliseconds, plus 'frame' for the total
+        report = {'frame': tuple(t / 1e6 for t in self.percentiles(self.totals))}
+        for phase in PHASES:
+            report[phase] = tuple(t / 1e6 for t in self.percentiles(self.samples[phase]))
+        return report
+
+    def draw(self, screen, font, position=(10, 50)):
+        # The overlay text is re-rendered a few times a second, not every
+        # frame, so drawing it barely shows up in its own numbers
+        if not self.enabled:
+            return None
+        if self.overlay is None or self.overlay_age >= 15:
+            self.overlay = self._render_overlay(font)
+            self.overlay_age = 0
+        self.overlay_age += 1
+        return screen.blit(self.overlay, position)
+
+    def _render_overlay(self, font):
+        lines = [f"{'phase':<10}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+        for phase, (p50, p95, p99) in self.report().items():
+            lines.append(f"{phase:<10}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}")
+        lines.append('  '.join(f"{name}={value}" for name, value in self.counters.items()))
+        surfaces = [font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        height = sum(surface.get_height() for surface in surfaces) + 10
+        overlay = pygame.Surface((width, height))
+        overlay.fill((0, 0, 0))
+        overlay.set_alpha(190)
+        y = 5
+        for surface in surfaces:
+            overlay.blit(surface, (5, y))
+            y += surface.get_height()
+        return overlay
+
+
+# Shared disabled profiler for code that is not being profiled
+NO_PROFILER = FrameProfiler()
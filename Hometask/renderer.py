@@ -0,0 +1,132 @@
+import pygame
+
+from assets import AssetManager, surface_bytes
+from brick_atlas import BrickAtlas
+from simulation import BRICK_COLORS
+
+
+class Renderer:
+    # Owns the background (color and bricks) and the final display update
+    # of the playing screen. In the default mode it fills the screen, draws
+    # every brick and flips the whole surface, like the game always did.
+    #
+    # Bricks are drawn from a BrickAtlas with a single Surface.blits call
+    # over a ready-made (atlas, rect, tile) sequence. The sequence is built
+    # once per level; entries are dropped as bricks break (BrickGrid lists
+    # the bricks removed since the last frame, so nothing is rescanned) and
+    # re-tiled as multi-hit bricks change color. Atlases are 'level'
+    # surfaces of the AssetManager.
+    #
+    # With dirty=True the background color and the bricks are kept on an
+    # off-screen layer that only changes when a brick breaks. Each frame the
+    # layer is copied back over the rects drawn last frame, the moving
+    # objects are drawn again, and only those rects are pushed to the display
+    # with pygame.display.update(rects).
+    def __init__(self, screen, bg_color, dirty=False, assets=None):
+        self.screen = screen
+        self.bg_color = bg_color
+        self.dirty = dirty
+        self.assets = assets if assets is not None else AssetManager()
+        self.layer = None
+        self.bricks = None
+        # brick -> (atlas surface, brick rect, tile area), in level order
+        self.brick_blits = {}
+        self.previous = []
+        self.current = []
+        self.full_redraw = True
+        self.background_drawn = False
+
+    def invalidate(self):
+        # The next frame repaints and flips the whole screen
+        self.full_redraw = True
+
+    def draw_background(self, bricks):
+        self.background_drawn = True
+        if not self.dirty:
+            if bricks is not self.bricks:
+                self._load_bricks(bricks)
+            elif bricks.removed:
+                self._drop_broken_bricks(bricks)
+            if bricks.changed:
+                self._restyle_bricks(bricks)
+            self.screen.fill(self.bg_color)
+            # Surface.blits wants a sequence or an iterator, not a view
+            self.screen.blits(iter(self.brick_blits.values()), doreturn=False)
+            return
+        if bricks is not self.bricks:
+            self._build_layer(bricks)
+        elif bricks.removed:
+            self._drop_broken_bricks(bricks)
+        if bricks.changed:
+            self._restyle_bricks(bricks)
+        if self.full_redraw:
+            self.screen.blit(self.layer, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(self.layer, rect, rect)
+
+    def _atlas(self, width, height):
+        return self.assets.surface(('brick_atlas', width, height),
+                                   lambda: BrickAtlas(width, height, BRICK_COLORS),
+                                   group='level', size=lambda atlas: surface_bytes(atlas.surface))
+
+    def _load_bricks(self, bricks):
+        self.bricks = bricks
+        self.brick_blits = {}
+        bricks.changed.clear()
+        bricks.removed.clear()
+        for brick in bricks:
+            atlas = self._atlas(brick.rect.width, brick.rect.height)
+            self.brick_blits[brick] = atlas.blit_item(brick)
+
+    def _drop_broken_bricks(self, bricks):
+        for brick in bricks.removed:
+            if self.brick_blits.pop(brick, None) is None:
+                continue
+            if self.dirty:
+                # Bricks never overlap, so a broken one is erased by
+                # painting the background over its rect
+                self.layer.fill(self.bg_color, brick.rect)
+                self.screen.blit(self.layer, brick.rect, brick.rect)
+                self.current.append(brick.rect.copy())
+        bricks.removed.clear()
+
+    def _restyle_bricks(self, bricks):
+        # Bricks that changed color (multi-hit bricks taking a hit) get a
+        # new tile, and are repainted on the layer in dirty mode
+        for brick in bricks.changed:
+            atlas = self._atlas(brick.rect.width, brick.rect.height)
+            self.brick_blits[brick] = atlas.blit_item(brick)
+            if self.dirty:
+                self.layer.fill(self.bg_color, brick.rect)
+                self.layer.blit(*self.brick_blits[brick])
+                self.screen.blit(self.layer, brick.rect, brick.rect)
+                self.current.append(brick.rect.copy())
+        bricks.changed.clear()
+
+    def _build_layer(self, bricks):
+        if self.layer is None:
+            self.layer = pygame.Surface(self.screen.get_size()).convert()
+        self._load_bricks(bricks)
+        self.layer.fill(self.bg_color)
+        self.layer.blits(iter(self.brick_blits.values()), doreturn=False)
+        self.full_redraw = True
+
+    def add(self, rect):
+        # Register something drawn this frame (draw calls and blits return
+        # the rect they touched)
+        if rect is not None and self.dirty:
+            self.current.append(rect)
+
+    def present(self):
+        # Frames without the playing background (title, pause, ...) are
+        # drawn by the caller and always flipped whole
+        if self.dirty and self.background_drawn and not self.full_redraw:
+            pygame.display.update(self.previous + self.current)
+        else:
+            pygame.display.flip()
+        if self.background_drawn:
+            self.full_redraw = False
+        self.background_drawn = False
+        self.previous = self.current
+        self.current = []
@@ -0,0 +1,222 @@
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+from simulation import GameSimulation, FrameInput, DIFFICULTIES, rules_digest
+from level_pack import LevelPack, default_pack
+
+# Replay file layout (little endian):
+#   header  magic "ARKR", version, seed, difficulty, start level, rules
+#           digest (simulation.rules_digest: levels, brick types and
+#           difficulty settings the game was played with)
+#   result  ticks played, final points, final level, final status,
+#           length + bitset of the bricks still standing
+#   inputs  length + zlib-compressed run-length list of
+#           (input bitmask byte, run length varint)
+# A game is replayed by feeding the same inputs to a GameSimulation seeded
+# with the same seed; the result block is what the replay must end on.
+# Version 3 added the rules digest; older replays were recorded before the
+# brick types changed the levels and cannot be played back.
+MAGIC = b'ARKR'
+VERSION = 3
+HEADER = struct.Struct('<4sBIBB8s')
+RESULT = struct.Struct('<IIBBH')
+DIFFICULTY_NAMES = list(DIFFICULTIES)
+STATUSES = ['playing', 'level_cleared', 'game_over', 'won']
+
+
+class ReplayError(Exception):
+    pass
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class ReplayRecorder:
+    # Collects the input bitmask of every simulation tick as runs of equal
+    # masks. Held keys change a few times a second at most, so an hour of
+    # play is a few thousand runs, which zlib then squeezes further.
+    def __init__(self, seed, difficulty, level=0):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.level = level
+        self.runs = []
+        self.ticks = 0
+
+    def record(self, inputs):
+        mask = inputs.to_mask()
+        if self.runs and self.runs[-1][0] == mask:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([mask, 1])
+        self.ticks += 1
+
+    def truncate(self, ticks):
+        # Forget the inputs after the first `ticks`, e.g. when the game is
+        # rewound to that tick
+        drop = self.ticks - ticks
+        while drop > 0:
+            count = self.runs[-1][1]
+            if count > drop:
+                self.runs[-1][1] -= drop
+                break
+            self.runs.pop()
+            drop -= count
+        self.ticks = min(self.ticks, ticks)
+
+    def encode(self, sim):
+        body = bytearray()
+        for mask, count in self.runs:
+            body.append(mask)
+            _write_varint(body, count)
+        body = zlib.compress(bytes(body), 9)
+        bricks = sim.bricks.live_mask()
+        return b''.join([
+            HEADER.pack(MAGIC, VERSION, self.seed, DIFFICULTY_NAMES.index(self.difficulty), self.level,
+                        rules_digest(sim.level_pack)),
+            RESULT.pack(self.ticks, sim.points, sim.current_level, STATUSES.index(sim.status), len(bricks)),
+            bricks,
+            struct.pack('<I', len(body)),
+            body,
+        ])
+
+    def save(self, path, sim):
+        # sim is the simulation the inputs were recorded from, in its
+        # final state
+        with open(path, 'wb') as f:
+            f.write(self.encode(sim))
+
+
+class Replay:
+    def __init__(self, data):
+        if len(data) < 5 or data[:4] != MAGIC:
+            raise ReplayError("not a replay file")
+        version = data[4]
+        if version < VERSION:
+            raise ReplayError(f"replay version {version} was recorded under older game rules "
+                              f"and cannot be played back")
+        if version != VERSION:
+            raise ReplayError(f"unsupported replay version {version}")
+        try:
+            self._parse(data)
+        except (struct.error, zlib.error, IndexError, ValueError) as e:
+            raise ReplayError("damaged replay file") from e
+
+    def _parse(self, data):
+        magic, version, self.seed, difficulty, self.level, self.rules = HEADER.unpack_from(data, 0)
+        self.difficulty = DIFFICULTY_NAMES[difficulty]
+        pos = HEADER.size
+        self.ticks, self.points, self.final_level, status, bricks_len = RESULT.unpack_from(data, pos)
+        self.status = STATUSES[status]
+        pos += RESULT.size
+        self.bricks = bytes(data[pos:pos + bricks_len])
+        pos += bricks_len
+        (body_len,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        if pos + body_len > len(data):
+            raise ValueError("inputs cut short")
+        body = zlib.decompress(data[pos:pos + body_len])
+        self.runs = []
+        pos = 0
+        while pos < len(body):
+            mask = body[pos]
+            count, pos = _read_varint(body, pos + 1)
+            self.runs.append((mask, count))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def play(self, level_pack=None):
+        # Run the recorded inputs through a fresh simulation, as fast as
+        # possible, on the levels of level_pack (the built-in ones without).
+        # Levels are started as soon as they are cleared, like pressing
+        # SPACE on the transition screen.
+        if rules_digest(level_pack) != self.rules:
+            raise ReplayError("recorded with different levels or brick rules")
+        try:
+            sim = GameSimulation(self.difficulty, level=self.level, seed=self.seed, level_pack=level_pack)
+        except IndexError:
+            raise ReplayError(f"starts on level {self.level + 1}, which the levels do not have") from None
+        for mask, count in self.runs:
+            inputs = FrameInput.from_mask(mask)
+            for _ in range(count):
+                if sim.status == 'level_cleared':
+                    sim.start_level(sim.current_level)
+                sim.step(inputs)
+        return sim
+
+    def mismatches(self, sim):
+        # Differences between the recorded result and a replayed simulation
+        found = []
+        if sim.frame != self.ticks:
+            found.append(f"ticks: recorded {self.ticks}, replayed {sim.frame}")
+        if sim.points != self.points:
+            found.append(f"points: recorded {self.points}, replayed {sim.points}")
+        if sim.current_level != self.final_level:
+            found.append(f"level: recorded {self.final_level}, replayed {sim.current_level}")
+        if sim.status != self.status:
+            found.append(f"status: recorded {self.status}, replayed {sim.status}")
+        if sim.bricks.live_mask() != self.bricks:
+            found.append("bricks left standing differ")
+        return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded Arkanoid game headless and check its result")
+    parser.add_argument('replays', nargs='+', help="replay files written by main.py --record")
+    parser.add_argument('--pack', metavar='FILE',
+                        help="level pack the games were played on (default: the game's levels.arkl, "
+                             "or the built-in levels)")
+    args = parser.parse_args()
+
+    # Each replay is played on the first of these its rules digest matches
+    if args.pack:
+        packs = [LevelPack(args.pack)]
+    else:
+        packs = [pack for pack in (default_pack(),) if pack is not None] + [None]
+    digests = [rules_digest(pack) for pack in packs]
+
+    failed = 0
+    for path in args.replays:
+        try:
+            replay = Replay.load(path)
+            pack = packs[digests.index(replay.rules)] if replay.rules in digests else packs[0]
+            start = time.perf_counter()
+            sim = replay.play(pack)
+        except ReplayError as e:
+            print(f"{path}: {e}")
+            failed += 1
+            continue
+        elapsed = time.perf_counter() - start
+        problems = replay.mismatches(sim)
+        print(f"{path}: {replay.difficulty}, {replay.ticks} ticks "
+              f"({replay.ticks / 60:.0f}s of play) replayed in {elapsed:.2f}s, points {sim.points}")
+        for problem in problems:
+            print(f"  MISMATCH {problem}")
+        if problems:
+            failed += 1
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import pygame
+
+WHITE = (255, 255, 255)
+
+
+class StateScreens:
+    # Full-screen surfaces of the static states: title, level transition,
+    # pause, game over and win. Each one is built once per distinct content
+    # (the chosen difficulty, the level number, ...) and kept in the
+    # AssetManager, so showing it is a single blit.
+    #
+    # A key is a tuple: ('title', difficulty), ('level', level index),
+    # ('paused',), ('game_over',) or ('you_win',).
+    def __init__(self, size, bg_color, title_font, game_font, assets):
+        self.size = size
+        self.bg_color = bg_color
+        self.title_font = title_font
+        self.game_font = game_font
+        self.assets = assets
+
+    def get(self, key):
+        return self.assets.surface(('screen',) + key, lambda: self._build(key), group='screens')
+
+    def _lines(self, key):
+        # (font, text, offset of the line's center from the screen's center)
+        kind = key[0]
+        if kind == 'title':
+            return [
+                (self.title_font, "ARKANOID", -50),
+                (self.game_font, "Press SPACE to Start", 20),
+                (self.game_font, f"1-Easy  2-Normal  3-Hard (Current: {key[1]})", 60),
+            ]
+        if kind == 'level':
+            return [
+                (self.game_font, f"Уровень {key[1] + 1}", -20),
+                (self.game_font, "Нажмите SPACE для начала", 20),
+            ]
+        if kind == 'paused':
+            return [(self.game_font, "PAUSED - Press ESC to resume", 0)]
+        message = "GAME OVER" if kind == 'game_over' else "YOU WIN!"
+        return [
+            (self.game_font, message, -20),
+            (self.game_font, "Press SPACE to return to Title", 30),
+        ]
+
+    def _build(self, key):
+        surface = pygame.Surface(self.size)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(self.bg_color)
+        width, height = self.size
+        for font, text, offset in self._lines(key):
+            text_surface = font.render(text, True, WHITE)
+            surface.blit(text_surface, text_surface.get_rect(center=(width / 2, height / 2 + offset)))
+        return surface
@@ -0,0 +1,403 @@
+import hashlib
+import random
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+
+from game_objects import Paddle, Brick, PowerUp, Laser
+from ball_system import BallSystem, EVENT_WALL, EVENT_PADDLE, EVENT_LOST
+from brick_grid import BrickGrid
+from profiler import NO_PROFILER
+from entity_store import EntityList
+from level_pack import pattern_cells, TYPE_MASK, HP_SHIFT
+
+# The simulation only needs pygame.Rect, so it runs without a window,
+# without the mixer and without a frame cap.
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+BRICK_COLORS = [(178, 34, 34), (255, 165, 0), (255, 215, 0), (50, 205, 50)]
+
+# --- Level Setup ---
+LEVELS = [
+    [
+        "XXXXXXXXXX",
+        "X        X",
+        "X XXXXX  X",
+        "X        X",
+        "XXXXXXXXXX",
+    ],
+    [
+        "XXXXXXXXXX",
+        "X        X",
+        "X XXXX   X",
+        "X   XX   X",
+        "XXXXXXXXXX",
+    ],
+    [
+        "X  X  X  X",
+        " XX XX XX ",
+        "XXXXXXXXXX",
+        " XX XX XX ",
+        "X  X  X  X",
+    ],
+    [
+        "XXXXXXXXXX",
+        "X        X",
+        "X X  X X X",
+        "X  XX  XX ",
+        "XXXXXXXXXX",
+    ],
+    # Letters other than X are the brick types of Brick.TYPES
+    [
+        "SHHHHHHHHS",
+        "XXBXXXXBXX",
+        "XP  SS  PX",
+        "XXBXXXXBXX",
+        "HHHHHHHHHH",
+    ],
+]
+
+# --- Difficulty settings ---
+DIFFICULTIES = {
+    'Easy':   {'Attempts': 5, 'speed': 4, 'powerup_rate': 0.5},
+    'Normal': {'Attempts': 3, 'speed': 6, 'powerup_rate': 0.3},
+    'Hard':   {'Attempts': 1, 'speed': 12, 'powerup_rate': 0.1},
+}
+
+POWERUP_TYPES = ['laser', 'glue', 'slow', 'expand', 'multiball', 'speed']
+
+
+def load_level(idx, screen_width=SCREEN_WIDTH, pack=None):
+    # Level idx of a LevelPack, or of LEVELS without one
+    if pack is not None:
+        cells = pack.level(idx)
+    else:
+        columns, rows, data = pattern_cells(LEVELS[idx])
+        cells = np.frombuffer(data, dtype=np.uint8).reshape(rows, columns)
+    brick_width = screen_width // cells.shape[1]
+    brick_height = 20
+    # One grid cell per brick slot, so every brick sits in exactly one cell
+    bricks = BrickGrid(brick_width, brick_height + 5, origin=(0, 50), shape=cells.shape)
+    rows, columns = np.nonzero(cells & TYPE_MASK)
+    for row, col in zip(rows.tolist(), columns.tolist()):
+        x = col * brick_width
+        y = row * (brick_height + 5) + 50
+        cell = int(cells[row, col])
+        type = cell & TYPE_MASK
+        color = Brick.TYPES[type]['color'] or BRICK_COLORS[row % len(BRICK_COLORS)]
+        bricks.add(Brick(x, y, brick_width - 5, brick_height, color, type, cell >> HP_SHIFT))
+    return bricks
+
+
+def rules_digest(pack=None):
+    # 8-byte fingerprint of everything a game's outcome depends on besides
+    # the seed and the inputs: the levels (of a LevelPack, or LEVELS), the
+    # brick types and the difficulty settings. Replays store it, so one is
+    # only ever played back under the rules it was recorded with.
+    digest = hashlib.sha1()
+    for idx in range(len(pack) if pack is not None else len(LEVELS)):
+        if pack is not None:
+            cells = pack.level(idx)
+            rows, columns = cells.shape
+            data = cells.tobytes()
+        else:
+            columns, rows, data = pattern_cells(LEVELS[idx])
+        digest.update(struct.pack('<HH', rows, columns))
+        digest.update(data)
+    for code, properties in sorted(Brick.TYPES.items()):
+        digest.update(repr((code, properties['hp'], properties['points'], properties['indestructible'],
+                            properties['explosion'], properties['drop'])).encode())
+    digest.update(repr(sorted(DIFFICULTIES.items())).encode())
+    return digest.digest()[:8]
+
+
+class FrameInput:
+    # The buttons held down during one simulation step
+    LEFT = 1
+    RIGHT = 2
+    UP = 4
+    SPACE = 8
+
+    def __init__(self, left=False, right=False, up=False, space=False):
+        self.left = left
+        self.right = right
+        self.up = up
+        self.space = space
+
+    def to_mask(self):
+        return ((self.LEFT if self.left else 0) | (self.RIGHT if self.right else 0)
+                | (self.UP if self.up else 0) | (self.SPACE if self.space else 0))
+
+    @classmethod
+    def from_mask(cls, mask):
+        return cls(bool(mask & cls.LEFT), bool(mask & cls.RIGHT), bool(mask & cls.UP), bool(mask & cls.SPACE))
+
+    @classmethod
+    def from_keys(cls, keys):
+        return cls(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], keys[pygame.K_UP], keys[pygame.K_SPACE])
+
+
+NO_INPUT = FrameInput()
+
+
+class GameSimulation:
+    # One game of Arkanoid: bricks, balls, power-ups, lasers and score.
+    # step() advances it by one frame and returns the events of that frame
+    # as (name, data) tuples, so a caller can play sounds and spawn particles:
+    #   ('bounce', (x, y))     a ball hit a wall or the paddle at (x, y)
+    #   ('brick_hit', brick)   ball or explosion broke a brick
+    #   ('laser_hit', brick)   laser broke a brick
+    #   ('brick_damaged', brick) a hit took hit points off a multi-hit brick
+    #   ('explosion', brick)   a bomb brick blew up
+    #   ('laser', None)        lasers fired
+    #   ('power_up', type)     paddle caught a power-up
+    #   ('ball_lost', None)    last ball fell, one attempt used
+    #   ('level_cleared', n)   level n cleared, next level waits for start_level()
+    #   ('game_over', None)    no attempts left
+    #   ('won', None)          last level cleared
+    def __init__(self, difficulty='Normal', level=0, seed=None,
+                 screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT, level_pack=None):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        # Levels come from a LevelPack if given, else from LEVELS
+        self.level_pack = level_pack
+        self.level_count = len(level_pack) if level_pack is not None else len(LEVELS)
+        # (level, future) of a level being decoded by prefetch_level()
+        self.prefetched = None
+        self.prefetcher = None
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.difficulty = difficulty
+        self.paddle = Paddle(screen_width, screen_height)
+        # Set to an enabled FrameProfiler to time the phases of step()
+        self.profiler = NO_PROFILER
+        self.reset(level)
+
+    def reset(self, level=0, seed=None):
+        # Start a new game on the current difficulty. Passing a seed makes
+        # the game replayable: the same seed and inputs give the same game.
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.current_level = level
+        self.points = 0
+        self.Attempts = DIFFICULTIES[self.difficulty]['Attempts']
+        self.powerup_rate = DIFFICULTIES[self.difficulty]['powerup_rate']
+        self.balls = BallSystem(self.screen_width, self.screen_height, self.rng)
+        self.balls.base_speed = DIFFICULTIES[self.difficulty]['speed']
+        self.power_ups = EntityList(PowerUp)
+        self.lasers = EntityList(Laser)
+        self.laser_cooldown = 0
+        self.frame = 0
+        self.start_level(level)
+
+    def set_difficulty(self, difficulty):
+        self.difficulty = difficulty
+        self.Attempts = DIFFICULTIES[difficulty]['Attempts']
+        self.powerup_rate = DIFFICULTIES[difficulty]['powerup_rate']
+        self.balls.base_speed = DIFFICULTIES[difficulty]['speed']
+        self.balls.reset_all()
+
+    def start_level(self, level):
+        self.current_level = level
+        if self.prefetched is not None and self.prefetched[0] == level:
+            self.bricks = self.prefetched[1].result()
+        else:
+            self.bricks = load_level(level, self.screen_width, self.level_pack)
+        self.prefetched = None
+        self.paddle.reset()
+        self.balls.clear()
+        self._new_ball()
+        self.power_ups.clear()
+        self.lasers.clear()
+        # Bomb bricks broken this tick, see _resolve_explosions
+        self.exploding = []
+        self.status = 'playing'
+
+    def prefetch_level(self, level):
+        # Decode a level on a background thread, e.g. while the level
+        # transition screen is up; start_level(level) picks it up
+        if not 0 <= level < self.level_count:
+            return
+        if self.prefetcher is None:
+            self.prefetcher = ThreadPoolExecutor(max_workers=1)
+        self.prefetched = (level, self.prefetcher.submit(load_level, level, self.screen_width, self.level_pack))
+
+    def _new_ball(self):
+        # Index of a new ball in the middle of the screen
+        return self.balls.spawn_new()
+
+    def fire_laser(self, events):
+        left_x = self.paddle.rect.left + 10
+        right_x = self.paddle.rect.right - 10
+        self.lasers.spawn(left_x, self.paddle.rect.top)
+        self.lasers.spawn(right_x, self.paddle.rect.top)
+        self.laser_cooldown = 10  # cooldown in frames
+        events.append(('laser', None))
+
+    def step(self, inputs=NO_INPUT):
+        events = []
+        if self.status != 'playing':
+            return events
+        self.frame += 1
+        paddle = self.paddle
+
+        # --- Update all game objects ---
+        paddle.update(inputs)
+
+        # Laser firing while Up Arrow is held
+        if paddle.has_laser and inputs.up and self.laser_cooldown <= 0:
+            self.fire_laser(events)
+        if self.laser_cooldown > 0:
+            self.laser_cooldown -= 1
+        self.profiler.lap('paddle')
+
+        # All balls are stepped at once; bricks take their hits as they are
+        # hit, so the next ball cannot hit a brick that already broke
+        balls = self.balls
+        ball_events = balls.update(paddle, inputs.space, self.bricks, lambda brick: self._ball_hit(brick, events))
+        if ball_events is not None:
+            for index in np.flatnonzero((ball_events == EVENT_WALL) | (ball_events == EVENT_PADDLE)).tolist():
+                events.append(('bounce', (balls.x.item(index), balls.y.item(index))))
+            lost = ball_events == EVENT_LOST
+            if lost.any():
+                balls.remove(lost)
+                if not balls:
+                    self._lose_attempt(events)
+                    if self.status != 'playing':
+                        return events
+
+        self.profiler.lap('balls')
+        self._update_power_ups(events)
+        self.profiler.lap('power_ups')
+        self._update_lasers(events)
+        if self.exploding:
+            self._resolve_explosions(events)
+        self.profiler.lap('lasers')
+
+        if not self.bricks.breakable:
+            events.append(('level_cleared', self.current_level))
+            self.current_level += 1
+            if self.current_level < self.level_count:
+                self.status = 'level_cleared'
+            else:
+                self.status = 'won'
+                events.append(('won', None))
+        return events
+
+    def _lose_attempt(self, events):
+        self.Attempts -= 1
+        events.append(('ball_lost', None))
+        if self.Attempts <= 0:
+            self.status = 'game_over'
+            events.append(('game_over', None))
+        else:
+            self._new_ball()
+            self.paddle.reset()
+
+    def _ball_hit(self, brick, events):
+        if self._hit_brick(brick, 1, events, 'brick_hit'):
+            self._maybe_drop_power_up(brick)
+
+    def _hit_brick(self, brick, damage, events, event):
+        # Take `damage` hit points off a brick, per its type. Returns True
+        # if it broke; a broken bomb waits in self.exploding for the end
+        # of the tick.
+        properties = brick.properties
+        if properties['indestructible']:
+            return False
+        if brick.hp > damage:
+            brick.set_hp(brick.hp - damage)
+            self.bricks.changed[brick] = None
+            events.append(('brick_damaged', brick))
+            return False
+        self.bricks.remove(brick)
+        self.points += properties['points']
+        events.append((event, brick))
+        if properties['explosion']:
+            self.exploding.append(brick)
+        return True
+
+    def _resolve_explosions(self, events):
+        # Every bomb broken this tick goes off here, in waves: the blasts of
+        # a wave are added up on an array over the level grid, each brick
+        # under them takes one hit per blast, and the bombs they break make
+        # the next wave. A chain across the whole level is a loop over
+        # waves, never a recursion through bricks.
+        bricks = self.bricks
+        wave = self.exploding
+        while wave:
+            self.exploding = []
+            blast = np.zeros(bricks.shape, dtype=np.int16)
+            for brick in wave:
+                events.append(('explosion', brick))
+                row, col = bricks.cell(brick.rect.left, brick.rect.top)
+                radius = brick.properties['explosion']
+                blast[max(row - radius, 0):row + radius + 1, max(col - radius, 0):col + radius + 1] += 1
+            blast *= bricks.occupancy
+            for row, col in np.argwhere(blast).tolist():
+                brick = bricks.brick_at(row, col)
+                if self._hit_brick(brick, int(blast[row, col]), events, 'brick_hit'):
+                    self._maybe_drop_power_up(brick)
+            wave = self.exploding
+        self.exploding = []
+
+    def _maybe_drop_power_up(self, brick):
+        # Bricks with a drop always give their power-up, the others only
+        # by chance
+        drop = brick.properties['drop']
+        if drop is None:
+            if self.rng.random() >= self.powerup_rate:
+                return
+            drop = 'any'
+        power_up_type = self.rng.choice(POWERUP_TYPES) if drop == 'any' else drop
+        self.power_ups.spawn(brick.rect.centerx, brick.rect.centery, power_up_type)
+
+    def _update_power_ups(self, events):
+        paddle = self.paddle
+        power_ups = self.power_ups
+        index = 0
+        while index < len(power_ups):
+            power_up = power_ups[index]
+            power_up.update()
+            if power_up.rect.top > self.screen_height:
+                power_ups.swap_remove(index)
+            elif paddle.rect.colliderect(power_up.rect):
+                events.append(('power_up', power_up.type))
+                if power_up.type in ['laser', 'glue', 'expand', 'speed']:
+                    paddle.activate_power_up(power_up.type)
+                elif power_up.type == 'slow':
+                    self.balls.slow()
+                elif power_up.type == 'multiball':
+                    # Spawn an extra ball at current position
+                    balls = self.balls
+                    new = self._new_ball()
+                    # Position and give opposite horizontal speed
+                    balls.x[new] = balls.x[0]
+                    balls.y[new] = balls.y[0]
+                    balls.speed_x[new] = -balls.speed_x[0]
+                    balls.speed_y[new] = balls.speed_y[0]
+                power_ups.swap_remove(index)
+            else:
+                index += 1
+
+    def _update_lasers(self, events):
+        lasers = self.lasers
+        index = 0
+        while index < len(lasers):
+            laser = lasers[index]
+            laser.update()
+            if laser.rect.bottom < 0:
+                lasers.swap_remove(index)
+                continue
+            brick = self.bricks.first_hit(laser.rect)
+            if brick is not None:
+                lasers.swap_remove(index)
+                if self._hit_brick(brick, 1, events, 'laser_hit') and brick.properties['drop'] is not None:
+                    self._maybe_drop_power_up(brick)
+                continue
+            index += 1
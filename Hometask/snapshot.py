@@ -0,0 +1,303 @@
+import random
+import struct
+import zlib
+from collections import deque
+
+import numpy as np
+
+from background import write_file
+from simulation import load_level, DIFFICULTIES, POWERUP_TYPES
+from replay import DIFFICULTY_NAMES, STATUSES
+
+# Snapshot layout (little endian), everything needed to carry on a game
+# exactly where it was, including the random generator:
+#   state     seed, frame, points, attempts, level, difficulty, status,
+#             laser cooldown
+#   paddle    x, width, speed, laser and glue flags, power-up timers
+#   rng       the Mersenne Twister state of random.Random
+#   bricks    length + bitset over the level's bricks (BrickGrid.live_mask)
+#   hp        length + hit points left of every brick, in level order
+#   balls     count + the BallSystem arrays, one after the other
+#   power-ups count + (x, y, type) each
+#   lasers    count + (x, y) each
+# The fixed-size parts come first, so two snapshots of the same level line
+# up byte for byte, which is what the delta encoding of SnapshotRing uses.
+MAGIC = b'ARKS'
+VERSION = 2
+FILE_HEADER = struct.Struct('<4sB')
+STATE = struct.Struct('<I?IIiHBBH')
+PADDLE = struct.Struct('<hHH??4H')
+RNG = struct.Struct('<B625I?d')
+COUNT = struct.Struct('<H')
+POWER_UP = struct.Struct('<hhB')
+LASER = struct.Struct('<hh')
+DELTA_LENGTH = struct.Struct('<I')
+TIMERS = ['laser', 'glue', 'expand', 'speed']
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def encode_state(sim):
+    paddle = sim.paddle
+    balls = sim.balls
+    version, mt, gauss = sim.rng.getstate()
+    bricks = sim.bricks.live_mask()
+    hp = bytearray(sim.bricks.next_index)
+    for brick, index in sim.bricks.order.items():
+        hp[index] = brick.hp
+    parts = [
+        STATE.pack(sim.seed or 0, sim.seed is not None, sim.frame, sim.points, sim.Attempts, sim.current_level,
+                   DIFFICULTY_NAMES.index(sim.difficulty), STATUSES.index(sim.status), sim.laser_cooldown),
+        PADDLE.pack(paddle.rect.x, paddle.width, paddle.speed, paddle.has_laser, paddle.has_glue,
+                    *(paddle.power_up_timers[name] for name in TIMERS)),
+        RNG.pack(version, *mt, gauss is not None, gauss or 0.0),
+        COUNT.pack(len(bricks)),
+        bricks,
+        COUNT.pack(len(hp)),
+        bytes(hp),
+        COUNT.pack(len(balls)),
+    ]
+    parts.extend(array[:len(balls)].tobytes() for array in balls.arrays())
+    parts.append(COUNT.pack(len(sim.power_ups)))
+    parts.extend(POWER_UP.pack(power_up.rect.x, power_up.rect.y, POWERUP_TYPES.index(power_up.type))
+                 for power_up in sim.power_ups)
+    parts.append(COUNT.pack(len(sim.lasers)))
+    parts.extend(LASER.pack(laser.rect.x, laser.rect.y) for laser in sim.lasers)
+    return b''.join(parts)
+
+
+def _unpack(layout, data, pos):
+    # layout.unpack_from(data, pos) and the position after it
+    if pos + layout.size > len(data):
+        raise SnapshotError("save file is cut short")
+    return layout.unpack_from(data, pos), pos + layout.size
+
+
+def _take(data, pos, length):
+    if pos + length > len(data):
+        raise SnapshotError("save file is cut short")
+    return data[pos:pos + length], pos + length
+
+
+def restore_state(sim, data):
+    # Put sim back in the state encode_state() saw. Everything is read and
+    # checked before sim is touched: a damaged snapshot raises
+    # SnapshotError and leaves the game as it was.
+    try:
+        state = _read_state(sim, data)
+    except (struct.error, IndexError, ValueError, TypeError) as e:
+        raise SnapshotError("damaged save file") from e
+    _apply_state(sim, *state)
+
+
+def _read_state(sim, data):
+    (seed, has_seed, frame, points, attempts, level, difficulty, status,
+     laser_cooldown), pos = _unpack(STATE, data, 0)
+    status = STATUSES[status]
+    difficulty = DIFFICULTY_NAMES[difficulty]
+    paddle, pos = _unpack(PADDLE, data, pos)
+
+    (version, *mt, has_gauss, gauss), pos = _unpack(RNG, data, pos)
+    rng_state = (version, tuple(mt), gauss if has_gauss else None)
+    # setstate checks the state; try it on a spare generator
+    random.Random().setstate(rng_state)
+
+    # The level is rebuilt from its pattern and the broken bricks removed;
+    # bricks are numbered in level order, as in BrickGrid.live_mask()
+    (length,), pos = _unpack(COUNT, data, pos)
+    mask, pos = _take(data, pos, length)
+    (count,), pos = _unpack(COUNT, data, pos)
+    hp, pos = _take(data, pos, count)
+    bricks = load_level(level, sim.screen_width, sim.level_pack)
+    for index, brick in enumerate(list(bricks)):
+        if index >> 3 >= length or not mask[index >> 3] & (1 << (index & 7)):
+            bricks.remove(brick)
+        elif index < count and hp[index] != brick.hp:
+            brick.set_hp(hp[index])
+
+    (count,), pos = _unpack(COUNT, data, pos)
+    balls = []
+    for array in sim.balls.arrays():
+        values, pos = _take(data, pos, count * array.itemsize)
+        balls.append(np.frombuffer(values, dtype=array.dtype))
+
+    (count,), pos = _unpack(COUNT, data, pos)
+    power_ups = []
+    for _ in range(count):
+        (x, y, kind), pos = _unpack(POWER_UP, data, pos)
+        power_ups.append((x, y, POWERUP_TYPES[kind]))
+
+    (count,), pos = _unpack(COUNT, data, pos)
+    lasers = []
+    for _ in range(count):
+        laser, pos = _unpack(LASER, data, pos)
+        lasers.append(laser)
+
+    return ((seed if has_seed else None, frame, points, attempts, level, difficulty, status, laser_cooldown),
+            paddle, rng_state, bricks, balls, power_ups, lasers)
+
+
+def _apply_state(sim, state, paddle_state, rng_state, bricks, balls, power_ups, lasers):
+    (sim.seed, sim.frame, sim.points, sim.Attempts, sim.current_level, sim.difficulty, sim.status,
+     sim.laser_cooldown) = state
+    sim.powerup_rate = DIFFICULTIES[sim.difficulty]['powerup_rate']
+    sim.balls.base_speed = DIFFICULTIES[sim.difficulty]['speed']
+
+    paddle = sim.paddle
+    x, paddle.width, paddle.speed, paddle.has_laser, paddle.has_glue, *timers = paddle_state
+    paddle.rect.x = x
+    paddle.rect.width = paddle.width
+    paddle.power_up_timers.update(zip(TIMERS, timers))
+
+    sim.rng.setstate(rng_state)
+    sim.bricks = bricks
+    sim.prefetched = None
+    sim.exploding = []
+
+    count = len(balls[0])
+    sim.balls.set_count(count)
+    for array, values in zip(sim.balls.arrays(), balls):
+        array[:count] = values
+
+    sim.power_ups.clear()
+    for power_up in power_ups:
+        sim.power_ups.spawn(*power_up)
+    sim.lasers.clear()
+    for laser in lasers:
+        sim.lasers.spawn(*laser)
+
+
+def save_state(path, sim):
+    write_state(path, encode_state(sim))
+
+
+def write_state(path, data):
+    # The file half of save_state, for a state encoded earlier (the game
+    # encodes between two frames and writes on a background thread).
+    # write_file replaces the old save only once the new one is complete.
+    write_file(path, FILE_HEADER.pack(MAGIC, VERSION) + zlib.compress(data))
+
+
+def read_state(path):
+    # The encoded state in a save file
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise SnapshotError("not a save file")
+    magic, version = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a save file")
+    if version != VERSION:
+        raise SnapshotError(f"unsupported save file version {version}")
+    try:
+        return zlib.decompress(data[FILE_HEADER.size:])
+    except zlib.error as e:
+        raise SnapshotError("damaged save file") from e
+
+
+def load_state(path, sim):
+    restore_state(sim, read_state(path))
+
+
+def _xor(data, base):
+    # data XOR base, the shorter one padded with zeros
+    out = np.zeros(max(len(data), len(base)), dtype=np.uint8)
+    out[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+    out[:len(base)] ^= np.frombuffer(base, dtype=np.uint8)
+    return out.tobytes()
+
+
+def encode_delta(data, base):
+    # An encoded state as a difference from another one (its base): the
+    # XOR of the two is nearly all zeros, so it compresses to little
+    return DELTA_LENGTH.pack(len(data)) + zlib.compress(_xor(data, base), 1)
+
+
+def decode_delta(delta, base):
+    (length,) = DELTA_LENGTH.unpack_from(delta, 0)
+    return _xor(zlib.decompress(delta[DELTA_LENGTH.size:]), base)[:length]
+
+
+class _Group:
+    # A keyframe and the snapshots encoded against it
+    __slots__ = ('level', 'key', 'frames', 'deltas')
+
+    def __init__(self, level, key):
+        self.level = level
+        # zlib-compressed keyframe; deltas[0] is None (the keyframe itself)
+        self.key = zlib.compress(key, 1)
+        self.frames = []
+        self.deltas = []
+
+
+class SnapshotRing:
+    # Rewind buffer: a snapshot every `interval` ticks, for the last
+    # `groups` * `group_size` snapshots (60 s of play with the defaults).
+    #
+    # The first snapshot of a group (the keyframe) is stored whole. The
+    # others are stored as their XOR with the keyframe: between two
+    # snapshots only a few balls, timers and counters move, and the bricks
+    # and the random generator rarely change, so the XOR is nearly all
+    # zeros and compresses to a few dozen bytes. Any snapshot decodes from
+    # its keyframe and one delta. A new level starts a new group, and when
+    # the ring is full the oldest group is dropped whole, so memory use is
+    # bounded and no delta ever outlives its keyframe.
+    def __init__(self, interval=30, group_size=20, groups=6):
+        self.interval = interval
+        self.group_size = group_size
+        self.groups = deque(maxlen=groups)
+        # Uncompressed keyframe of the newest group
+        self.key = None
+
+    def __len__(self):
+        return sum(len(group.frames) for group in self.groups)
+
+    def nbytes(self):
+        return sum(len(group.key) + sum(len(delta) for delta in group.deltas if delta is not None)
+                   for group in self.groups)
+
+    def clear(self):
+        self.groups.clear()
+        self.key = None
+
+    def record(self, sim):
+        # Called after every tick; keeps every interval-th playing tick
+        if sim.frame % self.interval or sim.status != 'playing':
+            return
+        data = encode_state(sim)
+        group = self.groups[-1] if self.groups else None
+        if group is None or len(group.frames) >= self.group_size or group.level != sim.current_level:
+            self.groups.append(_Group(sim.current_level, data))
+            self.key = data
+            self.groups[-1].frames.append(sim.frame)
+            self.groups[-1].deltas.append(None)
+            return
+        group.frames.append(sim.frame)
+        group.deltas.append(encode_delta(data, self.key))
+
+    def _decode(self, group, index, key):
+        delta = group.deltas[index]
+        if delta is None:
+            return key
+        return decode_delta(delta, key)
+
+    def rewind(self, sim, ticks):
+        # Restore the newest snapshot at least `ticks` before sim's current
+        # frame (or the oldest one kept) and forget the ones after it.
+        # Returns the frame restored, or None if there is nothing to go to.
+        if not self.groups:
+            return None
+        target = sim.frame - ticks
+        while len(self.groups) > 1 and self.groups[-1].frames[0] > target:
+            self.groups.pop()
+        group = self.groups[-1]
+        index = len(group.frames) - 1
+        while index > 0 and group.frames[index] > target:
+            index -= 1
+        del group.frames[index + 1:]
+        del group.deltas[index + 1:]
+        self.key = zlib.decompress(group.key)
+        restore_state(sim, self._decode(group, index, self.key))
+        return group.frames[index]
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+# Game telemetry: events (a game started, a level was cleared, a second of
+# frame stats...) as JSON objects, one per line, sent in batches over UDP
+# to a collector on this machine. Sending never blocks the game: events
+# wait in a bounded queue (the oldest are dropped when it is full) and a
+# background task turns them into datagrams once a second, in the idle
+# time between frames. Nothing is lost to the game if no collector runs.
+#
+#   python telemetry.py --out telemetry.jsonl     # the collector
+#   python main.py --telemetry 127.0.0.1:5406
+PORT = 5406
+INTERVAL = 1.0
+MAX_QUEUE = 1000
+# Bytes of JSON lines per datagram, well under the UDP limit
+MAX_DATAGRAM = 8192
+
+
+def parse_address(text):
+    # "host:port", "host" or ":port"
+    host, _, port = text.rpartition(':') if ':' in text else (text, '', '')
+    return host or '127.0.0.1', int(port) if port else PORT
+
+
+class Telemetry(asyncio.DatagramProtocol):
+    def __init__(self, background, address):
+        self.background = background
+        self.address = address
+        self.queue = deque(maxlen=MAX_QUEUE)
+        self.transport = None
+        self.task = None
+        self.added = 0
+        self.sent = 0
+        self.errors = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, remote_addr=self.address)
+        self.task = asyncio.create_task(self._run())
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        # Usually no collector listening; the events are dropped
+        self.errors += 1
+
+    def add(self, name, fields):
+        fields['event'] = name
+        fields['time'] = round(time.time(), 3)
+        self.queue.append(fields)
+        self.added += 1
+
+    def dropped(self):
+        return self.added - self.sent - len(self.queue)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(INTERVAL)
+            await self.flush()
+
+    async def flush(self):
+        # One datagram at a time, each one a step between two frames
+        while self.queue:
+            await self.background.pause()
+            lines = []
+            size = 0
+            while self.queue and size < MAX_DATAGRAM:
+                line = json.dumps(self.queue.popleft(), separators=(',', ':')).encode()
+                lines.append(line)
+                size += len(line) + 1
+            self.transport.sendto(b'\n'.join(lines))
+            self.sent += len(lines)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+        self.transport.close()
+
+
+class Collector(asyncio.DatagramProtocol):
+    # Writes every event received to `out`, one JSON line each
+    def __init__(self, out):
+        self.out = out
+
+    def datagram_received(self, data, addr):
+        self.out.write(data.decode(errors='replace') + '\n')
+        self.out.flush()
+
+
+async def collect(port, out):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: Collector(out), local_addr=('127.0.0.1', port))
+    print(f"collecting telemetry on port {port}", file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect the telemetry of main.py --telemetry")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--out', metavar='FILE', help="append the events to FILE (JSON lines) instead of printing them")
+    args = parser.parse_args()
+
+    out = open(args.out, 'a') if args.out else sys.stdout
+    try:
+        asyncio.run(collect(args.port, out))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.out:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
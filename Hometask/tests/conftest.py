@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The game's modules import each other by name from Hometask/, and the
+# tests run without a window or a sound card
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
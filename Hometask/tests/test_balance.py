@@ -0,0 +1,54 @@
+import pytest
+
+from balance import landing_x, paddle_ai, play_level, trace_ball
+from simulation import GameSimulation
+
+
+def test_landing_x_goes_straight_down():
+    assert landing_x(400, 100, 0, 6, 560, 10, 800) == (400, pytest.approx(460 / 6))
+
+
+@pytest.mark.parametrize('x, speed_x, expected', [
+    (700, 6, 800 - 10 - (700 + 6 * 50 - 790)),   # off the right wall
+    (100, -6, 220),                              # off the left wall
+    (400, 30, 340),                              # off both walls
+])
+def test_landing_x_bounces_off_the_walls(x, speed_x, expected):
+    landing, ticks = landing_x(x, 260, speed_x, 6, 560, 10, 800)
+    assert ticks == 50
+    assert landing == pytest.approx(expected)
+
+
+def test_trace_follows_the_ball_off_a_brick():
+    # The first ball of this game goes up, bounces off a brick and off the
+    # right wall; the prediction made before the launch must match where
+    # it really comes down
+    sim = GameSimulation('Hard', seed=1)
+    balls = sim.balls
+    paddle_y = sim.paddle.rect.top - balls.radius
+    predicted, ticks = trace_ball(sim.bricks, balls.x.item(0), balls.y.item(0), balls.speed_x.item(0),
+                                  balls.speed_y.item(0), paddle_y, balls.radius, sim.screen_width)
+    # The paddle stays in the middle, out of the ball's way
+    while balls.speed_y.item(0) < 0 or balls.y.item(0) + balls.speed_y.item(0) < paddle_y:
+        sim.step()
+    remaining = (paddle_y - balls.y.item(0)) / balls.speed_y.item(0)
+    assert balls.x.item(0) + balls.speed_x.item(0) * remaining == pytest.approx(predicted, abs=1)
+    assert sim.frame + remaining == pytest.approx(ticks, abs=1)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_bot_clears_a_normal_level(seed):
+    cleared, ticks, points, pickups = play_level('Normal', 0, seed)
+    assert cleared
+
+
+def test_bot_reaches_the_first_return_on_hard():
+    # Hard used to be lost on the first ball with a chasing paddle
+    sim = GameSimulation('Hard', seed=1)
+    radius = sim.balls.radius
+    paddle_hits = 0
+    while sim.status == 'playing':
+        for name, data in sim.step(paddle_ai(sim)):
+            x, y = data if name == 'bounce' else (0, 0)
+            paddle_hits += radius < x < sim.screen_width - radius and y > sim.paddle.rect.top - 3 * radius
+    assert paddle_hits >= 1
@@ -0,0 +1,115 @@
+import random
+
+import numpy as np
+import pygame
+
+from balance import paddle_ai
+from brick_grid import BrickGrid
+from game_objects import Ball, Brick, Paddle
+from physics import sweep_circle_rect
+from simulation import GameSimulation, LEVELS, load_level
+
+
+def recount(bricks):
+    # Breakable bricks per row, counted from scratch
+    counts = np.zeros(bricks.shape[0], dtype=np.int32)
+    for brick in bricks:
+        if not brick.properties['indestructible']:
+            counts[bricks.cell_of(brick)[0]] += 1
+    return counts
+
+
+def test_row_counts_of_every_level():
+    for idx in range(len(LEVELS)):
+        bricks = load_level(idx)
+        np.testing.assert_array_equal(bricks.row_counts, recount(bricks))
+        assert bricks.breakable == bricks.row_counts.sum()
+
+
+def test_row_counts_follow_the_game():
+    # Balls, lasers and bomb blasts break bricks; steel bricks never count
+    sim = GameSimulation('Easy', level=4, seed=2)
+    for _ in range(6000):
+        if sim.status != 'playing':
+            break
+        sim.step(paddle_ai(sim))
+        bricks = sim.bricks
+        if sim.frame % 50 == 0:
+            np.testing.assert_array_equal(bricks.row_counts, recount(bricks))
+            assert bricks.breakable == bricks.row_counts.sum()
+    assert len(sim.bricks) < len(load_level(4))
+    np.testing.assert_array_equal(sim.bricks.row_counts, recount(sim.bricks))
+
+
+def test_removing_a_brick_updates_its_row():
+    bricks = load_level(0)
+    brick = next(iter(bricks))
+    row, col = bricks.cell_of(brick)
+    before = bricks.row_counts.copy()
+    bricks.remove(brick)
+    before[row] -= 1
+    np.testing.assert_array_equal(bricks.row_counts, before)
+    assert bricks.occupancy[row, col] == 0
+    assert bricks.brick_at(row, col) is None
+
+
+def random_rect(rng, width=800, height=400):
+    return pygame.Rect(rng.randrange(-30, width), rng.randrange(-30, height), rng.randrange(1, 60),
+                       rng.randrange(1, 60))
+
+
+def levels_with_holes(rng):
+    # Every built-in level, whole and with a third of its bricks broken,
+    # as a level grid and as a plain (dict) grid over the same bricks
+    for idx in range(len(LEVELS)):
+        for broken in (0, 3):
+            level = load_level(idx)
+            plain = BrickGrid(40, 30)
+            for brick in level:
+                plain.add(brick)
+            for brick in list(level):
+                if broken and rng.randrange(broken) == 0:
+                    level.remove(brick)
+                    plain.remove(brick)
+            yield level
+            yield plain
+
+
+def test_queries_match_a_full_scan():
+    # What the grid replaces: every brick, in level order, tested against
+    # the rect
+    rng = random.Random(11)
+    for bricks in levels_with_holes(rng):
+        everything = list(bricks)
+        for _ in range(300):
+            rect = random_rect(rng)
+            scan = [brick for brick in everything if rect.colliderect(brick.rect)]
+            found = [brick for brick in bricks.candidates(rect) if rect.colliderect(brick.rect)]
+            assert found == scan
+            assert bricks.first_hit(rect) == (scan[0] if scan else None)
+
+
+def test_swept_ball_finds_the_same_brick_as_a_full_scan():
+    # Ball._first_contact against the grid and against every brick
+    rng = random.Random(12)
+    paddle = Paddle(800, 600)
+    for bricks in levels_with_holes(rng):
+        everything = list(bricks)
+        for _ in range(200):
+            ball = Ball(800, 600, rng)
+            ball.move_to(rng.uniform(20, 780), rng.uniform(20, 300))
+            ball.speed_x = rng.uniform(-25, 25)
+            ball.speed_y = rng.uniform(-25, 25)
+            contact = ball._first_contact(ball.speed_x, ball.speed_y, paddle, bricks, [])
+            best = None
+            for brick in everything:
+                hit = sweep_circle_rect(ball.x, ball.y, ball.speed_x, ball.speed_y, ball.radius, brick.rect)
+                if hit is not None and (best is None or hit[0] < best[0]):
+                    best = hit + (brick,)
+            if best is None:
+                assert contact is None or not isinstance(contact[3], Brick)
+            elif contact is not None and isinstance(contact[3], Brick):
+                assert contact == best
+            else:
+                # A wall came first
+                assert contact[0] <= best[0]
@@ -0,0 +1,94 @@
+from effects import EffectsBudget, HIGH, LOW, NORMAL
+from particles import ParticlePool
+
+
+def spark(budget, amount, priority):
+    # An emit whose particles all outlive the test
+    return budget.emit(0, 0, (255, 255, 255), amount, 4, 4, 1, 2, 0, priority)
+
+
+def priorities(pool):
+    return sorted(pool.priority[:len(pool)].tolist())
+
+
+def test_pool_never_goes_over_the_cap():
+    pool = ParticlePool(capacity=1000, seed=1)
+    budget = EffectsBudget(pool, max_particles=100)
+    for _ in range(20):
+        spark(budget, 15, NORMAL)
+    assert len(pool) == 100
+    assert budget.emitted == 100
+    assert budget.over_cap == 200
+    assert budget.dropped == 200
+
+
+def test_higher_priority_culls_lower_priority_first():
+    pool = ParticlePool(capacity=1000, seed=2)
+    budget = EffectsBudget(pool, max_particles=100)
+    spark(budget, 50, LOW)
+    spark(budget, 50, NORMAL)
+    # A firework needs 30: the bounce sparks make room, the brick hits stay
+    assert spark(budget, 30, HIGH) == 30
+    assert priorities(pool) == [LOW] * 20 + [NORMAL] * 50 + [HIGH] * 30
+    assert budget.culled == 30
+    # More than the low sparks left: brick hits go next
+    assert spark(budget, 40, HIGH) == 40
+    assert priorities(pool) == [NORMAL] * 30 + [HIGH] * 70
+    assert budget.culled == 70
+
+
+def test_low_priority_never_pushes_out_higher_priority():
+    pool = ParticlePool(capacity=1000, seed=3)
+    budget = EffectsBudget(pool, max_particles=100)
+    spark(budget, 100, HIGH)
+    assert spark(budget, 20, LOW) == 0
+    assert spark(budget, 20, HIGH) == 0
+    assert priorities(pool) == [HIGH] * 100
+    assert budget.culled == 0
+    assert budget.over_cap == 40
+
+
+def test_scale_shrinks_emits_and_the_cap():
+    pool = ParticlePool(capacity=1000, seed=4)
+    budget = EffectsBudget(pool, max_particles=100)
+    budget.set_scale(0.5)
+    assert budget.cap() == 50
+    assert spark(budget, 15, NORMAL) == 8
+    assert budget.scaled_down == 7
+    for _ in range(10):
+        spark(budget, 15, NORMAL)
+    assert len(pool) == 50
+    # Every emit keeps at least one particle, and the scale is clamped
+    budget.set_scale(-1)
+    assert budget.scale == 0
+    assert budget.cap() == 1
+    budget.set_scale(3)
+    assert budget.scale == 1
+
+
+def test_fireworks_are_capped_with_the_scale():
+    budget = EffectsBudget(ParticlePool(capacity=10), max_fireworks=6)
+    assert budget.allow_firework(5)
+    assert not budget.allow_firework(6)
+    budget.set_scale(0.5)
+    assert budget.allow_firework(2)
+    assert not budget.allow_firework(3)
+    budget.set_scale(0)
+    assert budget.allow_firework(0)
+    assert not budget.allow_firework(1)
+    assert budget.report()['fireworks_skipped'] == 3
+
+
+def test_report_adds_up():
+    pool = ParticlePool(capacity=1000, seed=5)
+    budget = EffectsBudget(pool, max_particles=60)
+    budget.set_scale(0.8)
+    for priority in (LOW, NORMAL, HIGH) * 5:
+        spark(budget, 10, priority)
+    report = budget.report()
+    assert report['requested'] == 150
+    assert report['dropped'] == report['scaled_down'] + report['over_cap'] + report['culled']
+    # What was asked for was either emitted or dropped before emitting;
+    # culled particles were emitted first
+    assert report['requested'] == report['emitted'] + report['scaled_down'] + report['over_cap']
+    assert len(pool) == report['emitted'] - report['culled'] == 48
@@ -0,0 +1,37 @@
+from entity_store import EntityList
+from game_objects import Laser, PowerUp
+
+
+def test_swap_remove_moves_the_last_entity_in():
+    lasers = EntityList(Laser)
+    first, second, third = (lasers.spawn(x, 100) for x in (10, 20, 30))
+    assert lasers.swap_remove(0) is first
+    assert list(lasers) == [third, second]
+    assert lasers.free == [first]
+
+
+def test_spawn_reuses_a_removed_entity_and_its_rect():
+    power_ups = EntityList(PowerUp)
+    power_up = power_ups.spawn(10, 20, 'laser')
+    power_up.speed_y = 6
+    rect = power_up.rect
+    power_ups.swap_remove(0)
+
+    again = power_ups.spawn(300, 40, 'glue')
+    assert again is power_up
+    assert again.rect is rect
+    assert (rect.x, rect.y, rect.width, rect.height) == (300, 40, PowerUp.WIDTH, PowerUp.HEIGHT)
+    assert (again.type, again.speed_y) == ('glue', 3)
+    assert again.color == PowerUp.PROPERTIES['glue']['color']
+    assert not power_ups.free
+
+
+def test_clear_keeps_the_entities_for_reuse():
+    lasers = EntityList(Laser)
+    lasers.spawn(1, 2)
+    lasers.spawn(3, 4)
+    lasers.clear()
+    assert not lasers
+    assert len(lasers.free) == 2
+    laser = lasers.spawn(50, 60)
+    assert (laser.rect.x, laser.rect.y, laser.speed_y) == (50, 60, -8)
@@ -0,0 +1,65 @@
+import numpy as np
+import pygame
+import pytest
+
+from game_objects import PowerUp
+from gym_env import ArkanoidEnv, VecEnv, ACTIONS
+from simulation import POWERUP_TYPES
+
+
+def test_render_draws_power_ups_without_pygame_init():
+    pygame.quit()
+    PowerUp.SPRITES.clear()
+    PowerUp.FONT = None
+    env = ArkanoidEnv(seed=0, render_mode='rgb_array')
+    env.reset(seed=1)
+    for index, kind in enumerate(POWERUP_TYPES):
+        env.sim.power_ups.spawn(100 + 60 * index, 300, kind)
+    frame = env.render()
+    assert frame.shape == (env.sim.screen_height, env.sim.screen_width, 3)
+    assert frame.dtype == np.uint8
+    env.close()
+
+
+def test_vec_env_keeps_the_final_observation():
+    vec = VecEnv(2, seed=0, max_steps=50)
+    vec.reset(seed=0)
+    actions = np.zeros(2, dtype=np.int64)
+    ended = None
+    for _ in range(60):
+        observations, rewards, terminated, truncated, infos = vec.step(actions)
+        if truncated.any() or terminated.any():
+            ended = observations, infos
+            break
+        assert all('final_observation' not in info for info in infos)
+    assert ended is not None
+    observations, infos = ended
+    info = infos[0]
+    final = info['final_observation']
+    assert set(final) == set(observations)
+    assert info['final_info']['frame'] >= 50
+    # The batch holds the first observation of the new game
+    env = vec.envs[0]
+    assert env.sim.frame == 0
+    np.testing.assert_array_equal(observations['paddle'][0], env.observe()['paddle'])
+    assert not np.array_equal(final['balls'], observations['balls'][0])
+
+
+def test_reset_is_reproducible():
+    env = ArkanoidEnv()
+    first = []
+    for seed in (3, 3):
+        env.reset(seed=seed)
+        for _ in range(100):
+            env.step(2)
+        first.append(env.observe()['balls'].copy())
+    np.testing.assert_array_equal(first[0], first[1])
+
+
+def test_reset_seeds_np_random():
+    pytest.importorskip('gymnasium')
+    env = ArkanoidEnv()
+    env.reset(seed=5)
+    a = env.np_random.integers(1 << 30)
+    env.reset(seed=5)
+    assert env.np_random.integers(1 << 30) == a
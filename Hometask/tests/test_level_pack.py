@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from level_pack import LevelPack, LevelPackError, pattern_cells, write_pack, default_pack, DEFAULT_PACK
+from replay import Replay, ReplayRecorder, ReplayError
+from simulation import GameSimulation, LEVELS, FrameInput, rules_digest
+
+
+def test_committed_pack_matches_the_builtin_levels():
+    # levels.arkl is generated from LEVELS (python level_pack.py levels.arkl);
+    # rebuild it when LEVELS changes
+    pack = LevelPack(DEFAULT_PACK)
+    assert len(pack) == len(LEVELS)
+    for idx, pattern in enumerate(LEVELS):
+        columns, rows, data = pattern_cells(pattern)
+        np.testing.assert_array_equal(pack.level(idx), np.frombuffer(data, dtype=np.uint8).reshape(rows, columns))
+    assert rules_digest(pack) == rules_digest()
+    pack.close()
+
+
+def test_pack_round_trip(tmp_path):
+    path = str(tmp_path / 'levels.arkl')
+    levels = [["XHX", " S "], ["BPB"]]
+    write_pack(path, (pattern_cells(pattern) for pattern in levels))
+    pack = LevelPack(path)
+    assert len(pack) == 2
+    assert pack.level(0).shape == (2, 3)
+    assert pack.level(1).shape == (1, 3)
+    with pytest.raises(IndexError):
+        pack.level(2)
+    assert rules_digest(pack) != rules_digest()
+    pack.close()
+
+
+def test_not_a_pack(tmp_path):
+    path = tmp_path / 'bad.arkl'
+    path.write_bytes(b'nope' * 4)
+    with pytest.raises(LevelPackError):
+        LevelPack(str(path))
+
+
+def test_replay_needs_the_pack_it_was_recorded_on(tmp_path):
+    path = str(tmp_path / 'custom.arkl')
+    write_pack(path, [pattern_cells(["XXXX", "XXXX"])])
+    pack = LevelPack(path)
+    sim = GameSimulation('Normal', seed=4, level_pack=pack)
+    recorder = ReplayRecorder(4, 'Normal')
+    inputs = FrameInput(right=True, space=True)
+    for _ in range(300):
+        sim.step(inputs)
+        recorder.record(inputs)
+    replay = Replay(recorder.encode(sim))
+    with pytest.raises(ReplayError):
+        replay.play()
+    assert replay.mismatches(replay.play(pack)) == []
+    pack.close()
+
+
+def test_default_pack_is_the_game_pack():
+    pack = default_pack()
+    assert pack is not None and pack.path == DEFAULT_PACK
+    pack.close()
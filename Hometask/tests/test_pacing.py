@@ -0,0 +1,131 @@
+import asyncio
+import types
+
+import pygame
+import pytest
+
+import pacing
+from pacing import FramePacer
+
+
+class FakeTime:
+    # Stands in for the clock, asyncio.sleep and pygame's Clock, so a frame
+    # takes exactly as long as the test says
+    def __init__(self):
+        self.now = 0.0
+        self.last_tick = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+
+    def tick(self):
+        elapsed = self.now - self.last_tick
+        self.last_tick = self.now
+        return elapsed * 1000
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(pacing, 'time', fake)
+    monkeypatch.setattr(pacing, 'asyncio', types.SimpleNamespace(sleep=fake.sleep))
+    return fake
+
+
+def run(pacer, fake, frames, logic_ms, render_ms):
+    # The main loop's frame: logic every frame, drawing when the pacer says
+    # so. Returns (frames drawn, frame times handed to the logic).
+    async def loop():
+        drawn = 0
+        frame_times = []
+        for _ in range(frames):
+            fake.now += logic_ms / 1000
+            pacer.logic_done()
+            if pacer.render_frame():
+                fake.now += render_ms / 1000
+                drawn += 1
+            frame_times.append(await pacer.tick())
+        return drawn, frame_times
+    return asyncio.run(loop())
+
+
+def test_light_load_keeps_everything(fake):
+    pacer = FramePacer(fake)
+    drawn, frame_times = run(pacer, fake, 300, 2, 4)
+    assert drawn == 300
+    assert pacer.effects == 1.0
+    assert pacer.render_interval == 1
+    # Frames are paced to the frame rate
+    assert frame_times[-1] == pytest.approx(1 / 60)
+
+
+def test_overload_sheds_effects_before_frames(fake):
+    pacer = FramePacer(fake)
+    history = []
+
+    async def loop():
+        for _ in range(400):
+            fake.now += 0.003
+            pacer.logic_done()
+            if pacer.render_frame():
+                fake.now += 0.025
+            await pacer.tick()
+            history.append((pacer.effects, pacer.render_interval))
+    asyncio.run(loop())
+
+    first_skip = next(index for index, (_, interval) in enumerate(history) if interval > 1)
+    # Effects went down step by step to their floor, and only then were
+    # frames skipped
+    effects = [effect for effect, _ in history[:first_skip + 1]]
+    assert effects == sorted(effects, reverse=True)
+    assert effects[0] == 1.0 and len(set(effects)) > 10
+    assert all(interval == 1 for _, interval in history[:first_skip])
+    assert history[first_skip][0] == FramePacer.MIN_EFFECTS
+    # 3 ms of logic and 25 ms of drawing fit 90% of a 16.7 ms frame when
+    # one frame in three is drawn
+    assert history[-1] == (FramePacer.MIN_EFFECTS, 3)
+
+
+def test_logic_runs_every_frame_while_drawing_is_skipped(fake):
+    pacer = FramePacer(fake)
+    run(pacer, fake, 400, 3, 25)
+    assert pacer.render_interval == 3
+    start = fake.now
+    drawn, frame_times = run(pacer, fake, 300, 3, 25)
+    assert drawn == 100
+    assert len(frame_times) == 300
+    # Every second of the run reaches the logic as frame time, so the
+    # fixed timestep keeps up
+    assert sum(frame_times) == pytest.approx(fake.now - start)
+
+
+def test_work_comes_back_when_the_load_drops(fake):
+    pacer = FramePacer(fake)
+    run(pacer, fake, 400, 3, 25)
+    assert pacer.effects == FramePacer.MIN_EFFECTS
+    run(pacer, fake, 600, 2, 4)
+    assert pacer.render_interval == 1
+    assert pacer.effects == 1.0
+
+
+def test_idle_wait_is_not_game_time(fake):
+    pygame.display.init()
+    try:
+        pacer = FramePacer(fake)
+        pygame.event.clear()
+        pygame.event.post(pygame.event.Event(pygame.USEREVENT, code=7))
+
+        async def idle_frame():
+            events = await pacer.events(idle=True)
+            # A long wait on a static screen
+            fake.now += 5.0
+            return events, await pacer.tick()
+        events, frame_time = asyncio.run(idle_frame())
+        assert [event.type for event in events] == [pygame.USEREVENT]
+        assert pacer.idle_waits == 1
+        assert frame_time == pacer.budget
+    finally:
+        pygame.display.quit()
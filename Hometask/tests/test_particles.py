@@ -0,0 +1,91 @@
+import numpy as np
+import pygame
+import pytest
+
+from particles import ParticlePool
+
+
+def test_emit_stops_at_capacity():
+    pool = ParticlePool(capacity=100, seed=1)
+    assert pool.emit(10, 10, (255, 0, 0), 60, 2, 4, 1, 3, 0) == 60
+    assert pool.emit(10, 10, (255, 0, 0), 60, 2, 4, 1, 3, 0) == 40
+    assert len(pool) == 100
+    assert pool.emit(10, 10, (255, 0, 0), 5, 2, 4, 1, 3, 0) == 0
+    assert len(pool) == 100
+
+
+def test_emit_follows_the_old_particle_distribution():
+    pool = ParticlePool(capacity=1000, seed=2)
+    pool.emit(100, 200, (1, 2, 3), 1000, 2, 4, 1, 3, 0.5)
+    speed = np.hypot(pool.vx, pool.vy)
+    assert ((speed >= 1 - 1e-5) & (speed <= 3 + 1e-5)).all()
+    assert set(np.unique(pool.size).tolist()) == {2, 3, 4}
+    assert (pool.x == 100).all() and (pool.y == 200).all()
+    assert (pool.color == (1, 2, 3)).all()
+
+
+def test_update_moves_and_applies_gravity():
+    pool = ParticlePool(capacity=10, seed=3)
+    pool.emit(50, 50, (255, 255, 255), 3, 3, 3, 2, 2, 0.5)
+    x, y, vx, vy = (array[:3].copy() for array in (pool.x, pool.y, pool.vx, pool.vy))
+    pool.update()
+    np.testing.assert_allclose(pool.x[:3], x + vx)
+    np.testing.assert_allclose(pool.y[:3], y + vy)
+    np.testing.assert_allclose(pool.vy[:3], vy + 0.5)
+    np.testing.assert_allclose(pool.size[:3], 3 - ParticlePool.SHRINK)
+
+
+def test_dead_particles_are_removed_and_the_rest_kept_in_order():
+    pool = ParticlePool(capacity=10, seed=4)
+    # Sizes 1, 3, 1, 3: the size 1 ones die after 10 updates
+    for x, size in enumerate((1, 3, 1, 3)):
+        pool.emit(x, 0, (255, 255, 255), 1, size, size, 0, 0, 0)
+    for _ in range(9):
+        pool.update()
+    assert len(pool) == 4
+    pool.update()
+    assert len(pool) == 2
+    assert pool.x[:2].tolist() == [1, 3]
+    for _ in range(25):
+        pool.update()
+    assert len(pool) == 0
+
+
+def test_cull_takes_low_priority_and_small_particles_first():
+    pool = ParticlePool(capacity=10, seed=5)
+    pool.emit(0, 0, (255, 0, 0), 1, 4, 4, 0, 0, 0, priority=0)
+    pool.emit(1, 0, (255, 0, 0), 1, 2, 2, 0, 0, 0, priority=0)
+    pool.emit(2, 0, (255, 0, 0), 1, 2, 2, 0, 0, 0, priority=1)
+    pool.emit(3, 0, (255, 0, 0), 1, 4, 4, 0, 0, 0, priority=2)
+    assert pool.cull(1, below=2) == 1
+    assert pool.x[:len(pool)].tolist() == [0, 2, 3]
+    assert pool.cull(5, below=2) == 2
+    assert pool.x[:len(pool)].tolist() == [3]
+    # Nothing of the priority asked for or above is ever culled
+    assert pool.cull(5, below=2) == 0
+    assert len(pool) == 1
+
+
+def test_draw_covers_every_particle():
+    pygame.display.init()
+    try:
+        screen = pygame.Surface((200, 200))
+        pool = ParticlePool(capacity=10, seed=6)
+        assert pool.draw(screen) is None
+        pool.emit(50, 60, (255, 0, 0), 1, 4, 4, 0, 0, 0)
+        pool.emit(150, 120, (0, 255, 0), 1, 2, 2, 0, 0, 0)
+        rect = pool.draw(screen)
+        assert rect == pygame.Rect(46, 56, 106, 66)
+        assert screen.get_at((50, 60))[:3] == (255, 0, 0)
+        assert screen.get_at((150, 120))[:3] == (0, 255, 0)
+    finally:
+        pygame.display.quit()
+
+
+@pytest.mark.parametrize('count', [0, 4096])
+def test_clear(count):
+    pool = ParticlePool(seed=7)
+    pool.emit(0, 0, (255, 255, 255), count, 2, 4, 1, 3, 0)
+    pool.clear()
+    assert len(pool) == 0
+    assert pool.draw(pygame.Surface((10, 10))) is None
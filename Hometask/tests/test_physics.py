@@ -0,0 +1,133 @@
+import random
+
+import pygame
+import pytest
+
+from game_objects import Ball, Paddle
+from physics import FixedTimestep, STEP_TIME, sweep_circle_rect, sweep_circle_rect_many
+
+
+def test_fast_circle_does_not_tunnel_through_a_thin_rect():
+    # A 2 px brick, crossed in one move far longer than the brick and the
+    # circle together
+    rect = pygame.Rect(100, 200, 60, 2)
+    hit = sweep_circle_rect(130, 100, 0, 400, 5, rect)
+    assert hit == (pytest.approx((195 - 100) / 400), 0, -1)
+    hit = sweep_circle_rect(130, 300, 3, -400, 5, rect)
+    assert hit == (pytest.approx((300 - 207) / 400), 0, 1)
+
+
+def test_move_that_stops_short_or_passes_by_misses():
+    rect = pygame.Rect(100, 200, 60, 20)
+    assert sweep_circle_rect(130, 100, 0, 90, 5, rect) is None
+    assert sweep_circle_rect(50, 100, 0, 400, 5, rect) is None
+
+
+def test_corner_hit_has_a_diagonal_normal():
+    # Straight at the top-left corner along the diagonal: first contact is
+    # where the center is one radius from the corner
+    rect = pygame.Rect(100, 100, 50, 50)
+    hit = sweep_circle_rect(50, 50, 50, 50, 10, rect)
+    assert hit is not None
+    t, nx, ny = hit
+    distance = 50 * 2 ** 0.5 - 10
+    assert t == pytest.approx(distance / (50 * 2 ** 0.5))
+    assert nx == pytest.approx(-2 ** -0.5)
+    assert ny == pytest.approx(-2 ** -0.5)
+
+
+def test_circle_can_slip_past_a_rounded_corner():
+    # Inside the grown rect's square corner but clear of the rounded one
+    rect = pygame.Rect(100, 100, 50, 50)
+    assert sweep_circle_rect(80, 50, 5, 5, 10, rect) is None
+
+
+def test_overlapping_circle_moving_in_touches_at_once():
+    # Started 3 px deep through the top face, moving down
+    rect = pygame.Rect(100, 100, 50, 50)
+    assert sweep_circle_rect(120, 93, 2, 6, 10, rect) == (0.0, 0, -1)
+    # ... and through the left face, moving right
+    assert sweep_circle_rect(95, 120, 6, 0, 10, rect) == (0.0, -1, 0)
+
+
+def test_overlapping_circle_moving_out_is_let_go():
+    rect = pygame.Rect(100, 100, 50, 50)
+    assert sweep_circle_rect(120, 93, 2, -6, 10, rect) is None
+    assert sweep_circle_rect(95, 120, -6, 0, 10, rect) is None
+
+
+def test_overlapping_a_rounded_corner():
+    rect = pygame.Rect(100, 100, 50, 50)
+    t, nx, ny = sweep_circle_rect(94, 94, 3, 3, 10, rect)
+    assert t == 0
+    assert (nx, ny) == (pytest.approx(-2 ** -0.5), pytest.approx(-2 ** -0.5))
+    assert sweep_circle_rect(94, 94, -3, -3, 10, rect) is None
+
+
+def test_many_matches_the_scalar_sweep():
+    np = pytest.importorskip('numpy')
+    rng = random.Random(3)
+    rect = pygame.Rect(350, 570, 100, 10)
+    cases = [(rng.uniform(200, 600), rng.uniform(450, 560), rng.uniform(-30, 30), rng.uniform(1, 40))
+             for _ in range(200)]
+    x, y, dx, dy = (np.array(column, dtype=float) for column in zip(*cases))
+    t, nx, ny = sweep_circle_rect_many(x, y, dx, dy, 10, rect)
+    for i, case in enumerate(cases):
+        hit = sweep_circle_rect(*case, 10, rect)
+        if hit is None:
+            assert t[i] == np.inf
+        else:
+            assert (t[i], nx[i], ny[i]) == (pytest.approx(hit[0]), pytest.approx(hit[1]), pytest.approx(hit[2]))
+
+
+def make_ball(x, y, speed_x, speed_y):
+    ball = Ball(800, 600, random.Random(0))
+    ball.move_to(x, y)
+    ball.speed_x = speed_x
+    ball.speed_y = speed_y
+    return ball
+
+
+def test_fast_ball_bounces_off_the_paddle():
+    # 50 px per tick: the ball would be well below the paddle after this
+    # tick without the swept test
+    paddle = Paddle(800, 600)
+    ball = make_ball(paddle.rect.centerx, paddle.rect.top - 40, 5, 50)
+    status, collision, _ = ball.update(paddle)
+    assert (status, collision) == ('playing', 'paddle')
+    assert ball.speed_y == -50
+    assert ball.y <= paddle.rect.top - ball.radius
+
+
+def test_paddle_moving_into_the_ball_sends_it_up():
+    paddle = Paddle(800, 600)
+    ball = make_ball(paddle.rect.left - 5, paddle.rect.top + 2, 3, 3)
+    status, collision, _ = ball.update(paddle)
+    assert collision == 'paddle'
+    assert ball.speed_y == -3
+
+
+def test_rising_ball_passes_through_the_paddle():
+    paddle = Paddle(800, 600)
+    ball = make_ball(paddle.rect.centerx, paddle.rect.bottom + 20, 0, -30)
+    assert ball.update(paddle)[1] is None
+    assert ball.speed_y == -30
+
+
+def test_fixed_timestep_accumulates_partial_ticks():
+    timestep = FixedTimestep()
+    assert timestep.advance(STEP_TIME * 0.6) == 0
+    assert timestep.alpha == pytest.approx(0.6)
+    assert timestep.advance(STEP_TIME * 0.6) == 1
+    assert timestep.alpha == pytest.approx(0.2)
+    assert timestep.advance(STEP_TIME * 2.9) == 3
+    assert timestep.alpha == pytest.approx(0.1)
+
+
+def test_fixed_timestep_drops_a_long_stall():
+    timestep = FixedTimestep(max_steps=5)
+    assert timestep.advance(STEP_TIME * 40.5) == 5
+    assert timestep.alpha == 0
+    timestep.advance(STEP_TIME * 0.5)
+    timestep.reset()
+    assert timestep.alpha == 0
@@ -0,0 +1,68 @@
+import time
+
+from profiler import FrameProfiler, PHASES
+
+
+def play_frame(profiler, phase_time=0.001):
+    profiler.begin_frame()
+    time.sleep(phase_time)
+    profiler.lap('events')
+    profiler.lap('draw')
+    profiler.end_frame()
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = FrameProfiler()
+    play_frame(profiler)
+    assert profiler.frames == 0
+    assert not profiler.totals
+
+
+def test_enabled_mid_frame_waits_for_the_next_frame():
+    profiler = FrameProfiler()
+    play_frame(profiler)
+    # F3 pressed during the event handling of a frame, a while after the
+    # profiler was created: the rest of that frame is not measured
+    time.sleep(0.05)
+    profiler.begin_frame()
+    profiler.toggle()
+    profiler.lap('events')
+    profiler.count('balls', 3)
+    profiler.lap('draw')
+    profiler.end_frame()
+    assert profiler.frames == 0
+    assert not profiler.totals
+
+    play_frame(profiler)
+    assert profiler.frames == 1
+    (total,) = profiler.totals
+    assert total < 0.04 * 1e9
+    assert sum(profiler.samples[phase][0] for phase in PHASES) == total
+
+
+def test_reenabled_profiler_does_not_charge_the_time_it_was_off():
+    profiler = FrameProfiler(enabled=True)
+    play_frame(profiler)
+    profiler.toggle()
+    time.sleep(0.05)
+    profiler.toggle()
+    profiler.lap('events')
+    profiler.end_frame()
+    play_frame(profiler)
+    assert profiler.frames == 2
+    assert max(profiler.totals) < 0.04 * 1e9
+
+
+def test_csv_rows_cover_only_measured_frames(tmp_path):
+    path = tmp_path / 'frames.csv'
+    profiler = FrameProfiler(csv_path=str(path))
+    profiler.begin_frame()
+    profiler.toggle()
+    profiler.lap('events')
+    profiler.end_frame()
+    for _ in range(3):
+        play_frame(profiler)
+    profiler.close()
+    rows = path.read_text().splitlines()
+    assert len(rows) == 1 + 3
+    assert all(int(row.split(',')[1]) < 40000 for row in rows[1:])
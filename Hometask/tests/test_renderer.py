@@ -0,0 +1,49 @@
+import pygame
+import pytest
+
+from renderer import Renderer
+from simulation import load_level
+
+BG_COLOR = (0, 0, 0)
+
+
+@pytest.fixture
+def screen():
+    pygame.display.init()
+    yield pygame.display.set_mode((800, 600))
+    pygame.display.quit()
+
+
+@pytest.mark.parametrize('dirty', [False, True])
+def test_broken_bricks_are_dropped(screen, dirty):
+    renderer = Renderer(screen, BG_COLOR, dirty=dirty)
+    bricks = load_level(0)
+    renderer.draw_background(bricks)
+    renderer.present()
+
+    broken = list(bricks)[3:6]
+    for brick in broken:
+        bricks.remove(brick)
+    assert list(bricks.removed) == broken
+    renderer.draw_background(bricks)
+    assert not bricks.removed
+    assert list(renderer.brick_blits) == list(bricks)
+    for brick in broken:
+        assert screen.get_at(brick.rect.center)[:3] == BG_COLOR
+    if dirty:
+        assert renderer.current == [brick.rect for brick in broken]
+        for brick in broken:
+            assert renderer.layer.get_at(brick.rect.center)[:3] == BG_COLOR
+    standing = next(iter(bricks))
+    assert screen.get_at(standing.rect.center)[:3] != BG_COLOR
+
+
+def test_bricks_removed_before_the_level_is_drawn(screen):
+    # A level restored from a snapshot comes with its broken bricks already
+    # removed; they were never drawn
+    renderer = Renderer(screen, BG_COLOR)
+    bricks = load_level(1)
+    bricks.remove(next(iter(bricks)))
+    renderer.draw_background(bricks)
+    assert not bricks.removed
+    assert len(renderer.brick_blits) == len(bricks)
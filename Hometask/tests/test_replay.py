@@ -0,0 +1,140 @@
+import sys
+
+import pytest
+
+from balance import paddle_ai
+from replay import HEADER, Replay, ReplayError, ReplayRecorder, main
+from simulation import FrameInput, GameSimulation
+from snapshot import SnapshotRing
+
+
+def record_game(recorder, sim, ticks, snapshots=None, inputs=None):
+    # Plays like main.py: every tick recorded, cleared levels started right
+    # away (replay.play does the same)
+    for tick in range(ticks):
+        if sim.status == 'level_cleared':
+            sim.start_level(sim.current_level)
+        if sim.status != 'playing':
+            break
+        frame_input = inputs(tick) if inputs else paddle_ai(sim)
+        sim.step(frame_input)
+        recorder.record(frame_input)
+        if snapshots is not None:
+            snapshots.record(sim)
+
+
+def round_trip(tmp_path, recorder, sim):
+    path = str(tmp_path / 'game.arkr')
+    recorder.save(path, sim)
+    replay = Replay.load(path)
+    return replay, replay.play()
+
+
+def test_record_save_load_replay(tmp_path):
+    sim = GameSimulation('Easy', seed=5)
+    recorder = ReplayRecorder(5, 'Easy')
+    # Long enough to clear a few levels on the way
+    record_game(recorder, sim, 20000)
+    replay, replayed = round_trip(tmp_path, recorder, sim)
+    assert (replay.seed, replay.difficulty, replay.ticks) == (5, 'Easy', sim.frame)
+    assert replay.mismatches(replayed) == []
+    assert replayed.current_level == sim.current_level > 0
+
+
+def test_rewound_recording_replays(tmp_path):
+    # Play, rewind two seconds the way BACKSPACE does, then play on with
+    # other inputs: the replay must follow the game after the rewind
+    sim = GameSimulation('Normal', seed=2)
+    recorder = ReplayRecorder(2, 'Normal')
+    snapshots = SnapshotRing()
+    record_game(recorder, sim, 900, snapshots)
+    assert snapshots.rewind(sim, 2 * 60) is not None
+    recorder.truncate(sim.frame)
+    assert recorder.ticks == sim.frame < 900
+    record_game(recorder, sim, 90, snapshots, lambda tick: FrameInput(left=True))
+    record_game(recorder, sim, 600, snapshots)
+
+    replay, replayed = round_trip(tmp_path, recorder, sim)
+    assert replay.ticks == sim.frame
+    assert replay.mismatches(replayed) == []
+
+
+def test_truncate_splits_a_run():
+    recorder = ReplayRecorder(0, 'Easy')
+    for mask, count in ((1, 5), (2, 10)):
+        for _ in range(count):
+            recorder.record(FrameInput.from_mask(mask))
+    recorder.truncate(8)
+    assert recorder.runs == [[1, 5], [2, 3]]
+    recorder.truncate(5)
+    assert recorder.runs == [[1, 5]]
+    assert recorder.ticks == 5
+
+
+def test_changed_result_is_reported(tmp_path):
+    sim = GameSimulation('Easy', seed=1)
+    recorder = ReplayRecorder(1, 'Easy')
+    record_game(recorder, sim, 600)
+    sim.points += 10
+    replay, replayed = round_trip(tmp_path, recorder, sim)
+    assert replay.mismatches(replayed) == [f"points: recorded {sim.points}, replayed {sim.points - 10}"]
+
+
+def test_old_and_foreign_files_are_rejected():
+    sim = GameSimulation('Easy', seed=1)
+    recorder = ReplayRecorder(1, 'Easy')
+    data = bytearray(recorder.encode(sim))
+    data[4] = 2
+    with pytest.raises(ReplayError, match="older game rules"):
+        Replay(bytes(data))
+    with pytest.raises(ReplayError, match="not a replay"):
+        Replay(b'ARKS' + bytes(data[4:]))
+
+
+def test_changed_rules_are_rejected():
+    sim = GameSimulation('Easy', seed=1)
+    data = bytearray(ReplayRecorder(1, 'Easy').encode(sim))
+    fields = list(HEADER.unpack_from(data, 0))
+    fields[-1] = bytes(8)
+    HEADER.pack_into(data, 0, *fields)
+    replay = Replay(bytes(data))
+    assert replay.rules == bytes(8)
+    with pytest.raises(ReplayError, match="different levels"):
+        replay.play()
+
+
+def saved_replay(tmp_path):
+    sim = GameSimulation('Easy', seed=1)
+    recorder = ReplayRecorder(1, 'Easy')
+    record_game(recorder, sim, 600)
+    return recorder.encode(sim)
+
+
+def test_truncated_replay_is_rejected(tmp_path):
+    data = saved_replay(tmp_path)
+    for length in range(5, len(data)):
+        with pytest.raises(ReplayError):
+            Replay(data[:length])
+
+
+def test_replay_of_a_missing_level_is_rejected(tmp_path):
+    data = bytearray(saved_replay(tmp_path))
+    fields = list(HEADER.unpack_from(data, 0))
+    fields[4] = 99
+    HEADER.pack_into(data, 0, *fields)
+    with pytest.raises(ReplayError, match="level 100"):
+        Replay(bytes(data)).play()
+
+
+def test_command_line_reports_a_damaged_replay(tmp_path, monkeypatch, capsys):
+    good = tmp_path / 'good.arkr'
+    good.write_bytes(saved_replay(tmp_path))
+    bad = tmp_path / 'bad.arkr'
+    bad.write_bytes(good.read_bytes()[:-10])
+    monkeypatch.setattr(sys, 'argv', ['replay.py', str(bad), str(good)])
+    with pytest.raises(SystemExit) as exit:
+        main()
+    assert exit.value.code == 1
+    out = capsys.readouterr().out
+    assert f"{bad}: damaged replay file" in out
+    assert f"{good}: Easy, 600 ticks" in out
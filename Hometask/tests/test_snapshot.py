@@ -0,0 +1,174 @@
+import os
+
+import pytest
+
+from balance import paddle_ai
+from simulation import GameSimulation
+from snapshot import (FILE_HEADER, MAGIC, PADDLE, STATE, SnapshotError, SnapshotRing, decode_delta, encode_delta,
+                      encode_state, load_state, restore_state, save_state, write_state)
+
+
+def play(sim, ticks, snapshots=None, states=None):
+    # The balance bot at the controls; with `states`, the encoded state of
+    # every tick the ring keeps, by frame
+    for _ in range(ticks):
+        if sim.status == 'level_cleared':
+            sim.start_level(sim.current_level)
+        sim.step(paddle_ai(sim))
+        if snapshots is not None:
+            snapshots.record(sim)
+            if states is not None and sim.frame % snapshots.interval == 0 and sim.status == 'playing':
+                states[sim.frame] = encode_state(sim)
+
+
+def test_restored_game_plays_on_the_same():
+    sim = GameSimulation('Normal', seed=4)
+    play(sim, 700)
+    data = encode_state(sim)
+    play(sim, 500)
+
+    copy = GameSimulation('Easy', level=2, seed=99)
+    restore_state(copy, data)
+    assert encode_state(copy) == data
+    play(copy, 500)
+    assert encode_state(copy) == encode_state(sim)
+
+
+def test_save_file_round_trip(tmp_path):
+    path = str(tmp_path / 'save.arks')
+    sim = GameSimulation('Hard', seed=8)
+    play(sim, 400)
+    save_state(path, sim)
+    with open(path, 'rb') as f:
+        assert FILE_HEADER.unpack_from(f.read(), 0) == (MAGIC, 2)
+
+    copy = GameSimulation(seed=1)
+    load_state(path, copy)
+    assert encode_state(copy) == encode_state(sim)
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'AR', "not a save file"),
+    (b'ARKR\x02' + bytes(16), "not a save file"),
+    (b'ARKS\x01' + bytes(16), "unsupported save file version 1"),
+])
+def test_bad_save_files(tmp_path, data, message):
+    path = tmp_path / 'save.arks'
+    path.write_bytes(data)
+    with pytest.raises(SnapshotError, match=message):
+        load_state(str(path), GameSimulation(seed=1))
+
+
+def test_delta_round_trip():
+    base = bytes(range(200))
+    same_length = bytes(range(1, 201))
+    longer = base + b'more'
+    shorter = base[:150]
+    for data in (base, same_length, longer, shorter):
+        assert decode_delta(encode_delta(data, base), base) == data
+    # Identical states cost next to nothing
+    assert len(encode_delta(base, base)) < 20
+
+
+def test_ring_rewinds_to_recorded_states():
+    sim = GameSimulation('Normal', seed=3)
+    snapshots = SnapshotRing(interval=10, group_size=4, groups=3)
+    states = {}
+    play(sim, 95, snapshots, states)
+    assert len(snapshots) == 9
+    # Back 20 ticks from frame 95: the newest snapshot at or before 75
+    assert snapshots.rewind(sim, 20) == 70
+    assert encode_state(sim) == states[70]
+    # The snapshots after the one restored are gone
+    assert len(snapshots) == 7
+    assert snapshots.rewind(sim, 0) == 70
+
+
+def test_ring_after_wrapping():
+    # 3 groups of 4 snapshots, 10 ticks apart: after 320 ticks only the
+    # last 12 snapshots are kept, the oldest group dropped whole each time
+    sim = GameSimulation('Normal', seed=6)
+    snapshots = SnapshotRing(interval=10, group_size=4, groups=3)
+    states = {}
+    play(sim, 320, snapshots, states)
+    assert len(snapshots) == 12
+    kept = [frame for group in snapshots.groups for frame in group.frames]
+    assert kept == list(range(210, 330, 10))
+
+    # Every snapshot still decodes against its own keyframe
+    assert snapshots.rewind(sim, 45) == 270
+    assert encode_state(sim) == states[270]
+    # Going past the oldest kept lands on the oldest kept
+    assert snapshots.rewind(sim, 1000) == 210
+    assert encode_state(sim) == states[210]
+    assert len(snapshots) == 1
+
+    # Recording carries on from there, with new keyframes
+    play(sim, 190, snapshots)
+    assert len(snapshots) == 12
+    kept = [frame for group in snapshots.groups for frame in group.frames]
+    assert kept == list(range(290, 410, 10))
+
+
+def test_new_level_starts_a_new_group():
+    sim = GameSimulation('Easy', seed=5)
+    snapshots = SnapshotRing(interval=10, group_size=1000, groups=10)
+    play(sim, 1, snapshots)
+    while sim.current_level == 0:
+        play(sim, 1, snapshots)
+    play(sim, 30, snapshots)
+    assert [group.level for group in snapshots.groups] == [0, 1]
+
+
+def saved_game(tmp_path):
+    sim = GameSimulation('Normal', seed=4)
+    play(sim, 300)
+    path = tmp_path / 'save.arks'
+    save_state(str(path), sim)
+    return sim, path
+
+
+def assert_load_fails(path, message):
+    # The game loading into is left as it was
+    sim = GameSimulation('Easy', level=1, seed=7)
+    before = encode_state(sim)
+    with pytest.raises(SnapshotError, match=message):
+        load_state(str(path), sim)
+    assert encode_state(sim) == before
+
+
+def test_truncated_save_file(tmp_path):
+    _, path = saved_game(tmp_path)
+    path.write_bytes(path.read_bytes()[:-40])
+    assert_load_fails(path, "damaged save file")
+
+
+def test_short_state_in_a_save_file(tmp_path):
+    sim, path = saved_game(tmp_path)
+    data = encode_state(sim)
+    for length in (10, STATE.size + PADDLE.size + 100, len(data) - 3):
+        write_state(str(path), data[:length])
+        assert_load_fails(path, "cut short")
+
+
+def test_save_file_of_a_missing_level(tmp_path):
+    sim, path = saved_game(tmp_path)
+    data = bytearray(encode_state(sim))
+    fields = list(STATE.unpack_from(data, 0))
+    fields[5] = 99
+    STATE.pack_into(data, 0, *fields)
+    write_state(str(path), bytes(data))
+    assert_load_fails(path, "damaged save file")
+
+
+def test_failed_write_keeps_the_last_save(tmp_path, monkeypatch):
+    sim, path = saved_game(tmp_path)
+    good = path.read_bytes()
+    play(sim, 100)
+
+    def crash(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, 'replace', crash)
+    with pytest.raises(OSError):
+        save_state(str(path), sim)
+    assert path.read_bytes() == good
@@ -0,0 +1,67 @@
+import asyncio
+
+import versus
+from simulation import FrameInput
+from versus import VersusClient, VersusServer, play_bot
+
+
+async def match(monkeypatch, quit_after):
+    # A server on a free local port, a bot that plays on and a player that
+    # stops sending after `quit_after` ticks
+    monkeypatch.setattr(versus, 'TIMEOUT', 0.3)
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: VersusServer('Normal', seed=3, verbose=False), local_addr=('127.0.0.1', 0))
+    port = transport.get_extra_info('sockname')[1]
+    stayer_transport, stayer = await loop.create_datagram_endpoint(VersusClient, remote_addr=('127.0.0.1', port))
+    quitter_transport, quitter = await loop.create_datagram_endpoint(VersusClient, remote_addr=('127.0.0.1', port))
+
+    async def quit_early():
+        await quitter.join()
+        for _ in range(quit_after):
+            quitter.local_tick(FrameInput())
+            await asyncio.sleep(1 / versus.TICK_RATE)
+        quitter_transport.close()
+
+    async def play_on():
+        await stayer.join()
+        await play_bot(stayer, 60 * 30)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(server.run(), quit_early(), play_on()), 20)
+    finally:
+        for t in (transport, stayer_transport):
+            t.close()
+    return server, stayer
+
+
+def test_player_who_times_out_loses(monkeypatch):
+    server, stayer = asyncio.run(match(monkeypatch, 30))
+    first, second = server.players
+    quitter = first if first.number != stayer.number else second
+    assert quitter.left
+    assert not server.players[stayer.number].left
+    # Their game stopped where it was, nothing was played for them
+    assert quitter.tick <= 30 + versus.MAX_LAG
+    assert server.match_over()
+    assert server.winner() == stayer.number
+    assert stayer.opponent['left']
+    assert stayer.match_over()
+    assert stayer.result() == "YOU WIN!"
+    # The stayer stopped as soon as the match was decided, not at the end
+    # of its game
+    assert stayer.sim.status == 'playing'
+
+
+def test_long_silence_lets_go_of_the_keys(monkeypatch):
+    # The last input is repeated for MAX_LAG filled-in ticks, then the
+    # server plays no keys for the silent player
+    server = VersusServer('Normal', seed=3, verbose=False)
+    player = versus.Player(0, None, None)
+    player.pending = {1: FrameInput.LEFT}
+    played = []
+    monkeypatch.setattr(versus, 'advance', lambda sim, inputs: played.append(inputs.to_mask()))
+    server.clock = 1 + 3 * versus.MAX_LAG
+    server._step_player(player)
+    assert played == [FrameInput.LEFT] * (1 + versus.MAX_LAG) + [0] * versus.MAX_LAG
+    assert player.filled == 2 * versus.MAX_LAG
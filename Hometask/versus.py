@@ -0,0 +1,524 @@
+import argparse
+import asyncio
+import os
+import random
+import struct
+import sys
+import time
+from collections import OrderedDict, deque
+
+from level_pack import default_pack
+from simulation import GameSimulation, FrameInput, DIFFICULTIES
+from snapshot import encode_state, restore_state, encode_delta, decode_delta
+from replay import DIFFICULTY_NAMES, STATUSES
+
+# Two-player versus mode over UDP. Both players get the same seed and the
+# same levels; when both games are over, the higher score wins. A player
+# the server stops hearing from for TIMEOUT seconds has left: their game
+# stops there and the other player wins.
+#
+# The server is authoritative: it keeps one GameSimulation per player and
+# steps it with the inputs that player sends, one input per tick. Clients
+# run the same simulation locally with their own keys (prediction), so the
+# paddle and the balls move without waiting for the network. Every few
+# ticks the server sends a player the state of their game for the last
+# input it applied, as a delta from a state the client has acknowledged
+# (see snapshot.encode_delta); the client compares it with what it had
+# predicted for that tick and, only if they differ, restores it and plays
+# its newer inputs again on top.
+#
+#   python versus.py host                 # server + a player in one window
+#   python versus.py join 192.168.1.20    # the other player
+#   python versus.py server               # dedicated server, two joins
+# --bot plays with the scripted paddle of balance.py and no window, which
+# is how two processes on localhost can check the whole thing.
+
+# Packets (little endian): header, then the body of the packet type
+#   JOIN     client -> server  (empty)
+#   WELCOME  server -> client  player number, seed, difficulty
+#   START    server -> client  (empty), resent until inputs come in
+#   INPUT    client -> server  acked state tick, tick of the newest input,
+#                              count + that many input bitmasks, oldest
+#                              first (the last few ticks are repeated, so
+#                              a lost packet costs nothing)
+#   STATE    server -> client  tick, base tick (NO_BASE: a full state),
+#                              opponent's points, attempts, level, status,
+#                              flags (OPPONENT_LEFT), then the state or
+#                              delta
+MAGIC = b'ARKV'
+VERSION = 2
+HEADER = struct.Struct('<4sBB')
+JOIN, WELCOME, START, INPUT, STATE = range(1, 6)
+WELCOME_BODY = struct.Struct('<BIB')
+INPUT_BODY = struct.Struct('<IIB')
+STATE_BODY = struct.Struct('<IIIbHBB')
+NO_BASE = 0xFFFFFFFF
+OPPONENT_LEFT = 1
+
+PORT = 5405
+TICK_RATE = 60
+STATE_EVERY = 3      # ticks between two states sent to a client (20 a second)
+REDUNDANCY = 8       # inputs repeated in every INPUT packet
+MAX_LEAD = 15        # ticks a client may run ahead of the server clock
+MAX_LAG = 30         # ticks a silent client may fall behind before the
+                     # server plays its last input for it, for at most
+                     # MAX_LAG ticks more; then it plays no keys
+HISTORY = 64         # states kept on both sides as delta bases
+TIMEOUT = 5.0        # seconds without a packet after which a player has
+                     # left the match
+FINAL_STATES = 10    # states sent after the match is decided
+
+
+def advance(sim, inputs):
+    # One tick of a versus game, the same on the server and in the client's
+    # prediction: the next level starts right away, a finished game stays
+    if sim.status == 'level_cleared':
+        sim.start_level(sim.current_level)
+    if sim.status != 'playing':
+        return []
+    return sim.step(inputs)
+
+
+def finished(status):
+    return status in ('game_over', 'won')
+
+
+class Player:
+    # Server side of one client
+    def __init__(self, number, addr, sim):
+        self.number = number
+        self.addr = addr
+        self.sim = sim
+        self.tick = 0
+        self.pending = {}
+        self.last_mask = 0
+        self.acked = NO_BASE
+        self.sent = OrderedDict()
+        self.started = False
+        self.filled = 0
+        # Ticks filled in since the last input that arrived
+        self.silent = 0
+        self.heard = 0.0
+        self.left = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class VersusServer(asyncio.DatagramProtocol):
+    def __init__(self, difficulty='Normal', seed=None, verbose=True):
+        self.difficulty = difficulty
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        # The same levels main.py plays, so both sides simulate the same game
+        self.level_pack = default_pack()
+        self.players = []
+        self.transport = None
+        self.clock = 0
+        self.verbose = verbose
+        self.ready = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def _send(self, player, kind, body=b''):
+        packet = HEADER.pack(MAGIC, VERSION, kind) + body
+        player.bytes_out += len(packet)
+        self.transport.sendto(packet, player.addr)
+
+    def datagram_received(self, data, addr):
+        if len(data) < HEADER.size:
+            return
+        magic, version, kind = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            return
+        player = next((p for p in self.players if p.addr == addr), None)
+        if kind == JOIN:
+            if player is None:
+                if len(self.players) == 2:
+                    return
+                sim = GameSimulation(self.difficulty, seed=self.seed, level_pack=self.level_pack)
+                player = Player(len(self.players), addr, sim)
+                self.players.append(player)
+                if self.verbose:
+                    print(f"player {player.number + 1} joined from {addr[0]}:{addr[1]}")
+                if len(self.players) == 2:
+                    self.ready.set()
+            self._send(player, WELCOME, WELCOME_BODY.pack(player.number, self.seed,
+                                                          DIFFICULTY_NAMES.index(self.difficulty)))
+        elif kind == INPUT and player is not None and not player.left:
+            player.bytes_in += len(data)
+            player.started = True
+            player.heard = time.monotonic()
+            acked, last, count = INPUT_BODY.unpack_from(data, HEADER.size)
+            if acked != NO_BASE and (player.acked == NO_BASE or acked > player.acked):
+                player.acked = acked
+            masks = data[HEADER.size + INPUT_BODY.size:HEADER.size + INPUT_BODY.size + count]
+            for offset, mask in enumerate(masks):
+                tick = last - count + 1 + offset
+                if tick > player.tick:
+                    player.pending[tick] = mask
+
+    def _step_player(self, player):
+        # Apply the inputs that arrived, in order, up to MAX_LEAD ticks
+        # past the clock; stand in for a silent client after MAX_LAG
+        if player.left:
+            return
+        while player.tick + 1 in player.pending and player.tick < self.clock + MAX_LEAD:
+            player.last_mask = player.pending.pop(player.tick + 1)
+            player.tick += 1
+            player.silent = 0
+            advance(player.sim, FrameInput.from_mask(player.last_mask))
+        while player.tick < self.clock - MAX_LAG:
+            # A short gap keeps the keys held; a long one lets go of them
+            # rather than keep playing for a client that may be gone
+            player.pending.pop(player.tick + 1, None)
+            player.tick += 1
+            player.filled += 1
+            mask = player.last_mask if player.silent < MAX_LAG else 0
+            player.silent += 1
+            advance(player.sim, FrameInput.from_mask(mask))
+
+    def _send_state(self, player, opponent):
+        data = encode_state(player.sim)
+        base = player.sent.get(player.acked)
+        if base is None:
+            base_tick, payload = NO_BASE, data
+        else:
+            base_tick, payload = player.acked, encode_delta(data, base)
+        player.sent[player.tick] = data
+        while len(player.sent) > HISTORY:
+            player.sent.popitem(last=False)
+        other = opponent.sim
+        body = STATE_BODY.pack(player.tick, base_tick, other.points, other.Attempts, other.current_level,
+                               STATUSES.index(other.status), OPPONENT_LEFT if opponent.left else 0)
+        self._send(player, STATE, body + payload)
+
+    def _check_timeouts(self):
+        # A player silent for TIMEOUT has left: their game stays where it
+        # was (no more filled-in inputs) and the other player wins
+        now = time.monotonic()
+        for player in self.players:
+            if not player.left and now - player.heard > TIMEOUT:
+                player.left = True
+                player.pending.clear()
+                player.last_mask = 0
+                if self.verbose:
+                    print(f"player {player.number + 1} timed out")
+
+    def match_over(self):
+        if len(self.players) != 2:
+            return False
+        return any(p.left for p in self.players) or all(finished(p.sim.status) for p in self.players)
+
+    def winner(self):
+        # Number of the winning player, or None for a draw
+        first, second = self.players
+        if first.left != second.left:
+            return second.number if first.left else first.number
+        if first.sim.points == second.sim.points:
+            return None
+        return first.number if first.sim.points > second.sim.points else second.number
+
+    async def run(self):
+        await self.ready.wait()
+        loop = asyncio.get_running_loop()
+        # START goes out until each client answers with inputs
+        while not all(p.started for p in self.players):
+            for player in self.players:
+                if not player.started:
+                    self._send(player, START)
+            await asyncio.sleep(0.1)
+        start = loop.time()
+        final = 0
+        while final < FINAL_STATES:
+            # Once the match is decided the clients stop sending
+            if not self.match_over():
+                self._check_timeouts()
+            if all(p.left for p in self.players):
+                if self.verbose:
+                    print("both players left")
+                break
+            self.clock += 1
+            for player in self.players:
+                self._step_player(player)
+            if self.clock % STATE_EVERY == 0:
+                first, second = self.players
+                for player, opponent in ((first, second), (second, first)):
+                    if not player.left:
+                        self._send_state(player, opponent)
+                if self.match_over():
+                    final += 1
+            await asyncio.sleep(max(0.0, start + self.clock / TICK_RATE - loop.time()))
+        if self.verbose:
+            seconds = self.clock / TICK_RATE
+            for player in self.players:
+                status = 'left' if player.left else player.sim.status
+                print(f"player {player.number + 1}: {player.sim.points} points, {status}, "
+                      f"{player.bytes_out / seconds / 1024:.2f} KB/s down, "
+                      f"{player.bytes_in / seconds / 1024:.2f} KB/s up, {player.filled} ticks filled in")
+            if self.match_over():
+                winner = self.winner()
+                print("draw" if winner is None else f"player {winner + 1} wins")
+
+
+class VersusClient(asyncio.DatagramProtocol):
+    # A player: sends inputs, predicts its own game and reconciles it with
+    # the server's states. `loss` drops that share of packets both ways, to
+    # see the prediction and the corrections at work.
+    def __init__(self, loss=0.0):
+        self.loss = loss
+        self.transport = None
+        self.number = None
+        self.sim = None
+        self.welcomed = asyncio.Event()
+        self.started = asyncio.Event()
+        self.tick = 0
+        # (tick, input mask) not yet covered by a server state
+        self.pending = deque()
+        self.masks = deque(maxlen=REDUNDANCY)
+        # tick -> encoded state the prediction reached at that tick
+        self.predicted = {}
+        self.acked = NO_BASE
+        self.bases = OrderedDict()
+        self.opponent = {'points': 0, 'attempts': 0, 'level': 0, 'status': 'playing', 'left': False}
+        self.states = 0
+        self.corrections = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def _send(self, kind, body=b''):
+        packet = HEADER.pack(MAGIC, VERSION, kind) + body
+        self.bytes_out += len(packet)
+        if random.random() >= self.loss:
+            self.transport.sendto(packet)
+
+    def datagram_received(self, data, addr):
+        if len(data) < HEADER.size or random.random() < self.loss:
+            return
+        magic, version, kind = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            return
+        self.bytes_in += len(data)
+        if kind == WELCOME and self.sim is None:
+            self.number, seed, difficulty = WELCOME_BODY.unpack_from(data, HEADER.size)
+            self.sim = GameSimulation(DIFFICULTY_NAMES[difficulty], seed=seed, level_pack=default_pack())
+            self.welcomed.set()
+        elif kind == START and self.sim is not None:
+            self.started.set()
+        elif kind == STATE and self.sim is not None:
+            self.started.set()
+            self._receive_state(data)
+
+    async def join(self):
+        while not self.welcomed.is_set():
+            self._send(JOIN)
+            try:
+                await asyncio.wait_for(self.welcomed.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+        await self.started.wait()
+
+    def local_tick(self, inputs):
+        # Play one tick locally and send it; returns the predicted events
+        self.tick += 1
+        mask = inputs.to_mask()
+        events = advance(self.sim, inputs)
+        self.pending.append((self.tick, mask))
+        self.masks.append(mask)
+        self.predicted[self.tick] = encode_state(self.sim)
+        body = INPUT_BODY.pack(self.acked, self.tick, len(self.masks)) + bytes(self.masks)
+        self._send(INPUT, body)
+        return events
+
+    def _receive_state(self, data):
+        tick, base_tick, points, attempts, level, status, flags = STATE_BODY.unpack_from(data, HEADER.size)
+        self.opponent = {'points': points, 'attempts': attempts, 'level': level, 'status': STATUSES[status],
+                         'left': bool(flags & OPPONENT_LEFT)}
+        if self.acked != NO_BASE and tick <= self.acked:
+            return
+        payload = data[HEADER.size + STATE_BODY.size:]
+        if base_tick == NO_BASE:
+            state = payload
+        elif base_tick in self.bases:
+            state = decode_delta(payload, self.bases[base_tick])
+        else:
+            return
+        self.states += 1
+        self.acked = tick
+        self.bases[tick] = state
+        while len(self.bases) > HISTORY:
+            self.bases.popitem(last=False)
+        while self.pending and self.pending[0][0] <= tick:
+            self.pending.popleft()
+        predicted = self.predicted.get(tick)
+        for old in [t for t in self.predicted if t <= tick]:
+            del self.predicted[old]
+        if predicted == state:
+            return
+        # The server played something else (lost or late inputs): take its
+        # state and play the inputs it has not seen yet again on top
+        self.corrections += 1
+        restore_state(self.sim, state)
+        if tick > self.tick:
+            self.tick = tick
+        for pending_tick, mask in self.pending:
+            advance(self.sim, FrameInput.from_mask(mask))
+            self.predicted[pending_tick] = encode_state(self.sim)
+
+    def match_over(self):
+        return self.opponent['left'] or (finished(self.sim.status) and finished(self.opponent['status']))
+
+    def result(self):
+        # A player whose opponent left wins whatever the scores
+        mine, theirs = self.sim.points, self.opponent['points']
+        if self.opponent['left']:
+            return "YOU WIN!"
+        if mine == theirs:
+            return "DRAW"
+        return "YOU WIN!" if mine > theirs else "YOU LOSE"
+
+
+async def play_bot(client, max_ticks):
+    # Headless player with the scripted paddle; returns when the match is
+    # decided or after max_ticks
+    from balance import paddle_ai
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    while not client.match_over() and client.tick < max_ticks:
+        client.local_tick(paddle_ai(client.sim))
+        await asyncio.sleep(max(0.0, start + client.tick / TICK_RATE - loop.time()))
+
+
+async def play_window(client):
+    # The versus game in a window: the player's own board, with the
+    # opponent's score on top
+    import pygame
+    from assets import AssetManager
+    from effects import EffectsBudget, LOW, NORMAL
+    from game_objects import PowerUp
+    from particles import ParticlePool
+    from renderer import Renderer
+    from text_cache import TextCache
+
+    pygame.init()
+    sim = client.sim
+    screen = pygame.display.set_mode((sim.screen_width, sim.screen_height))
+    pygame.display.set_caption(f"PyGame Arkanoid - versus, player {client.number + 1}")
+    assets = AssetManager()
+    renderer = Renderer(screen, pygame.Color('grey12'), assets=assets)
+    font = assets.font(40)
+    text_cache = TextCache()
+    PowerUp.prerender(assets.font(20))
+    particles = ParticlePool(capacity=4096)
+    effects = EffectsBudget(particles)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    white = (255, 255, 255)
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                return
+        # Ticks due by now, like FixedTimestep, fed with the keys held
+        due = int((loop.time() - start) * TICK_RATE)
+        inputs = FrameInput.from_keys(pygame.key.get_pressed())
+        while client.tick < due and not client.match_over():
+            for name, data in client.local_tick(inputs):
+                if name in ('brick_hit', 'laser_hit'):
+                    effects.emit(data.rect.centerx, data.rect.centery, data.color, 15, 1, 4, 1, 4, 0.05, NORMAL)
+                elif name == 'bounce':
+                    effects.emit(data[0], data[1], (255, 255, 0), 5, 1, 3, 1, 3, 0, LOW)
+        sim = client.sim
+        renderer.draw_background(sim.bricks)
+        renderer.add(sim.paddle.draw(screen))
+        for rect in sim.balls.draw(screen):
+            renderer.add(rect)
+        for power_up in sim.power_ups:
+            renderer.add(power_up.draw(screen))
+        for laser in sim.lasers:
+            renderer.add(laser.draw(screen))
+        opponent = client.opponent
+        hud = [
+            (f"you: {sim.points}  Attempts: {sim.Attempts}", (10, 10)),
+            (f"opponent: {opponent['points']}  level {opponent['level'] + 1}"
+             + ("  (left the match)" if opponent['left'] else ""), (10, 45)),
+        ]
+        if client.match_over():
+            hud.append((client.result(), (sim.screen_width / 2 - 80, sim.screen_height / 2)))
+        elif finished(sim.status):
+            hud.append(("waiting for the opponent...", (sim.screen_width / 2 - 180, sim.screen_height / 2)))
+        for text, position in hud:
+            renderer.add(screen.blit(text_cache.render(font, text, white), position))
+        particles.update()
+        renderer.add(particles.draw(screen))
+        renderer.present()
+        await asyncio.sleep(max(0.0, start + (client.tick + 1) / TICK_RATE - loop.time()))
+
+
+async def run_client(host, port, bot, max_ticks, loss):
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(lambda: VersusClient(loss), remote_addr=(host, port))
+    try:
+        await client.join()
+        started = time.perf_counter()
+        if bot:
+            await play_bot(client, max_ticks)
+        else:
+            await play_window(client)
+        seconds = time.perf_counter() - started
+        print(f"player {client.number + 1}: {client.sim.points} points, {client.sim.status}; "
+              f"opponent {client.opponent['points']}, "
+              f"{'left' if client.opponent['left'] else client.opponent['status']}"
+              + (f"; {client.result()}" if client.match_over() else ""))
+        print(f"  {client.tick} ticks, {client.states} states, {client.corrections} corrections, "
+              f"{client.bytes_in / seconds / 1024:.2f} KB/s down, {client.bytes_out / seconds / 1024:.2f} KB/s up")
+    finally:
+        transport.close()
+
+
+async def run_server(port, difficulty, seed, client=None):
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: VersusServer(difficulty, seed), local_addr=('0.0.0.0', port))
+    print(f"versus server on port {port}, waiting for two players")
+    try:
+        if client is None:
+            await server.run()
+        else:
+            # Host: the server and the first player share the event loop
+            await asyncio.gather(server.run(), client)
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-player Arkanoid over the network")
+    parser.add_argument('mode', choices=['server', 'host', 'join'],
+                        help="dedicated server, server plus a player, or a player joining a server")
+    parser.add_argument('host', nargs='?', default='127.0.0.1', help="server address, for join")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--difficulty', default='Normal', choices=list(DIFFICULTIES))
+    parser.add_argument('--seed', type=int, help="game seed (random by default)")
+    parser.add_argument('--bot', action='store_true', help="play with the scripted paddle, without a window")
+    parser.add_argument('--ticks', type=int, default=60 * 60 * 5, help="a bot stops after this many ticks")
+    parser.add_argument('--loss', type=float, default=0.0, help="share of packets to drop, for testing")
+    args = parser.parse_args()
+
+    if args.bot:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    if args.mode == 'join':
+        asyncio.run(run_client(args.host, args.port, args.bot, args.ticks, args.loss))
+    elif args.mode == 'host':
+        async def host():
+            await run_server(args.port, args.difficulty, args.seed,
+                             run_client('127.0.0.1', args.port, args.bot, args.ticks, args.loss))
+        asyncio.run(host())
+    else:
+        asyncio.run(run_server(args.port, args.difficulty, args.seed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())